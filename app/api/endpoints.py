@@ -1,34 +1,61 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+import asyncio
+import mimetypes
+
+from collections import Counter
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from app.service.agent_service import AgentService
-from app.schemas.api.requests import ChatRequest, ApprovalRequest
-from app.schemas.api.responses import StreamResponse, ApprovalResponse, ErrorResponse
+from app.service.batch_service import BatchService
+from app.core import graph
+from app.core.graph import mcp_hub
+from app.core.telemetry import telemetry
+from app.core.thread_lock import ThreadBusyError
+from app.tools.file_tools import report_store
+from app.tools.search_tools import search_stats
+from app.schemas.api.requests import (
+    ChatRequest, ApprovalRequest, ApprovalStreamRequest, BulkApprovalRequest, BatchRequest
+)
+from app.schemas.api.responses import (
+    StreamResponse, ApprovalResponse, ApprovalListResponse, BulkApprovalResponse, ErrorResponse,
+    BatchEvent, BatchStatusResponse, ReportListResponse
+)
 
 router = APIRouter()
 agent_service = AgentService()
+batch_service = BatchService(agent_service, graph.batch_store, graph.thread_leases)
+
+SSE_RESPONSE = {
+    "model": StreamResponse,
+    "description": "Successful stream start",
+    "content": {"text/event-stream": {"schema": {"$ref": "#/components/schemas/StreamResponse"}}}
+}
+
+NDJSON_RESPONSE = {
+    "model": BatchEvent,
+    "description": "One JSON object per line: the batch state, then job progress until the batch ends",
+    "content": {"application/x-ndjson": {"schema": {"$ref": "#/components/schemas/BatchEvent"}}}
+}
 
 
 @router.post(
     "/chat/stream",
     response_class=StreamingResponse,
-    responses={
-        200: {
-            "model": StreamResponse,
-            "description": "Successful stream start",
-            "content": {
-                "text/event-stream": {"schema": {"$ref": "#/components/schemas/StreamResponse"}}
-            }
-        },
-        500: {"model": ErrorResponse}
-    }
+    responses={200: SSE_RESPONSE, 400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}}
 )
-async def chat_stream_endpoint(request: ChatRequest):
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
     """
     Entry point for agentic chat with streaming and HITL support.
+    If the client disconnects, the run is cancelled; send the thread_id without
+    a message to continue it from its last checkpoint.
     """
+    if request.message is None and request.thread_id is None:
+        raise HTTPException(status_code=400, detail="A message or the thread_id to continue is required.")
     try:
         async def event_generator():
-            async for event_data in agent_service.stream_chat(request.message, request.thread_id):
+            async for event_data in agent_service.stream_chat(
+                request.message, request.thread_id, request.stream_mode, http_request.is_disconnected
+            ):
                 yield f"data: {event_data}\n\n"
 
         return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -43,6 +70,7 @@ async def chat_stream_endpoint(request: ChatRequest):
     response_model=ApprovalResponse,
     responses={
         400: {"model": ErrorResponse},
+        409: {"model": ErrorResponse},
         500: {"model": ErrorResponse}
     },
     summary="Approve or reject a pending agent action"
@@ -52,6 +80,7 @@ async def approve_endpoint(request: ApprovalRequest):
     Resume the agent execution after a 'human_approval' breakpoint.
     """
     if not request.approve:
+        await agent_service.reject_pending([request.thread_id])
         return ApprovalResponse(
             status="aborted",
             thread_id=request.thread_id,
@@ -75,6 +104,195 @@ async def approve_endpoint(request: ApprovalRequest):
     except HTTPException as he:
         # Re-raise known HTTP exceptions
         raise he
+    except ThreadBusyError as e:
+        # Another request or worker is already resuming this thread
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         # Catch-all for unexpected crashes
-        raise HTTPException(status_code=500, detail=f"Unexpected Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Unexpected Error: {str(e)}")
+
+
+@router.post(
+    "/chat/approve/stream",
+    response_class=StreamingResponse,
+    responses={200: SSE_RESPONSE},
+    summary="Approve or reject a pending agent action, streaming the resumed run"
+)
+async def approve_stream_endpoint(request: ApprovalStreamRequest, http_request: Request):
+    """
+    Same events as /chat/stream, ending with 'waiting_approval' if the agent
+    asks for another approval. A busy thread or one with nothing pending
+    gets a single 'error' event; a rejection a single 'aborted' event.
+    """
+    async def event_generator():
+        if not request.approve:
+            await agent_service.reject_pending([request.thread_id])
+            event = StreamResponse(
+                thread_id=request.thread_id, status="aborted", content="Action was rejected by the user."
+            )
+            yield f"data: {event.model_dump_json(exclude_none=True)}\n\n"
+            return
+        async for event_data in agent_service.stream_approval(
+            request.thread_id, request.stream_mode, http_request.is_disconnected
+        ):
+            yield f"data: {event_data}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.get(
+    "/approvals",
+    response_model=ApprovalListResponse,
+    responses={400: {"model": ErrorResponse}},
+    summary="Threads waiting for approval, oldest first"
+)
+async def list_approvals_endpoint(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    try:
+        return await agent_service.list_pending(limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+@router.post(
+    "/approvals/bulk",
+    response_model=BulkApprovalResponse,
+    summary="Approve or reject many pending threads"
+)
+async def bulk_approval_endpoint(request: BulkApprovalRequest):
+    """
+    Approvals run with bounded concurrency (approvals.bulk_concurrency) and
+    each reports its own outcome; a thread running elsewhere is "busy".
+    Rejections only remove the threads from the pending list.
+    """
+    thread_ids = list(dict.fromkeys(request.thread_ids))
+    if request.approve:
+        results = await agent_service.bulk_approve(thread_ids)
+    else:
+        await agent_service.reject_pending(thread_ids)
+        results = [{"thread_id": thread_id, "status": "aborted"} for thread_id in thread_ids]
+    return {"results": results, "counts": dict(Counter(result["status"] for result in results))}
+
+
+@router.get("/cache/stats", summary="Hit/miss counters of the MCP tool and web search caches and of prefetched pages")
+async def cache_stats_endpoint():
+    return {"mcp_tools": mcp_hub.cache.stats(), "web_search": search_stats(), "prefetch": mcp_hub.prefetcher.stats()}
+
+
+@router.get("/tools/stats", summary="Per-tool call counts, errors, timeouts and latency")
+async def tool_stats_endpoint():
+    return graph.tool_node.stats() if graph.tool_node else {}
+
+
+@router.get("/llm/stats", summary="LLM admission control, model routing and per-model tokens and latency")
+async def llm_stats_endpoint():
+    scheduler = graph.manager.scheduler
+    return {
+        "max_tokens_per_run": scheduler.max_tokens_per_run,
+        "safe_margin": scheduler.safe_margin,
+        "models": scheduler.stats(),
+        "routing": graph.manager.usage_stats()
+    }
+
+
+@router.get(
+    "/traces/{thread_id}",
+    responses={404: {"model": ErrorResponse}},
+    summary="Timing spans (nodes, LLM, tools, MCP, checkpoints) recorded for a thread"
+)
+async def trace_endpoint(thread_id: str):
+    spans = telemetry.traces.get(thread_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this thread_id in this worker.")
+    return {"thread_id": thread_id, "spans": spans}
+
+
+@router.post(
+    "/batches",
+    responses={200: NDJSON_RESPONSE, 202: {"model": BatchStatusResponse}, 400: {"model": ErrorResponse}},
+    summary="Run many chat jobs in the background with bounded concurrency"
+)
+async def create_batch_endpoint(request: BatchRequest):
+    """
+    Jobs run on their own thread_id and keep running if the client disconnects.
+    Follow them with GET /batches/{batch_id}, or resume an interrupted batch.
+    """
+    try:
+        batch_id = await batch_service.submit(
+            [job.model_dump() for job in request.jobs], request.concurrency, request.auto_approve
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not request.stream:
+        return JSONResponse(status_code=202, content=await batch_service.status(batch_id))
+    return StreamingResponse(batch_service.follow(batch_id), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/batches/{batch_id}",
+    response_model=BatchStatusResponse,
+    responses={404: {"model": ErrorResponse}},
+    summary="Status and results of every job of a batch"
+)
+async def batch_status_endpoint(batch_id: str):
+    status = await batch_service.status(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return status
+
+
+@router.post(
+    "/batches/{batch_id}/resume",
+    responses={200: NDJSON_RESPONSE, 404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}},
+    summary="Continue the unfinished jobs of an interrupted batch"
+)
+async def resume_batch_endpoint(batch_id: str):
+    """
+    Finished jobs are skipped; the others continue from their thread's last
+    checkpoint. Jobs waiting for approval are re-checked (and approved when
+    the batch has auto_approve), failed ones are retried.
+    """
+    try:
+        await batch_service.resume(batch_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    except ThreadBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return StreamingResponse(batch_service.follow(batch_id), media_type="application/x-ndjson")
+
+
+@router.get("/reports", response_model=ReportListResponse, summary="Reports saved by the agent, newest first")
+async def list_reports_endpoint():
+    return {"reports": await asyncio.to_thread(report_store.list)}
+
+
+@router.get(
+    "/reports/{filename}",
+    responses={200: {"content": {"text/plain": {}}}, 400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    summary="Content of a saved report"
+)
+async def get_report_endpoint(filename: str, request: Request):
+    """
+    Gzipped reports are sent as stored (Content-Encoding: gzip) to clients
+    that accept it and decompressed for the others. The ETag is the sha256
+    of the report content.
+    """
+    try:
+        found = report_store.find(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if found is None:
+        raise HTTPException(status_code=404, detail="Report not found.")
+
+    path, compressed = found
+    media_type = mimetypes.guess_type(filename)[0] or "text/plain"
+    headers = {"ETag": f'"{await asyncio.to_thread(report_store.sha256, path)}"'}
+    if not compressed:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return FileResponse(path, media_type=media_type, headers={**headers, "Content-Encoding": "gzip"})
+    content = await asyncio.to_thread(report_store.read_bytes, filename)
+    return Response(content=content, media_type=media_type, headers=headers)
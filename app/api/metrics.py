@@ -0,0 +1,53 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core import graph
+from app.core.telemetry import telemetry
+from app.tools.search_tools import search_stats
+
+router = APIRouter()
+
+
+def _pool_sessions() -> dict:
+    return {(("server", name),): pool.healthy_count for name, pool in graph.mcp_hub.pools.items()}
+
+
+def _cache_counters() -> dict:
+    values = {}
+    for cache, stats in (("mcp_tools", graph.mcp_hub.cache.stats()), ("web_search", search_stats())):
+        for field in ("hits", "misses", "entries"):
+            if field in stats:
+                values[(("cache", cache), ("field", field))] = stats[field]
+    return values
+
+
+def _llm_queue_depth() -> dict:
+    return {(("model", model),): limiter.queue_depth for model, limiter in graph.manager.scheduler.limiters.items()}
+
+
+# Evaluated on every scrape from the live objects
+telemetry.registry.gauge("mcp_pool_healthy_sessions", "Live sessions per MCP server pool", _pool_sessions)
+telemetry.registry.gauge("agent_cache_stats", "Tool and web search cache counters", _cache_counters)
+telemetry.registry.gauge(
+    "agent_llm_queue_depth", "LLM calls waiting for their model's RPM/TPM budget", _llm_queue_depth
+)
+telemetry.registry.gauge(
+    "agent_thread_lease_conflicts", "Requests rejected because their thread_id was busy",
+    lambda: {(): graph.thread_leases.conflicts}
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Prometheus metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(telemetry.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/ready", summary="Readiness: the graph is compiled (and, with full=true, MCP tools are attached)")
+async def readiness_endpoint(full: bool = False):
+    """
+    The API serves as soon as the graph is compiled with the local tools;
+    MCP tools may still be attaching. Load balancers that need them should
+    probe with ?full=true. The body carries the duration of each startup phase.
+    """
+    report = graph.startup.report()
+    ready = graph.app_graph is not None and (not full or report["mcp"] == "attached")
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, **report})
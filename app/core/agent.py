@@ -1,34 +1,192 @@
 import os
+import time
 import yaml
 
+from collections import OrderedDict, defaultdict
 from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableConfig
+from app.core.compaction import ContextCompactor
+from app.core.config import load_config
+from app.core.rate_limiter import LLMScheduler
+from app.core.telemetry import telemetry
+from app.core.tool_binding import ToolBindingCache
+from app.core.tool_selection import ToolSelector, unbound_tool_error
 from app.schemas.workflow.agent_state import AgentState
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
 from app.tools.file_tools import save_report_to_disk
+from app.tools.product_tools import bulk_upsert_products, get_price_summary
 from app.tools.search_tools import web_search_tool
 
 load_dotenv()
 
+routed_steps = telemetry.registry.counter(
+    "agent_llm_routed_steps_total", "Agent steps per model tier and routing reason"
+)
+
+
+DEFAULT_MODELS = {"small": "llama-3.1-8b-instant", "large": "llama-3.3-70b-versatile"}
+# Tool results after which the next step writes the report or the final answer
+DEFAULT_SYNTHESIS_AFTER = ("write_query", "bulk_upsert_products", "get_price_summary", "save_report_to_disk")
+DEFAULT_LARGE_CONTEXT_TOKENS = 6000
+
+
+class ModelRouter:
+    """
+    Picks the model tier for one agent step from its position in the graph
+    and the size of the prompt:
+    - routing steps (the first step, or after search/fetch/read results) use "small",
+    - steps after the tools in `synthesis_after` write the report or the
+      final answer and use "large",
+    - prompts estimated above `large_context_tokens` use "large" whatever the position.
+    With routing disabled every step uses "small".
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or {}
+        self.enabled = bool(settings.get("enabled", True))
+        self.synthesis_after = set(settings.get("synthesis_after", DEFAULT_SYNTHESIS_AFTER))
+        self.large_context_tokens = int(settings.get("large_context_tokens", DEFAULT_LARGE_CONTEXT_TOKENS))
+
+    def route(self, messages: Sequence[BaseMessage], context_tokens: int) -> Tuple[str, str]:
+        """Returns (tier, reason)."""
+        if not self.enabled:
+            return "small", "routing_disabled"
+        if context_tokens > self.large_context_tokens:
+            return "large", "long_context"
+
+        # Tool results of the step that just ran: the trailing ToolMessages
+        results = []
+        for message in reversed(messages):
+            if not isinstance(message, ToolMessage):
+                break
+            results.append(message.name)
+        if not results:
+            return "small", "first_step"
+        if self.synthesis_after.intersection(results):
+            return "large", "synthesis"
+        return "small", "tool_routing"
+
+
 class AgentManager:
     def __init__(self):
-        self.llm = ChatGroq(
-            model= "llama-3.1-8b-instant", # "llama-3.3-70b-versatile",
-            temperature=0,
-            api_key=os.getenv("GROQ_API_KEY")
-        )
-        self.static_tools = [save_report_to_disk, web_search_tool]
+        settings = load_config().get("llm") or {}
+        # Shared by all threads: per-model RPM/TPM admission and the per-run token budget
+        self.scheduler = LLMScheduler(settings)
+        self.router = ModelRouter(settings.get("routing"))
+        self.model_names: Dict[str, str] = {**DEFAULT_MODELS, **(settings.get("models") or {})}
+        # Clients and bindings are built on the first step that uses the tier, not at import
+        self.models: Dict[str, BaseChatModel] = {}
+        self.bound_models: Dict[str, Runnable] = {}
+        # (tier, sorted tool names) -> model bound to that subset, least recently used first
+        self.bound_variants: "OrderedDict[Tuple[str, Tuple[str, ...]], Runnable]" = OrderedDict()
+        # Per model: calls, tokens and latency (admission to last chunk), to compare the tiers
+        self.model_usage = defaultdict(lambda: {"calls": 0, "tokens": 0, "latency_ms": 0.0})
+        self.binding_cache = ToolBindingCache()
+        self.tools_fingerprint = None
+        self.static_tools = [save_report_to_disk, web_search_tool, bulk_upsert_products, get_price_summary]
         self.all_tools = self.static_tools
-        self.llm_with_tools = self.llm.bind_tools(self.all_tools)
+        self.tools_fingerprint = self._fingerprint(self.all_tools)
+        # Each step binds only the tools relevant to it
+        self.tool_selector = ToolSelector.from_config(load_config().get("tool_selection"))
+        self.tool_selector.index_tools(self.all_tools)
         # Load the prompt from YAML during initialization
         self.system_prompt = self._load_prompt()
+        # Built once: every request starts with the same system message and tool block,
+        # so providers with prefix caching can reuse it
+        self.system_message = SystemMessage(content=self.system_prompt)
+        self.compactor = ContextCompactor.from_config(load_config().get("context_compaction"))
+
+    def model(self, tier: str) -> BaseChatModel:
+        """The chat model of a tier, created on first use."""
+        llm = self.models.get(tier)
+        if llm is None:
+            # Imported here: langchain_groq and its client add about a second to startup
+            from langchain_groq import ChatGroq
+            llm = self.models[tier] = ChatGroq(
+                model=self.model_names[tier],
+                temperature=0,
+                api_key=os.getenv("GROQ_API_KEY"),
+                # 429s are retried by the scheduler, which also holds back the other threads
+                max_retries=0
+            )
+        return llm
+
+    def preload_client(self):
+        """Imports the chat model client if a tier still needs it. Blocking: run it off the event loop."""
+        if any(tier not in self.models for tier in self.model_names):
+            import langchain_groq  # noqa: F401
+
+    @property
+    def llm(self) -> BaseChatModel:
+        """The model of the "small" tier, used for most steps."""
+        return self.model("small")
+
+    @staticmethod
+    def name_of(llm) -> str:
+        return getattr(llm, "model_name", type(llm).__name__)
+
+    def tier_model(self, tier: str) -> str:
+        """Name of a tier's model, without building its client."""
+        return self.name_of(self.models[tier]) if tier in self.models else self.model_names[tier]
+
+    @property
+    def model_name(self) -> str:
+        return self.tier_model("small")
+
+    def set_models(self, models: Dict[str, BaseChatModel]):
+        """Replaces the model of some tiers (e.g. offline fakes)."""
+        self.models.update(models)
+        self.model_names.update({tier: self.name_of(llm) for tier, llm in models.items()})
+        for tier in models:
+            self.bound_models.pop(tier, None)
+        for key in [key for key in self.bound_variants if key[0] in models]:
+            del self.bound_variants[key]
+
+    def _fingerprint(self, tools: list) -> str:
+        return self.binding_cache.fingerprint(self.binding_cache.schemas(tools))
+
+    def bound(self, tier: str, subset: Optional[Tuple[str, ...]] = None) -> Runnable:
+        """
+        The tier's model bound to the current tools, or to a subset of them.
+        The cache keys bindings by model; subset bindings are kept per tier
+        and tool names, so switching between subsets does not rebind.
+        """
+        if subset is None:
+            bound = self.bound_models.get(tier)
+            if bound is None:
+                bound, _ = self.binding_cache.bind(self.model(tier), self.all_tools)
+                self.bound_models[tier] = bound
+            return bound
+
+        key = (tier, subset)
+        bound = self.bound_variants.get(key)
+        if bound is None:
+            # Schemas come from the binding cache, sorted by name like the full tool block
+            schemas = self.binding_cache.schemas(self.tool_selector.tools_for(subset))
+            bound = self.bound_variants[key] = self.model(tier).bind_tools(schemas)
+            while len(self.bound_variants) > self.tool_selector.max_variants:
+                self.bound_variants.popitem(last=False)
+        else:
+            self.bound_variants.move_to_end(key)
+        return bound
 
     def update_tools(self, mcp_tools: list):
-        """Updates the LLM binding with both local and MCP tools."""
+        """Updates the LLM binding with both local and MCP tools. Rebinds only if the tool set changed."""
+        previous_tools, previous_fingerprint = self.all_tools, self.tools_fingerprint
         self.all_tools = self.static_tools + mcp_tools
-        self.llm_with_tools = self.llm.bind_tools(self.all_tools)
-        print(f"Agent tools updated. Total: {len(self.all_tools)} ---")
+        self.tools_fingerprint = self._fingerprint(self.all_tools)
+        if self.tools_fingerprint != previous_fingerprint:
+            self.bound_models.clear()
+            self.bound_variants.clear()
+            self.tool_selector.index_tools(self.all_tools)
+
+        current_ids = {id(t) for t in self.all_tools}
+        self.binding_cache.forget([t for t in previous_tools if id(t) not in current_ids])
+        changed = "rebound" if self.tools_fingerprint != previous_fingerprint else "unchanged"
+        print(f"Agent tools updated. Total: {len(self.all_tools)} ({changed}, {self.tools_fingerprint}) ---")
 
     def _load_prompt(self) -> str:
         """Loads the system prompt from a YAML file."""
@@ -37,33 +195,146 @@ class AgentManager:
             config = yaml.safe_load(f)
         return config['system_prompt']
 
-    def call_model(self, state: AgentState):
-        MAX_TOKENS = 30000
-        SAFE_MARGIN = 2000
+    @staticmethod
+    def _token_usage(response: BaseMessage) -> int:
+        """Returns prompt + completion tokens reported by the provider."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            return usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
 
+        # Fallback for providers that only fill response_metadata
+        usage = response.response_metadata.get("token_usage", {})
+        return usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+    def _budget_exceeded(self, state: AgentState) -> Optional[dict]:
+        """Returns the early-stop update when the token budget is exhausted."""
         current_usage = state.get("total_tokens", 0)
 
-        if current_usage > (MAX_TOKENS - SAFE_MARGIN):
-            from langchain_core.messages import AIMessage
+        if self.scheduler.budget_exhausted(current_usage, self.scheduler.safe_margin):
             print(f"--- Stopping early. Usage: {current_usage} ---")
             return {
                 "messages": [AIMessage(content="STOP: High token usage detected. Finishing task now.")],
                 "total_tokens": current_usage
             }
+        return None
 
-        messages = state['messages']
+    def _prepare_messages(self, state: AgentState) -> Tuple[list, int]:
+        """Returns the compacted prompt for this step and its estimated token count."""
+        messages, context_tokens = self.compactor.compact(state['messages'])
 
-        # Inject the System Prompt loaded from YAML
-        if not any(isinstance(m, SystemMessage) for m in messages):
-            messages = [SystemMessage(content=self.system_prompt)] + messages
+        # Inject the System Prompt loaded from YAML (states never start with one)
+        if not state['messages'] or not isinstance(state['messages'][0], SystemMessage):
+            messages = [self.system_message] + messages
+        return messages, context_tokens
 
-        response = self.llm_with_tools.invoke(messages)
-
-        usage = response.response_metadata.get("token_usage", {})
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        completion_tokens = usage.get("completion_tokens", 0)
+    def _select(self, state: AgentState, context_tokens: int) -> Tuple[str, str, Optional[Tuple[str, ...]]]:
+        """Routes the step: returns (tier, model name, tools to bind or None for all of them)."""
+        tier, reason = self.router.route(state["messages"], context_tokens)
+        if tier not in self.model_names:
+            tier = "small"
+        model = self.tier_model(tier)
+        routed_steps.inc(tier=tier, reason=reason, model=model)
+        return tier, model, self.tool_selector.select(state["messages"])
 
+    def _build_update(self, state: AgentState, response: BaseMessage, context_tokens: int,
+                      model: str, latency_ms: float) -> dict:
+        used = self._token_usage(response)
+        telemetry.tokens.inc(used, model=model)
+        usage = self.model_usage[model]
+        usage["calls"] += 1
+        usage["tokens"] += used
+        usage["latency_ms"] += latency_ms
         return {
             "messages": [response],
-            "total_tokens": state.get("total_tokens", 0) + prompt_tokens + completion_tokens
-        }
\ No newline at end of file
+            "total_tokens": state.get("total_tokens", 0) + used,
+            "context_tokens": context_tokens
+        }
+
+    def usage_stats(self) -> dict:
+        """Calls, tokens and latency per model, and the model of each tier."""
+        return {
+            "tiers": {tier: self.tier_model(tier) for tier in self.model_names},
+            "tool_selection": self.tool_selector.stats(),
+            "models": {
+                model: {
+                    **usage,
+                    "latency_ms": round(usage["latency_ms"], 2),
+                    "avg_latency_ms": round(usage["latency_ms"] / usage["calls"], 2) if usage["calls"] else 0.0,
+                    "avg_tokens": round(usage["tokens"] / usage["calls"], 1) if usage["calls"] else 0.0
+                }
+                for model, usage in self.model_usage.items()
+            }
+        }
+
+    def call_model(self, state: AgentState):
+        """Synchronous agent node. Kept as a fallback for sync graph runners."""
+        stop = self._budget_exceeded(state)
+        if stop:
+            return stop
+
+        messages, context_tokens = self._prepare_messages(state)
+        tier, model, subset = self._select(state, context_tokens)
+        bound = self.bound(tier, subset)
+        with telemetry.span("llm", model, tier=tier, context_tokens=context_tokens):
+            start = time.perf_counter()
+            try:
+                response = self.scheduler.call_sync(model, lambda: bound.invoke(messages))
+            except Exception as e:
+                if subset is None or not unbound_tool_error(e):
+                    raise
+                self.tool_selector.record_fallback()
+                bound = self.bound(tier)
+                response = self.scheduler.call_sync(model, lambda: bound.invoke(messages))
+            latency_ms = (time.perf_counter() - start) * 1000
+        return self._build_update(state, response, context_tokens, model, latency_ms)
+
+    async def acall_model(self, state: AgentState, config: RunnableConfig):
+        """
+        Async agent node. Streams the completion so LangGraph's 'messages'
+        stream mode can forward token chunks to the client while the
+        aggregated message is still written to the state.
+        """
+        stop = self._budget_exceeded(state)
+        if stop:
+            return stop
+
+        messages, context_tokens = self._prepare_messages(state)
+        tier, model, subset = self._select(state, context_tokens)
+        bound = self.bound(tier, subset)
+        thread_id = config.get("configurable", {}).get("thread_id")
+        latency = {}
+        with telemetry.span("llm", model, tier=tier, context_tokens=context_tokens) as span:
+            start = time.perf_counter()
+
+            async def stream_completion():
+                # Time to first token counts from admission, not from the time spent queued
+                admitted = time.perf_counter()
+                span["queued_ms"] = round((admitted - start) * 1000, 1)
+                response = None
+                async for chunk in bound.astream(messages, config):
+                    if response is None:
+                        span["ttft_ms"] = round((time.perf_counter() - admitted) * 1000, 1)
+                    response = chunk if response is None else response + chunk
+
+                if response is None:
+                    # Provider returned an empty stream, fall back to a single round-trip
+                    response = await bound.ainvoke(messages, config)
+                latency["ms"] = (time.perf_counter() - admitted) * 1000
+                return response
+
+            # Rate limits are answered before the first chunk, so a retried attempt streamed nothing
+            try:
+                response = await self.scheduler.call(
+                    model, thread_id, context_tokens, stream_completion, self._token_usage
+                )
+            except Exception as e:
+                if subset is None or not unbound_tool_error(e):
+                    raise
+                # The model wanted a tool left out of this step: ask again with every tool bound
+                self.tool_selector.record_fallback()
+                bound = self.bound(tier)
+                response = await self.scheduler.call(
+                    model, thread_id, context_tokens, stream_completion, self._token_usage
+                )
+
+        return self._build_update(state, response, context_tokens, model, latency["ms"])
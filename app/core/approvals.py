@@ -0,0 +1,115 @@
+import json
+import time
+import asyncio
+import aiosqlite
+
+from typing import List, Optional, Sequence, Tuple
+
+APPROVAL_NODE = "human_approval"
+# Also cleaned up by checkpoint pruning when a thread expires
+PENDING_TABLE = "pending_approvals"
+
+
+def encode_cursor(requested_at: float, thread_id: str) -> str:
+    return f"{requested_at!r}:{thread_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError for a malformed cursor."""
+    requested_at, _, thread_id = cursor.partition(":")
+    return float(requested_at), thread_id
+
+
+class ApprovalIndex:
+    """
+    Threads paused before human_approval, stored next to the checkpoints.
+    AgentService adds a thread when a run stops at the breakpoint and removes
+    it when the thread is approved, rejected or continues some other way, so
+    listing and bulk actions read this table instead of the state of every
+    thread. The checkpoint stays the source of truth: approving re-checks it.
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.conn: Optional[aiosqlite.Connection] = None
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        if self.conn is not None:
+            return
+        self.conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+        self.conn.row_factory = aiosqlite.Row
+        await self.conn.executescript(
+            f"""
+            PRAGMA journal_mode=WAL;
+            PRAGMA busy_timeout={self.busy_timeout_ms};
+            CREATE TABLE IF NOT EXISTS pending_approvals (
+                thread_id TEXT PRIMARY KEY,
+                requested_at REAL NOT NULL,
+                checkpoint_id TEXT,
+                tool_calls TEXT NOT NULL
+            ) WITHOUT ROWID;
+            -- Keyset paging in request order
+            CREATE INDEX IF NOT EXISTS idx_pending_approvals_requested
+                ON pending_approvals (requested_at, thread_id);
+            """
+        )
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def add(self, thread_id: str, checkpoint_id: Optional[str], tool_calls: List[dict]):
+        """Records the pause. A thread paused again keeps its place if it is still the same pause."""
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT INTO pending_approvals (thread_id, requested_at, checkpoint_id, tool_calls) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET requested_at = excluded.requested_at, "
+                "checkpoint_id = excluded.checkpoint_id, tool_calls = excluded.tool_calls "
+                "WHERE pending_approvals.checkpoint_id IS NOT excluded.checkpoint_id",
+                (thread_id, time.time(), checkpoint_id, json.dumps(tool_calls))
+            )
+
+    async def remove(self, thread_ids: Sequence[str]) -> int:
+        if not thread_ids:
+            return 0
+        async with self.lock:
+            cur = await self.conn.execute(
+                f"DELETE FROM pending_approvals WHERE thread_id IN ({','.join('?' * len(thread_ids))})",
+                tuple(thread_ids)
+            )
+        return cur.rowcount
+
+    async def count(self) -> int:
+        async with self.lock:
+            cur = await self.conn.execute("SELECT COUNT(*) FROM pending_approvals")
+            row = await cur.fetchone()
+        return row[0]
+
+    async def page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Oldest requests first. Returns the items and the cursor of the next page (None on the last)."""
+        query = "SELECT * FROM pending_approvals"
+        params: tuple = ()
+        if cursor:
+            query += " WHERE (requested_at, thread_id) > (?, ?)"
+            params = decode_cursor(cursor)
+        query += " ORDER BY requested_at, thread_id LIMIT ?"
+
+        async with self.lock:
+            cur = await self.conn.execute(query, params + (limit + 1,))
+            rows = await cur.fetchall()
+
+        items = [
+            {
+                "thread_id": row["thread_id"],
+                "requested_at": row["requested_at"],
+                "checkpoint_id": row["checkpoint_id"],
+                "tool_calls": json.loads(row["tool_calls"])
+            }
+            for row in rows[:limit]
+        ]
+        more = len(rows) > limit
+        return items, encode_cursor(items[-1]["requested_at"], items[-1]["thread_id"]) if more else None
@@ -0,0 +1,126 @@
+import time
+import asyncio
+import aiosqlite
+
+from typing import List, Optional
+
+# Job states. A batch is finished when none of its jobs is pending or running.
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+WAITING_APPROVAL = "waiting_approval"
+FAILED = "failed"
+FINISHED_STATES = (COMPLETED, WAITING_APPROVAL, FAILED)
+
+
+class BatchStore:
+    """
+    Batches of chat jobs and the state of each job, stored next to the
+    checkpoints so every worker sees them and they survive a restart. A job
+    runs on its own thread_id; the checkpoint of that thread is what lets an
+    interrupted job continue instead of starting over.
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.conn: Optional[aiosqlite.Connection] = None
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        if self.conn is not None:
+            return
+        self.conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+        self.conn.row_factory = aiosqlite.Row
+        await self.conn.executescript(
+            f"""
+            PRAGMA journal_mode=WAL;
+            PRAGMA busy_timeout={self.busy_timeout_ms};
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                concurrency INTEGER NOT NULL,
+                auto_approve INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                batch_id TEXT NOT NULL,
+                job_index INTEGER NOT NULL,
+                thread_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL,
+                start_checkpoint TEXT,
+                result TEXT,
+                error TEXT,
+                started_at REAL,
+                finished_at REAL,
+                PRIMARY KEY (batch_id, job_index)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def create(self, batch_id: str, jobs: List[dict], concurrency: int, auto_approve: bool):
+        """Stores a new batch; `jobs` are dicts with message and thread_id."""
+        async with self.lock:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                await self.conn.execute(
+                    "INSERT INTO batches (batch_id, concurrency, auto_approve, created_at) VALUES (?, ?, ?, ?)",
+                    (batch_id, concurrency, int(auto_approve), time.time())
+                )
+                await self.conn.executemany(
+                    "INSERT INTO batch_jobs (batch_id, job_index, thread_id, message, status) VALUES (?, ?, ?, ?, ?)",
+                    [(batch_id, i, job["thread_id"], job["message"], PENDING) for i, job in enumerate(jobs)]
+                )
+                await self.conn.execute("COMMIT")
+            except BaseException:
+                await self.conn.execute("ROLLBACK")
+                raise
+
+    async def get_batch(self, batch_id: str) -> Optional[dict]:
+        async with self.lock:
+            cur = await self.conn.execute("SELECT * FROM batches WHERE batch_id = ?", (batch_id,))
+            row = await cur.fetchone()
+        return dict(row) if row else None
+
+    async def get_jobs(self, batch_id: str) -> List[dict]:
+        async with self.lock:
+            cur = await self.conn.execute(
+                "SELECT * FROM batch_jobs WHERE batch_id = ? ORDER BY job_index", (batch_id,)
+            )
+            rows = await cur.fetchall()
+        return [dict(row) for row in rows]
+
+    async def start_job(self, batch_id: str, index: int, start_checkpoint: Optional[str]):
+        """Marks a job as running. The checkpoint it starts from is only recorded the first time."""
+        async with self.lock:
+            await self.conn.execute(
+                "UPDATE batch_jobs SET status = ?, error = NULL, started_at = ?, "
+                "start_checkpoint = CASE WHEN started_at IS NULL THEN ? ELSE start_checkpoint END "
+                "WHERE batch_id = ? AND job_index = ?",
+                (RUNNING, time.time(), start_checkpoint, batch_id, index)
+            )
+
+    async def finish_job(self, batch_id: str, index: int, status: str,
+                         result: Optional[str] = None, error: Optional[str] = None):
+        async with self.lock:
+            await self.conn.execute(
+                "UPDATE batch_jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE batch_id = ? AND job_index = ?",
+                (status, result, error, time.time(), batch_id, index)
+            )
+
+    async def finish_batch(self, batch_id: str):
+        async with self.lock:
+            await self.conn.execute(
+                "UPDATE batches SET finished_at = ? WHERE batch_id = ?", (time.time(), batch_id)
+            )
+
+    async def reopen_batch(self, batch_id: str):
+        async with self.lock:
+            await self.conn.execute("UPDATE batches SET finished_at = NULL WHERE batch_id = ?", (batch_id,))
@@ -0,0 +1,115 @@
+import time
+import asyncio
+
+from contextlib import aclosing
+from contextvars import ContextVar
+from typing import AsyncGenerator, Awaitable, Callable, Dict, Optional, Set
+from app.core.telemetry import telemetry
+
+runs_cancelled = telemetry.registry.counter(
+    "agent_runs_cancelled_total", "Graph runs cancelled before they finished, by kind and reason"
+)
+cancelled_calls = telemetry.registry.counter(
+    "agent_cancelled_calls_total", "LLM, tool and MCP calls aborted (or never started) because their run was cancelled"
+)
+cancelled_run_seconds = telemetry.registry.histogram(
+    "agent_cancelled_run_seconds", "How long cancelled runs had been running"
+)
+
+CLIENT_DISCONNECT = "client_disconnect"
+
+_EVENT, _DONE, _ERROR = range(3)
+
+
+class RunScope:
+    """
+    One graph run. Every task the run starts (nodes, tool calls, LLM calls)
+    sees it through current_run, so call sites can tell a deliberate
+    cancellation from a timeout and count the work it saved.
+    """
+
+    def __init__(self, kind: str, thread_id: str):
+        self.kind = kind
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.reason: Optional[str] = None
+        self.aborted: Dict[str, int] = {}
+
+    def cancel(self, reason: str):
+        if self.reason is None:
+            self.reason = reason
+            runs_cancelled.inc(kind=self.kind, reason=reason)
+            cancelled_run_seconds.observe(time.perf_counter() - self.started)
+
+
+current_run: ContextVar[Optional[RunScope]] = ContextVar("current_run", default=None)
+# Detached runs still cleaning up after their client left
+_detached: Set[asyncio.Task] = set()
+
+
+def aborted(call: str):
+    """Call sites report a call cut short by a CancelledError; counted only for cancelled runs."""
+    scope = current_run.get()
+    if scope is not None and scope.reason is not None:
+        scope.aborted[call] = scope.aborted.get(call, 0) + 1
+        cancelled_calls.inc(call=call, reason=scope.reason)
+
+
+async def run_detached(
+    stream: AsyncGenerator[str, None],
+    scope: RunScope,
+    disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    poll_interval: float = 1.0
+) -> AsyncGenerator[str, None]:
+    """
+    Runs `stream` in a task of its own and relays its events. When the
+    consumer goes away (the response is cancelled or closed, or
+    `disconnected()` turns true between events) the task is cancelled once
+    and left to unwind: nodes and calls in flight are cancelled, and the
+    checkpoint writes and the thread lease release in their cleanup still
+    complete, so the thread can be resumed from its last checkpoint.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+
+    async def produce():
+        current_run.set(scope)
+        try:
+            async with aclosing(stream):
+                async for event in stream:
+                    await queue.put((_EVENT, event))
+        except Exception as e:
+            await queue.put((_ERROR, e))
+        else:
+            await queue.put((_DONE, None))
+
+    task = asyncio.create_task(produce(), name=f"run-{scope.kind}-{scope.thread_id}")
+    _detached.add(task)
+    task.add_done_callback(_detached.discard)
+
+    getter: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=poll_interval if disconnected else None)
+            if not done:
+                if await disconnected():
+                    return
+                continue
+
+            kind, value = getter.result()
+            getter = None
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise value
+            yield value
+    finally:
+        if getter is not None:
+            getter.cancel()
+        if not task.done():
+            scope.cancel(CLIENT_DISCONNECT)
+            task.cancel()
+            # Under the server's cancel scope this wait is cancelled again right away;
+            # the task finishes its cleanup on its own either way
+            await asyncio.wait({task})
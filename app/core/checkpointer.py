@@ -0,0 +1,185 @@
+import time
+import asyncio
+import itertools
+import aiosqlite
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from app.core.approvals import PENDING_TABLE
+from app.core.telemetry import telemetry
+
+DEFAULT_SETTINGS = {
+    "synchronous": "NORMAL",      # safe with WAL: only the last transactions can be lost on power failure
+    "busy_timeout_ms": 5000,
+    "readers": 2,
+    "keep_last": 20,              # checkpoints kept per thread_id
+    "retention_days": 14,         # threads idle for longer are deleted
+    "prune_interval": 600         # seconds between pruning runs, 0 disables the job
+}
+
+
+class TunedSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver with one writer connection and a small set of read-only
+    connections. With WAL, readers never block the writer nor each other, so
+    aget_state calls don't queue behind checkpoint writes of other threads.
+    Also tracks the last activity of every thread for retention pruning.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, read_conns: List[aiosqlite.Connection], **kwargs):
+        super().__init__(conn, **kwargs)
+        self.readers = [AsyncSqliteSaver(read_conn, serde=self.serde) for read_conn in read_conns]
+        self._next_reader = itertools.cycle(self.readers)
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_thread_activity_updated ON thread_activity (updated_at);
+                """
+            )
+            await self.conn.commit()
+        # Tables exist now, readers must never try to create them
+        for reader in self.readers:
+            reader.is_setup = True
+
+    async def aget_tuple(self, config: RunnableConfig):
+        await self.setup()
+        with telemetry.span("checkpoint", "get", config["configurable"].get("thread_id")):
+            return await next(self._next_reader).aget_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs) -> AsyncIterator:
+        await self.setup()
+        async for checkpoint_tuple in next(self._next_reader).alist(config, **kwargs):
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        with telemetry.span("checkpoint", "put", thread_id):
+            async with self.lock:
+                # Committed in the same transaction as the checkpoint below
+                await self.conn.execute(
+                    "INSERT INTO thread_activity (thread_id, updated_at) VALUES (?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                    (thread_id, time.time())
+                )
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes, task_id: str) -> None:
+        with telemetry.span("checkpoint", "put_writes", config["configurable"].get("thread_id")):
+            await super().aput_writes(config, writes, task_id)
+            # Pending writes must be visible to the reader connections
+            async with self.lock:
+                await self.conn.commit()
+
+    async def prune(self, keep_last: int, retention_days: float) -> Dict[str, int]:
+        """
+        Keeps the newest `keep_last` checkpoints per thread and drops idle
+        threads, with their entries in the pending approvals index.
+        """
+        await self.setup()
+        cutoff = time.time() - retention_days * 86400
+        async with self.lock:
+            cur = await self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (cutoff,)
+            )
+            expired = [(row[0],) for row in await cur.fetchall()]
+            await self.conn.executemany("DELETE FROM checkpoints WHERE thread_id = ?", expired)
+            await self.conn.executemany("DELETE FROM writes WHERE thread_id = ?", expired)
+            await self.conn.executemany("DELETE FROM thread_activity WHERE thread_id = ?", expired)
+            cur = await self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PENDING_TABLE,)
+            )
+            if await cur.fetchone():
+                await self.conn.executemany(f"DELETE FROM {PENDING_TABLE} WHERE thread_id = ?", expired)
+
+            cur = await self.conn.execute(
+                """
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                        ) AS rn
+                        FROM checkpoints
+                    ) WHERE rn > ?
+                )
+                """,
+                (keep_last,)
+            )
+            pruned_checkpoints = cur.rowcount
+            cur = await self.conn.execute(
+                """
+                DELETE FROM writes WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = writes.thread_id
+                      AND c.checkpoint_ns = writes.checkpoint_ns
+                      AND c.checkpoint_id = writes.checkpoint_id
+                )
+                """
+            )
+            pruned_writes = cur.rowcount
+            await self.conn.commit()
+            await self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+        return {"expired_threads": len(expired), "checkpoints": pruned_checkpoints, "writes": pruned_writes}
+
+
+async def _prune_loop(saver: TunedSqliteSaver, settings: dict):
+    while True:
+        await asyncio.sleep(settings["prune_interval"])
+        try:
+            result = await saver.prune(settings["keep_last"], settings["retention_days"])
+            print(f"--- [CHECKPOINTS] Pruned {result} ---")
+        except Exception as e:
+            print(f"--- [CHECKPOINTS ERROR] Pruning failed: {e} ---")
+
+
+@asynccontextmanager
+async def open_checkpointer(db_path: str, settings: Optional[Dict[str, Any]] = None):
+    """Opens the writer/reader connections with WAL and runs the pruning job."""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if str(settings["synchronous"]).upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        raise ValueError(f"Invalid checkpoints.synchronous level: {settings['synchronous']}")
+
+    write_conn = await aiosqlite.connect(db_path)
+    await write_conn.executescript(
+        f"""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous={settings["synchronous"]};
+        PRAGMA busy_timeout={int(settings["busy_timeout_ms"])};
+        """
+    )
+    read_conns = []
+    for _ in range(max(1, int(settings["readers"]))):
+        read_conn = await aiosqlite.connect(db_path)
+        await read_conn.executescript(
+            f"""
+            PRAGMA busy_timeout={int(settings["busy_timeout_ms"])};
+            PRAGMA query_only=ON;
+            """
+        )
+        read_conns.append(read_conn)
+
+    saver = TunedSqliteSaver(write_conn, read_conns)
+    await saver.setup()
+
+    prune_task = None
+    if settings["prune_interval"]:
+        prune_task = asyncio.create_task(_prune_loop(saver, settings), name="checkpoint-pruning")
+    try:
+        yield saver
+    finally:
+        if prune_task:
+            prune_task.cancel()
+        for conn in [write_conn, *read_conns]:
+            await conn.close()
@@ -0,0 +1,152 @@
+import re
+import json
+
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
+
+# Rough BPE approximation: short word pieces and single punctuation marks
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+MESSAGE_OVERHEAD_TOKENS = 4
+
+DEFAULT_BUDGET_TOKENS = 8000
+DEFAULT_KEEP_LAST_STEPS = 2
+DEFAULT_TOOL_OUTPUT_CHARS = 1500
+
+
+def _text(content) -> str:
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate, close enough to the provider count for budgeting."""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+# (message id, content length) -> estimate; history messages are re-counted on every step otherwise
+_token_cache: "OrderedDict[tuple, int]" = OrderedDict()
+TOKEN_CACHE_SIZE = 20000
+
+
+def message_tokens(message: BaseMessage) -> int:
+    key = (message.id, len(message.content)) if message.id else None
+    if key in _token_cache:
+        return _token_cache[key]
+
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_text(message.content))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(tool_call["name"] + json.dumps(tool_call["args"]))
+
+    if key is not None:
+        _token_cache[key] = tokens
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+class ContextCompactor:
+    """
+    Builds the prompt view of the message history for a single LLM call.
+    The checkpointed state is never modified, only the list sent to the model:
+    - the last `keep_last_steps` agent steps (AIMessage + its ToolMessages) stay verbatim,
+    - older tool outputs are cut to `tool_output_chars`,
+    - if still over `budget_tokens`, the oldest steps are replaced by a one-line summary each.
+    Human and system messages are always kept.
+    """
+
+    def __init__(self, budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+                 keep_last_steps: int = DEFAULT_KEEP_LAST_STEPS,
+                 tool_output_chars: int = DEFAULT_TOOL_OUTPUT_CHARS):
+        self.budget_tokens = budget_tokens
+        self.keep_last_steps = keep_last_steps
+        self.tool_output_chars = tool_output_chars
+
+    @classmethod
+    def from_config(cls, settings: dict) -> "ContextCompactor":
+        settings = settings or {}
+        return cls(
+            budget_tokens=int(settings.get("budget_tokens", DEFAULT_BUDGET_TOKENS)),
+            keep_last_steps=int(settings.get("keep_last_steps", DEFAULT_KEEP_LAST_STEPS)),
+            tool_output_chars=int(settings.get("tool_output_chars", DEFAULT_TOOL_OUTPUT_CHARS))
+        )
+
+    @staticmethod
+    def _group(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+        """Splits history into units; an AIMessage and its ToolMessages are never separated."""
+        units: List[List[BaseMessage]] = []
+        for message in messages:
+            if isinstance(message, ToolMessage) and units and isinstance(units[-1][0], AIMessage):
+                units[-1].append(message)
+            else:
+                units.append([message])
+        return units
+
+    def _trim(self, message: BaseMessage) -> BaseMessage:
+        content = _text(message.content)
+        if not isinstance(message, ToolMessage) or len(content) <= self.tool_output_chars:
+            return message
+        trimmed = (
+            f"{content[:self.tool_output_chars]}\n"
+            f"[... {len(content) - self.tool_output_chars} chars trimmed from an earlier step. "
+            "Call the tool again if you need the full output.]"
+        )
+        return message.model_copy(update={"content": trimmed})
+
+    @staticmethod
+    def _summarize(unit: List[BaseMessage]) -> str:
+        ai_message = unit[0]
+        lines = []
+        if ai_message.content:
+            lines.append(f"- thought: {_text(ai_message.content)[:200]}")
+        results = {m.tool_call_id: m for m in unit[1:]}
+        for tool_call in getattr(ai_message, "tool_calls", None) or []:
+            args = json.dumps(tool_call["args"])[:150]
+            result = results.get(tool_call["id"])
+            outcome = f"{len(_text(result.content))} chars, status={result.status}" if result else "no result"
+            lines.append(f"- {tool_call['name']}({args}) -> {outcome}")
+        return "\n".join(lines)
+
+    def compact(self, messages: Sequence[BaseMessage]) -> Tuple[List[BaseMessage], int]:
+        """Returns the compacted message list and its estimated token count."""
+        units = self._group(messages)
+        step_indexes = [i for i, unit in enumerate(units) if isinstance(unit[0], AIMessage)]
+        if self.keep_last_steps <= 0:
+            protected_from = len(units)
+        elif len(step_indexes) >= self.keep_last_steps:
+            protected_from = step_indexes[-self.keep_last_steps]
+        else:
+            protected_from = 0
+
+        # 1. Trim old tool outputs
+        units = [
+            [self._trim(m) for m in unit] if i < protected_from else unit
+            for i, unit in enumerate(units)
+        ]
+        sizes = [sum(message_tokens(m) for m in unit) for unit in units]
+        total = sum(sizes)
+
+        # 2. Replace the oldest steps by a summary line until the budget is met
+        dropped, lines = [], []
+        for i in step_indexes:
+            if total <= self.budget_tokens or i >= protected_from:
+                break
+            line = self._summarize(units[i])
+            dropped.append(i)
+            lines.append(line)
+            total += estimate_tokens(line) - sizes[i]
+
+        if not dropped:
+            return [m for unit in units for m in unit], total
+
+        header = "Earlier steps (compacted to save context):"
+        summary = SystemMessage(content="\n".join([header, *lines]))
+        total += MESSAGE_OVERHEAD_TOKENS + estimate_tokens(header)
+
+        dropped_set = set(dropped)
+        compacted: List[BaseMessage] = []
+        for i, unit in enumerate(units):
+            if i == dropped[0]:
+                compacted.append(summary)
+            if i not in dropped_set:
+                compacted.extend(unit)
+        return compacted, total
@@ -0,0 +1,13 @@
+import yaml
+
+from functools import lru_cache
+from pathlib import Path
+
+CONFIG_PATH = Path(__file__).parent.parent.parent / "mcp_config.yaml"
+
+
+@lru_cache(maxsize=1)
+def load_config() -> dict:
+    """Loads mcp_config.yaml once. Callers must not mutate the result."""
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f) or {}
@@ -1,7 +1,15 @@
+import os
+import asyncio
+
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from app.core.agent import AgentManager
+from app.core.approvals import APPROVAL_NODE, ApprovalIndex
+from app.core.batch_store import BatchStore
+from app.core.checkpointer import open_checkpointer
+from app.core.config import load_config
+from app.core.startup import ATTACHING, StartupTracker
+from app.core.thread_lock import ThreadLeaseManager
+from app.core.tool_executor import ParallelToolNode, ToolLimits
 from app.schemas.workflow.agent_state import AgentState
 from app.core.mcp_manager import MCPHubManager
 
@@ -11,7 +19,7 @@ mcp_hub = MCPHubManager()
 
 
 def should_continue(state: AgentState):
-    if state.get("total_tokens", 0) > 30000:
+    if manager.scheduler.budget_exhausted(state.get("total_tokens", 0)):
         return END
 
     messages = state['messages']
@@ -22,7 +30,7 @@ def should_continue(state: AgentState):
 
     for tool_call in last_message.tool_calls:
         if tool_call["name"] == "save_report_to_disk":
-            return "human_approval"
+            return APPROVAL_NODE
 
     return "tools"
 
@@ -32,33 +40,45 @@ def human_approval(state: AgentState):
 
 
 # --- INFRASTRUCTURE ---
-DB_PATH = "checkpoints.db"
-saver_context = AsyncSqliteSaver.from_conn_string(DB_PATH)
+# Every worker of a multi-worker deployment must point at the same file
+DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+# Set AGENT_ASYNC_MODEL=false to fall back to the blocking call_model node
+ASYNC_MODEL = os.getenv("AGENT_ASYNC_MODEL", "true").lower() != "false"
+# background: serve right away with the local tools and attach MCP tools when their servers are up.
+# eager: wait for every MCP server before serving (STARTUP_MODE overrides the config)
+STARTUP_MODE = os.getenv("STARTUP_MODE", (load_config().get("startup") or {}).get("mode", "background")).lower()
+saver_context = open_checkpointer(DB_PATH, load_config().get("checkpoints"))
+# Stops two requests (in any worker) from running the same thread_id at once
+thread_leases = ThreadLeaseManager(DB_PATH, load_config().get("deployment", {}).get("lease_ttl", 60))
+# Batch jobs and their state, resumable from any worker
+batch_store = BatchStore(DB_PATH)
+# Threads paused before human_approval, for GET /approvals and bulk approvals
+approval_index = ApprovalIndex(DB_PATH)
+startup = StartupTracker()
+# Tool and MCP server concurrency limits and tool stats, kept across recompiles
+tool_limits = ToolLimits((load_config().get("tool_execution") or {}).get("max_concurrency"))
+checkpointer = None
 app_graph = None
+tool_node = None
 
 
-async def initialize_graph():
+def compile_graph():
     """
-    It initializes MCP, updates the tools, and compiles the graph dynamically.
+    Compiles the graph with the agent's current tools. Runs already in
+    progress keep the graph they started with; new ones get this one.
     """
-    global app_graph
-
-    # 1. MCP Connection
-    await mcp_hub.connect()
-
-    # 2. Get remote tools and update Manager
-    remote_tools = await mcp_hub.get_all_mcp_tools()
-    manager.update_tools(remote_tools)
+    global app_graph, tool_node
 
-    # 3. Initilize graph
+    # 1. Initilize graph
     workflow = StateGraph(AgentState)
 
-    # 4. Adding Nodes
-    workflow.add_node("agent", manager.call_model)
-    workflow.add_node("tools", ToolNode(manager.all_tools))
-    workflow.add_node("human_approval", human_approval)
+    # 2. Adding Nodes
+    workflow.add_node("agent", manager.acall_model if ASYNC_MODEL else manager.call_model)
+    node = ParallelToolNode.from_hub(manager.all_tools, mcp_hub, load_config().get("tool_execution"), tool_limits)
+    workflow.add_node("tools", node)
+    workflow.add_node(APPROVAL_NODE, human_approval)
 
-    # 5. Edges
+    # 3. Edges
     workflow.set_entry_point("agent")
 
     workflow.add_conditional_edges(
@@ -66,20 +86,105 @@ async def initialize_graph():
         should_continue,
         {
             "tools": "tools",
-            "human_approval": "human_approval",
+            APPROVAL_NODE: APPROVAL_NODE,
             END: END
         }
     )
 
-    workflow.add_edge("human_approval", "tools")
+    workflow.add_edge(APPROVAL_NODE, "tools")
     workflow.add_edge("tools", "agent")
 
-    # 6. Compile Checkpointer
-    checkpointer = await saver_context.__aenter__()
+    # 4. Compile with the shared checkpointer
     app_graph = workflow.compile(
         checkpointer=checkpointer,
-        interrupt_before=["human_approval"]
+        interrupt_before=[APPROVAL_NODE]
     )
+    tool_node = node
+    return app_graph
 
+
+async def attach_mcp_tools(strict: bool = False):
+    """
+    Connects the MCP servers (concurrently), adds their tools to the agent and
+    recompiles. A failure leaves the local tools in place, or is raised if strict.
+    """
+    startup.mcp_state = ATTACHING
+    # Otherwise the first request imports langchain_groq on the event loop
+    preload = asyncio.create_task(asyncio.to_thread(manager.preload_client), name="model-client-import")
+    try:
+        with startup.phase("mcp_connect"):
+            await mcp_hub.connect()
+        with startup.phase("mcp_list_tools"):
+            remote_tools = await mcp_hub.get_all_mcp_tools()
+        with startup.phase("bind_tools"):
+            manager.update_tools(remote_tools)
+        with startup.phase("recompile"):
+            compile_graph()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        startup.mcp_done(e)
+        if strict:
+            raise
+        print(f"--- [GRAPH ERROR] MCP tools could not be attached, serving local tools only: {e} ---")
+        return
+    finally:
+        # Its thread cannot be interrupted: wait for it rather than leave it running
+        for result in await asyncio.gather(preload, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"--- [GRAPH ERROR] Preloading the model client failed: {result} ---")
+    startup.mcp_done()
     print("--- [GRAPH] Compiled successfully with local and MCP tools ---")
-    return app_graph
\ No newline at end of file
+
+
+async def wait_until_ready():
+    """Waits for the background MCP attach, if one is running."""
+    if startup.mcp_task is not None:
+        await asyncio.shield(startup.mcp_task)
+
+
+async def stop_background_startup():
+    if startup.mcp_task is not None and not startup.mcp_task.done():
+        startup.mcp_task.cancel()
+        await asyncio.gather(startup.mcp_task, return_exceptions=True)
+
+
+async def initialize_graph():
+    """
+    Opens the stores and compiles the graph. In background mode the graph is
+    compiled with the local tools first, so the API serves right away, and
+    the MCP tools are attached by a background task that recompiles it.
+    """
+    global checkpointer
+
+    # 1. Checkpoints, leases, batches and pending approvals share one SQLite file
+    with startup.phase("storage"):
+        checkpointer = await saver_context.__aenter__()
+        await asyncio.gather(thread_leases.open(), batch_store.open(), approval_index.open())
+
+    if STARTUP_MODE == "eager":
+        # The API does not start without its MCP tools
+        try:
+            await attach_mcp_tools(strict=True)
+        except BaseException:
+            await close_graph()
+            raise
+    else:
+        # 2. Serve with the local tools while the MCP servers start
+        with startup.phase("compile"):
+            compile_graph()
+        startup.mcp_state = ATTACHING
+        startup.mcp_task = asyncio.create_task(attach_mcp_tools(), name="mcp-attach")
+        print("--- [GRAPH] Compiled with local tools, attaching MCP tools in the background ---")
+
+    startup.graph_ready()
+    return app_graph
+
+
+async def close_graph():
+    """Closes what initialize_graph opened: the stores and the MCP sessions."""
+    await batch_store.close()
+    await approval_index.close()
+    await thread_leases.close()
+    await saver_context.__aexit__(None, None, None)
+    await mcp_hub.disconnect()
@@ -1,86 +1,195 @@
 import os
-import yaml
+import asyncio
 
-from pathlib import Path
-from typing import Dict, List
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple
 from langchain_core.tools import StructuredTool
-from contextlib import AsyncExitStack
 from pydantic import create_model
+from app.core.config import load_config
+from app.core.mcp_pool import MCPSessionPool
+from app.core.prefetch import FetchPrefetcher, result_urls
+from app.core.product_extraction import FetchExtraction
 from app.core.security import SQLSecurityValidator
+from app.core.telemetry import telemetry
+from app.core.tool_cache import ToolResultCache
+from app.tools.search_tools import SEARCH_TOOL_NAME
 from pydantic import Field
 
+fetch_extractions = telemetry.registry.counter(
+    "agent_fetch_extraction_total", "Page fetches by extraction outcome (products, price_mentions, no_prices, page_text)"
+)
+fetch_chars = telemetry.registry.counter(
+    "agent_fetch_chars_total", "Characters of fetched pages and of what the model got instead"
+)
+
 
 class MCPHubManager:
     def __init__(self):
-        self.exit_stack = AsyncExitStack()
-        self.session_configs: Dict[ClientSession, dict] = {}
-        self.sessions: List[ClientSession] = []
+        self.pools: Dict[str, MCPSessionPool] = {}
+        self.server_tools: Dict[str, List[str]] = {}
         self.config = self._load_config()
+        self.cache = ToolResultCache.from_config(self.config)
+        # Fetch results are reduced to the products and prices found on the page
+        self.extraction = FetchExtraction.from_config(self.config)
+        self.tool_params: Dict[str, Set[str]] = {}
+        # Top search results are fetched while the model decides which pages to read
+        self.prefetcher = FetchPrefetcher.from_config(self.config)
+        # Set in multi-worker deployments: sessions go to the per-host gateway (app/mcp_gateway.py)
+        self.gateway_url = os.getenv("MCP_GATEWAY_URL") or self.config.get("deployment", {}).get("mcp_gateway_url")
 
     def _load_config(self) -> dict:
-        config_path = Path(__file__).parent.parent.parent / "mcp_config.yaml"
-        with open(config_path, "r") as f:
-            return yaml.safe_load(f)
+        return load_config()
+
+    async def _connect_server(self, name: str, settings: dict):
+        if self.gateway_url:
+            settings = {**settings, "url": f"{self.gateway_url.rstrip('/')}/{name}/sse"}
+        pool = MCPSessionPool(name, settings)
+        try:
+            await pool.start()
+            self.pools[name] = pool
+            via = f" via {self.gateway_url}" if self.gateway_url else ""
+            print(f"--- [MCP HUB] Connected to {name} (pool size {pool.size}){via} ---")
+        except Exception as e:
+            print(f"--- [MCP HUB ERROR] Failed to connect to {name}: {e} ---")
 
     async def connect(self):
-        """Conecta a todos los servidores definidos en el YAML."""
-        for name, settings in self.config["mcp_servers"].items():
-            try:
-                server_params = StdioServerParameters(
-                    command=settings["command"],
-                    args=settings["args"],
-                    env=os.environ.copy()
-                )
-
-                # Cada servidor tiene su propio stream y sesión
-                read_stream, write_stream = await self.exit_stack.enter_async_context(
-                    stdio_client(server_params)
-                )
-                session = await self.exit_stack.enter_async_context(
-                    ClientSession(read_stream, write_stream)
-                )
-
-                await session.initialize()
-                self.sessions.append(session)
-                print(f"--- [MCP HUB] Connected to {name} ---")
-                self.session_configs[session] = settings
-            except Exception as e:
-                print(f"--- [MCP HUB ERROR] Failed to connect to {name}: {e} ---")
+        """Conecta a todos los servidores definidos en el YAML, en paralelo."""
+        await asyncio.gather(*(
+            self._connect_server(name, settings)
+            for name, settings in self.config["mcp_servers"].items()
+        ))
 
-    async def _mcp_tool_executor(self, session: ClientSession, name: str, **kwargs):
+    async def _mcp_tool_executor(self, pool: MCPSessionPool, name: str, **kwargs):
         """Validador de seguridad y ejecutor."""
         query = kwargs.get("query") or kwargs.get("sql")
-        if query and not SQLSecurityValidator.validate_query(str(query)):
-            return SQLSecurityValidator.get_security_error_message()
-
-        result = await session.call_tool(name, kwargs)
+        sql = SQLSecurityValidator.classify(str(query)) if query else None
+        if sql and not sql.allowed:
+            return SQLSecurityValidator.get_security_error_message(sql.reason)
+
+        # Write queries are never cached and make this server's cached reads stale
+        read_only = sql is None or sql.read_only
+        cacheable = read_only and self.cache.ttl_for(name) > 0
+
+        # A page prefetched after the last search is newer than a cached fetch of it
+        text, is_error = None, False
+        if self.prefetcher.servable(name, kwargs):
+            text = await self.prefetcher.take(kwargs["url"])
+        if text is None and cacheable:
+            cached = await self.cache.get(name, kwargs)
+            if cached is not None:
+                return cached
+
+        try:
+            if text is None:
+                with telemetry.span("mcp", f"{pool.name}/{name}"):
+                    text, is_error = await self._call_tool(pool, name, kwargs)
+        except asyncio.TimeoutError:
+            return (
+                f"ERROR: The '{pool.name}' MCP server did not answer within {pool.call_timeout}s. "
+                "The call was aborted. Retry once or continue with the data you already have."
+            )
+
+        if cacheable and not is_error:
+            await self.cache.put(name, kwargs, text)
+        elif not read_only:
+            await self.cache.invalidate(self.server_tools.get(pool.name, []))
+        return text
+
+    @staticmethod
+    def _result_text(result) -> str:
         return "\n".join([c.text for c in result.content if hasattr(c, 'text')])
 
+    async def _call_tool(self, pool: MCPSessionPool, name: str, arguments: dict) -> Tuple[str, bool]:
+        """
+        Calls the tool. Page fetches are asked for the whole raw page and
+        answered with the products and prices extracted from it; pages with no
+        price get the visible text of that same HTML. page_text=true, raw=true
+        and later chunks (start_index) get the tool's own output.
+        """
+        arguments = dict(arguments)
+        page_text = bool(arguments.pop("page_text", False))
+        if not self.extraction.applies(name):
+            result = await pool.call_tool(name, arguments)
+            return self._result_text(result), bool(result.isError)
+
+        if page_text or self.extraction.wants_page(arguments):
+            result = await pool.call_tool(name, arguments)
+            fetch_extractions.inc(tool=name, outcome="page_text")
+            return self._result_text(result), bool(result.isError)
+
+        page_arguments = self.extraction.page_arguments(arguments, self.tool_params.get(name, set()))
+        result = await pool.call_tool(name, page_arguments)
+        page = self._result_text(result)
+        if result.isError:
+            return page, True
+
+        url = str(arguments.get("url", ""))
+        summary, text = self.extraction.summarize(page, url)
+        fetch_chars.inc(len(page), tool=name, stage="fetched")
+        if summary is not None:
+            text = self.extraction.render(summary)
+            fetch_extractions.inc(tool=name, outcome="products" if "products" in summary else "price_mentions")
+            fetch_chars.inc(len(text), tool=name, stage="returned")
+            return text, False
+
+        # No price on the page: its text, from the HTML already fetched rather than a second request
+        fetch_extractions.inc(tool=name, outcome="no_prices")
+        if page_arguments != arguments:
+            page = self.extraction.page_text(text, url, arguments.get("max_length"))
+        fetch_chars.inc(len(page), tool=name, stage="returned")
+        return page, False
+
+    async def _prefetch(self, pool: MCPSessionPool, name: str, url: str) -> str:
+        with telemetry.span("prefetch", f"{pool.name}/{name}"):
+            text, is_error = await self._call_tool(pool, name, {"url": url})
+        if is_error:
+            raise RuntimeError(text)
+        return text
+
+    def observe_tool_result(self, tool_name: str, content: str):
+        """Called by the tools node with each successful tool result."""
+        if tool_name == SEARCH_TOOL_NAME:
+            self.prefetcher.schedule(result_urls(content, self.prefetcher.top_k))
+
     async def get_all_mcp_tools(self) -> list:
         all_langchain_tools = []
+        pools = list(self.pools.values())
+        # One round-trip per server, all at once
+        listings = await asyncio.gather(*(pool.list_tools() for pool in pools))
 
-        for session in self.sessions:
+        for pool, mcp_tools in zip(pools, listings):
             # Recuperamos la metadata específica de este servidor desde el YAML
-            server_settings = self.session_configs.get(session, {})
-            custom_context = server_settings.get("custom_metadata", {}).get("db_context", "")
+            custom_context = pool.settings.get("custom_metadata", {}).get("db_context", "")
 
-            mcp_tools = await session.list_tools()
+            self.server_tools[pool.name] = [tool.name for tool in mcp_tools.tools]
             for tool in mcp_tools.tools:
                 # Inyectamos el contexto solo si la herramienta parece ser de SQL o si es relevante
                 fields = {}
-                for k, v in tool.inputSchema.get("properties", {}).items():
+                properties = tool.inputSchema.get("properties", {})
+                required = set(tool.inputSchema.get("required", properties))
+                self.tool_params[tool.name] = set(properties)
+                for k, v in properties.items():
                     desc = v.get("description", "")
                     if custom_context and any(kw in k.lower() for kw in ["query", "sql", "url"]):
                         desc = f"{desc}. {custom_context}"
-                    fields[k] = (object, Field(..., description=desc))
+                    # Optional arguments are only sent when the model sets them
+                    if k in required:
+                        fields[k] = (object, Field(..., description=desc))
+                    else:
+                        fields[k] = (Optional[object], Field(None, description=desc))
+                if self.extraction.applies(tool.name):
+                    fields["page_text"] = (bool, Field(False, description=(
+                        "Return the page text instead of the products and prices extracted from it."
+                    )))
+
+                if tool.name == self.prefetcher.tool:
+                    self.prefetcher.attach(partial(self._prefetch, pool, tool.name))
 
                 args_model = create_model(f"{tool.name}Args", **fields)
 
-                # Definimos el runner con closure para capturar la sesión correcta
-                async def runner(tool_name=tool.name, tool_session=session, **kwargs):
-                    return await self._mcp_tool_executor(tool_session, tool_name, **kwargs)
+                # Definimos el runner con closure para capturar el pool correcto
+                async def runner(tool_name=tool.name, tool_pool=pool, **kwargs):
+                    return await self._mcp_tool_executor(tool_pool, tool_name, **kwargs)
 
                 all_langchain_tools.append(
                     StructuredTool.from_function(
@@ -93,4 +202,6 @@ class MCPHubManager:
         return all_langchain_tools
 
     async def disconnect(self):
-        await self.exit_stack.aclose()
\ No newline at end of file
+        await self.prefetcher.close()
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+        self.pools.clear()
@@ -0,0 +1,251 @@
+import os
+import asyncio
+
+from typing import Callable, List, Optional, Set
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from app.core.cancellation import aborted
+
+DEFAULT_POOL_SIZE = 1
+DEFAULT_CALL_TIMEOUT = 60.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+# A healthy server answers a ping at once; this is how long an idle session can be out of the pool for one
+PING_TIMEOUT = 5.0
+STARTUP_TIMEOUT = 60.0
+RESPAWN_BACKOFF_MAX = 30.0
+
+
+class PooledSession:
+    """
+    A single MCP connection (a stdio subprocess, or an SSE stream to the
+    per-host gateway) and its ClientSession.
+    The transport/session contexts are entered and exited by one owner task,
+    because anyio cancel scopes cannot be closed from a different task.
+    """
+
+    def __init__(self, server_name: str, transport: Callable, index: int):
+        self.server_name = server_name
+        self.transport = transport
+        self.index = index
+        self.session: Optional[ClientSession] = None
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-{self.server_name}-{self.index}")
+        await asyncio.wait_for(self._ready.wait(), timeout=STARTUP_TIMEOUT)
+        if self.session is None:
+            raise self.error or RuntimeError(f"MCP server '{self.server_name}' exited during startup")
+
+    async def _run(self):
+        try:
+            async with self.transport() as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self):
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+
+
+class MCPSessionPool:
+    """
+    Fixed-size pool of sessions for one MCP server.
+    Each session is its own subprocess, so concurrent tool calls run in parallel.
+    With a `url` in the settings, sessions connect to the MCP gateway over SSE
+    instead, and the subprocesses are shared by every worker on the host.
+    Hung or dead sessions are detected (call timeout / periodic ping) and respawned.
+    """
+
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.settings = settings
+        self.size = max(1, int(settings.get("pool_size", DEFAULT_POOL_SIZE)))
+        self.call_timeout = float(settings.get("call_timeout", DEFAULT_CALL_TIMEOUT))
+        self.health_check_interval = float(settings.get("health_check_interval", DEFAULT_HEALTH_CHECK_INTERVAL))
+        self.respawn_count = 0
+
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._members: List[PooledSession] = []
+        self._background: Set[asyncio.Task] = set()
+        self._health_task: Optional[asyncio.Task] = None
+        self._next_index = 0
+        self._closed = False
+
+    def _new_member(self) -> PooledSession:
+        if self.settings.get("url"):
+            url = self.settings["url"]
+            transport = lambda: sse_client(url, sse_read_timeout=self.call_timeout + 300)
+        else:
+            params = StdioServerParameters(
+                command=self.settings["command"],
+                args=self.settings["args"],
+                env=os.environ.copy()
+            )
+            transport = lambda: stdio_client(params)
+        self._next_index += 1
+        return PooledSession(self.name, transport, self._next_index)
+
+    def _spawn_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @property
+    def healthy_count(self) -> int:
+        return sum(1 for m in self._members if m.alive)
+
+    async def start(self):
+        """Starts all sessions concurrently. Fails only if none of them came up."""
+        members = [self._new_member() for _ in range(self.size)]
+        results = await asyncio.gather(*(m.start() for m in members), return_exceptions=True)
+
+        errors = []
+        for member, result in zip(members, results):
+            self._members.append(member)
+            if isinstance(result, BaseException):
+                errors.append(result)
+                self._spawn_background(self._replace(member))
+            else:
+                self._idle.put_nowait(member)
+
+        if len(errors) == len(members):
+            await self.close()
+            raise errors[0]
+
+        self._health_task = asyncio.create_task(self._health_loop(), name=f"mcp-{self.name}-health")
+        print(f"--- [MCP POOL] {self.name}: {self.size - len(errors)}/{self.size} sessions ready ---")
+
+    async def _acquire(self) -> PooledSession:
+        while True:
+            member = await asyncio.wait_for(self._idle.get(), timeout=self.call_timeout)
+            if member.alive:
+                return member
+            self._spawn_background(self._replace(member))
+
+    def _release(self, member: PooledSession):
+        if member.alive and not self._closed:
+            self._idle.put_nowait(member)
+        else:
+            self._spawn_background(self._replace(member))
+
+    async def _replace(self, member: PooledSession):
+        """Closes a broken session and respawns it with exponential backoff."""
+        await member.close()
+        if member in self._members:
+            self._members.remove(member)
+
+        backoff = 1.0
+        while not self._closed:
+            fresh = self._new_member()
+            try:
+                await fresh.start()
+            except asyncio.CancelledError:
+                # The pool is closing: don't leave a subprocess behind
+                await fresh.close()
+                raise
+            except Exception as e:
+                print(f"--- [MCP POOL ERROR] {self.name}: respawn failed ({e}), retrying in {backoff}s ---")
+                await fresh.close()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, RESPAWN_BACKOFF_MAX)
+                continue
+
+            self.respawn_count += 1
+            self._members.append(fresh)
+            self._idle.put_nowait(fresh)
+            print(f"--- [MCP POOL] {self.name}: respawned session #{fresh.index} ---")
+            return
+
+    async def call_tool(self, tool_name: str, arguments: dict):
+        member = await self._acquire()
+        call = asyncio.ensure_future(member.session.call_tool(tool_name, arguments))
+        try:
+            result = await asyncio.wait_for(asyncio.shield(call), self.call_timeout)
+        except McpError:
+            # Error reported by a healthy server: the session is still usable
+            self._release(member)
+            raise
+        except asyncio.CancelledError:
+            # The caller gave up (its run was cancelled). MCP servers of this SDK version
+            # cannot abort a request, so the session rejoins the pool once it has answered
+            aborted("mcp")
+            self._spawn_background(self._drain(member, call))
+            raise
+        except Exception:
+            # Timeouts and broken pipes leave the subprocess in an unknown state.
+            # It is torn down in the background so the caller gets the error right away.
+            call.cancel()
+            self._spawn_background(self._replace(member))
+            raise
+
+        self._release(member)
+        return result
+
+    async def _drain(self, member: PooledSession, call: asyncio.Future):
+        """Waits for the answer to an abandoned call, so the next caller gets an idle session."""
+        try:
+            await asyncio.wait_for(call, self.call_timeout)
+        except McpError:
+            pass
+        except Exception:
+            await self._replace(member)
+            return
+        self._release(member)
+
+    async def list_tools(self):
+        member = await self._acquire()
+        try:
+            return await asyncio.wait_for(member.session.list_tools(), self.call_timeout)
+        finally:
+            self._release(member)
+
+    async def _health_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+
+            # Only idle sessions are pinged, all at once; busy ones are covered by the call timeout
+            idle = []
+            while not self._idle.empty():
+                idle.append(self._idle.get_nowait())
+            await asyncio.gather(*(self._check(member) for member in idle))
+
+    async def _check(self, member: PooledSession):
+        """Pings an idle session and puts it back (or respawns it) as soon as it answers."""
+        try:
+            await asyncio.wait_for(member.session.send_ping(), timeout=min(PING_TIMEOUT, self.call_timeout))
+        except Exception:
+            print(f"--- [MCP POOL] {self.name}: session #{member.index} failed health check ---")
+            await member.close()
+        self._release(member)
+
+    async def close(self):
+        self._closed = True
+        tasks = [task for task in [self._health_task, *self._background] if task]
+        for task in tasks:
+            task.cancel()
+        # Respawns still starting close their session before the members below are closed
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(m.close() for m in self._members), return_exceptions=True)
+        self._members.clear()
@@ -0,0 +1,171 @@
+import re
+import time
+import asyncio
+import contextvars
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urldefrag, urlsplit
+from app.core.rate_limiter import TokenBucket
+from app.core.telemetry import telemetry
+
+prefetches = telemetry.registry.counter(
+    "agent_prefetch_total",
+    "Speculative page fetches by outcome (started, skipped_budget, hit, joined, miss, wasted, failed)"
+)
+
+# "[1] https://..." lines of web_search_tool output; numbering restarts for every query
+RESULT_URL = re.compile(r"^\[(\d+)\] (https?://\S+)$", re.MULTILINE)
+
+
+def result_urls(text: str, top_k: int) -> List[str]:
+    """URLs of the top_k results of each search in a web_search_tool output."""
+    return [url for rank, url in RESULT_URL.findall(text) if int(rank) <= top_k]
+
+
+def url_key(url: str) -> str:
+    return urldefrag(url.strip())[0]
+
+
+class FetchPrefetcher:
+    """
+    Speculative fetches of the top search results, started as soon as
+    web_search_tool returns while the model is still choosing which pages to
+    read. The fetch runner checks here first: a finished prefetch is served
+    right away and a running one is joined. Prefetches are limited per domain,
+    in total and by a per-minute budget; the ones nobody asks for within
+    `ttl` seconds are counted as wasted.
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or {}
+        self.enabled = bool(settings.get("enabled", False))
+        self.tool = settings.get("tool", "fetch")
+        self.top_k = int(settings.get("top_k", 2))
+        self.per_domain = max(1, int(settings.get("per_domain_concurrency", 1)))
+        self.ttl = float(settings.get("ttl", 300))
+        self.max_entries = int(settings.get("max_entries", 100))
+        self.budget = TokenBucket(settings.get("budget_per_minute", 30))
+        self.semaphore = asyncio.Semaphore(max(1, int(settings.get("max_concurrency", 2))))
+        # url -> {"task", "created", "used"}, oldest first
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        # domain -> [semaphore, prefetches holding or waiting for it]
+        self._domains: Dict[str, list] = {}
+        self._fetch: Optional[Callable[[str], Awaitable[str]]] = None
+        self._stats = {
+            "started": 0, "skipped_budget": 0, "hit": 0, "joined": 0, "miss": 0, "wasted": 0, "failed": 0
+        }
+
+    @classmethod
+    def from_config(cls, config: dict) -> "FetchPrefetcher":
+        return cls(config.get("prefetch"))
+
+    def attach(self, fetch: Callable[[str], Awaitable[str]]):
+        """Sets the call that fetches a page, once the fetch tool is available."""
+        self._fetch = fetch
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self._fetch is not None
+
+    def _count(self, outcome: str, amount: int = 1):
+        self._stats[outcome] += amount
+        prefetches.inc(amount, outcome=outcome)
+
+    def servable(self, tool_name: str, arguments: dict) -> bool:
+        """Only plain fetches of a URL match a prefetch (no raw HTML, offsets or page_text)."""
+        given = {k for k, v in arguments.items() if v is not None and v is not False}
+        return self.active and tool_name == self.tool and given == {"url"}
+
+    def schedule(self, urls: Iterable[str]):
+        """Starts prefetching the URLs not already prefetched, within the budget."""
+        if not self.active:
+            return
+        self._expire()
+        for url in dict.fromkeys(url_key(u) for u in urls):
+            if url in self.entries:
+                continue
+            now = time.monotonic()
+            if self.budget.delay(1, now) > 0:
+                self._count("skipped_budget")
+                continue
+            self.budget.take(1, now)
+            # Not part of the run that searched: cancelling that run leaves the prefetch alone
+            task = asyncio.create_task(self._run(url), name=f"prefetch-{url}", context=contextvars.Context())
+            # Failures are reported when (if) the page is asked for
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.entries[url] = {"task": task, "created": now, "used": False}
+            self._count("started")
+        while len(self.entries) > self.max_entries:
+            self._evict(next(iter(self.entries)))
+
+    async def _run(self, url: str) -> str:
+        domain = urlsplit(url).hostname or ""
+        slot = self._domains.setdefault(domain, [asyncio.Semaphore(self.per_domain), 0])
+        slot[1] += 1
+        try:
+            async with slot[0], self.semaphore:
+                return await self._fetch(url)
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                self._domains.pop(domain, None)
+
+    async def take(self, url: str) -> Optional[str]:
+        """The prefetched page, waiting for it if it is still being fetched. None on a miss or failure."""
+        self._expire()
+        entry = self.entries.get(url_key(url))
+        if entry is None:
+            self._count("miss")
+            return None
+
+        task = entry["task"]
+        outcome = "hit" if task.done() else "joined"
+        try:
+            # Another thread may be waiting for the same page
+            text = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            text = None
+        except Exception:
+            text = None
+        if text is None:
+            # The caller fetches the page itself
+            self.entries.pop(url_key(url), None)
+            self._count("failed")
+            return None
+        entry["used"] = True
+        self._count(outcome)
+        return text
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        while self.entries:
+            url, entry = next(iter(self.entries.items()))
+            if entry["created"] > deadline:
+                break
+            self._evict(url)
+
+    def _evict(self, url: str):
+        entry = self.entries.pop(url)
+        if not entry["used"]:
+            entry["task"].cancel()
+            self._count("wasted")
+
+    async def close(self):
+        tasks = [entry["task"] for entry in self.entries.values()]
+        self.entries.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        served = self._stats["hit"] + self._stats["joined"]
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "hit_rate": round(served / (served + self._stats["miss"]), 3) if served + self._stats["miss"] else 0.0,
+            "waste_rate": round(self._stats["wasted"] / self._stats["started"], 3) if self._stats["started"] else 0.0
+        }
@@ -0,0 +1,460 @@
+import re
+import json
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+# Elements whose text is not part of the visible page
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "svg", "title"}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"
+}
+BLOCK_TAGS = {
+    "p", "div", "li", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "header",
+    "footer", "table", "ul", "ol", "dd", "dt", "main", "aside", "nav", "form", "button"
+}
+
+CURRENCY_SYMBOLS = {"US$": "USD", "C$": "CAD", "A$": "AUD", "$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+CURRENCY_CODES = ("USD", "EUR", "GBP", "CAD", "AUD", "JPY", "INR", "MXN", "CHF")
+
+_CURRENCY = "|".join(
+    [re.escape(symbol) for symbol in sorted(CURRENCY_SYMBOLS, key=len, reverse=True)] + list(CURRENCY_CODES)
+)
+_AMOUNT = r"\d{1,3}(?:[,.\u00a0\u202f]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?"
+# "$1,999.99", "USD 1999", "1.999,99 €", "1 999,99 EUR" (non-breaking space)
+PRICE_PATTERN = re.compile(
+    rf"(?<![\w$€£¥₹])(?:(?P<cur1>{_CURRENCY})\s?(?P<amt1>{_AMOUNT})|(?P<amt2>{_AMOUNT})\s?(?P<cur2>{_CURRENCY}))(?![\w])"
+)
+FETCH_PREFIX = re.compile(r"^(?:[^\n]*\n)?Contents of \S+:\n")
+FETCH_TRUNCATED = re.compile(r"\n*<error>Content truncated\..*?</error>\s*$", re.DOTALL)
+
+
+def parse_amount(text, decimal_point: bool = False) -> Optional[Decimal]:
+    """
+    Price as a Decimal from "1,999.99", "1.999,99", "1 999", "1999" or a
+    number. The last separator followed by one or two digits is the decimal
+    point. With decimal_point (schema.org values) "1999.990" is read as is.
+    """
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        text = str(text)
+    if not isinstance(text, str):
+        return None
+    text = re.sub(r"[\s\u202f]", "", text)
+    if decimal_point and re.fullmatch(r"\d+(?:\.\d+)?", text):
+        return Decimal(text)
+    if not re.fullmatch(r"\d[\d.,]*", text):
+        return None
+
+    last = max(text.rfind(","), text.rfind("."))
+    if last != -1 and 1 <= len(text) - last - 1 <= 2:
+        integer, fraction = text[:last], text[last + 1:]
+    else:
+        integer, fraction = text, ""
+    integer = re.sub(r"[.,]", "", integer)
+    try:
+        return Decimal(f"{integer}.{fraction or '0'}")
+    except InvalidOperation:
+        return None
+
+
+def _money(amount: Decimal) -> str:
+    return str(amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def to_cents(amount: Decimal) -> int:
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _types(node: dict) -> List[str]:
+    value = node.get("@type") or node.get("type") or []
+    values = value if isinstance(value, list) else str(value).split()
+    # "http://schema.org/Product" -> "Product"
+    return [str(v).rstrip("/").rsplit("/", 1)[-1] for v in values]
+
+
+def _text(value) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("@id")
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if value is None:
+        return None
+    value = " ".join(str(value).split())
+    return value or None
+
+
+def _availability(value) -> Optional[str]:
+    value = _text(value)
+    return value.rstrip("/").rsplit("/", 1)[-1] if value else None
+
+
+class _PageParser(HTMLParser):
+    """
+    One pass over the page: JSON-LD blocks, schema.org microdata items, price
+    meta tags (Open Graph) and the visible text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.json_ld: List[str] = []
+        self.items: List[dict] = []
+        self.meta: Dict[str, str] = {}
+        self.title: Optional[str] = None
+        self.text: List[str] = []
+        # Open elements: tag, microdata item started here, itemprop and its text
+        self.stack: List[dict] = []
+        self.hidden = 0
+        self.script: Optional[List[str]] = None
+
+    def _item(self) -> Optional[dict]:
+        for frame in reversed(self.stack):
+            if frame["item"] is not None:
+                return frame["item"]
+        return None
+
+    def _set_prop(self, item: Optional[dict], names: str, value):
+        if item is None or value in (None, ""):
+            return
+        for name in names.split():
+            item["props"].setdefault(name, value)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            key = attrs.get("property") or attrs.get("name") or attrs.get("itemprop")
+            if key and "content" in attrs:
+                self.meta.setdefault(key.lower(), attrs["content"])
+        if tag in VOID_TAGS:
+            if "itemprop" in attrs:
+                value = attrs.get("content") or attrs.get("href") or attrs.get("src") or attrs.get("value")
+                self._set_prop(self._item(), attrs["itemprop"], value)
+            return
+
+        value = attrs.get("content") or (attrs.get("value") if tag in ("data", "meter") else None)
+        frame = {"tag": tag, "item": None, "prop": attrs.get("itemprop"), "text": [], "value": value}
+        if "itemscope" in attrs:
+            frame["item"] = {"type": attrs.get("itemtype", ""), "props": {}}
+            if frame["prop"] is None:
+                self.items.append(frame["item"])
+        elif frame["value"] is None and tag in ("a", "link"):
+            frame["value"] = attrs.get("href") if frame["prop"] in ("availability", "url") else None
+        self.stack.append(frame)
+
+        if tag in HIDDEN_TAGS:
+            self.hidden += 1
+        if tag == "script" and "ld+json" in attrs.get("type", "").lower():
+            self.script = []
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or not any(frame["tag"] == tag for frame in self.stack):
+            return
+        # Close everything left open inside this element
+        while self.stack:
+            frame = self.stack.pop()
+            self._close(frame)
+            if frame["tag"] == tag:
+                break
+
+    def _close(self, frame: dict):
+        if frame["tag"] in HIDDEN_TAGS:
+            self.hidden -= 1
+        if frame["tag"] == "script" and self.script is not None:
+            self.json_ld.append("".join(self.script))
+            self.script = None
+        if frame["tag"] == "title" and self.title is None:
+            self.title = _text("".join(frame["text"]))
+        if frame["prop"] is not None:
+            value = frame["item"] if frame["item"] is not None else (
+                frame["value"] or _text("".join(frame["text"]))
+            )
+            self._set_prop(self._item(), frame["prop"], value)
+        if frame["tag"] in BLOCK_TAGS:
+            self.text.append("\n")
+
+    def handle_data(self, data):
+        if self.script is not None:
+            self.script.append(data)
+            return
+        for frame in self.stack:
+            if frame["prop"] is not None or frame["tag"] == "title":
+                frame["text"].append(data)
+        if not self.hidden:
+            self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.stack:
+            self._close(self.stack.pop())
+
+
+class ProductExtractor:
+    """
+    Deterministic extraction of product prices from a fetched page, in order
+    of reliability: schema.org Product offers in JSON-LD, microdata, price
+    meta tags, and, when the page has none of those, currency amounts found
+    in the visible text with a little context around each.
+    """
+
+    def __init__(self, max_products: int = 20, max_price_mentions: int = 10, context_chars: int = 80):
+        self.max_products = max_products
+        self.max_price_mentions = max_price_mentions
+        self.context_chars = context_chars
+
+    def extract(self, page: str, url: str = "") -> dict:
+        parser = _PageParser()
+        try:
+            parser.feed(page)
+            parser.close()
+        except Exception:
+            # Malformed markup: keep whatever was parsed so far
+            pass
+
+        products = self._json_ld(parser.json_ld) + self._microdata(parser.items) + self._meta(parser)
+        products = self._dedupe(products)[:self.max_products]
+        # Collapse whitespace but keep line breaks between blocks, and non-breaking
+        # spaces, used as thousands separators
+        lines = (re.sub(r"[ \t\r]+", " ", line).strip() for line in "".join(parser.text).split("\n"))
+        text = "\n".join(line for line in lines if line)
+        return {
+            "url": url,
+            "title": parser.title or parser.meta.get("og:title"),
+            "products": products,
+            "price_mentions": self.price_mentions(text.replace("\n", " ")) if text and not products else [],
+            "text": text
+        }
+
+    # --- JSON-LD ---
+    def _json_ld(self, blocks: List[str]) -> List[dict]:
+        products = []
+        for block in blocks:
+            try:
+                data = json.loads(block.strip(), strict=False)
+            except ValueError:
+                continue
+            self._walk(data, products)
+        return products
+
+    def _walk(self, node, products: List[dict]):
+        if isinstance(node, list):
+            for child in node:
+                self._walk(child, products)
+        elif isinstance(node, dict):
+            types = _types(node)
+            if "Product" in types or "ProductGroup" in types:
+                products += self._product_records(node, "json-ld")
+                # Variants are products of their own; related products are not this page's
+                self._walk(node.get("hasVariant"), products)
+                return
+            for value in node.values():
+                self._walk(value, products)
+
+    # --- Microdata ---
+    def _microdata(self, items: List[dict]) -> List[dict]:
+        products = []
+
+        def walk(item: dict):
+            if "Product" in _types(item):
+                products.extend(self._product_records(self._flatten(item), "microdata"))
+                return
+            for value in item["props"].values():
+                if isinstance(value, dict) and "props" in value:
+                    walk(value)
+
+        for item in items:
+            walk(item)
+        return products
+
+    def _flatten(self, item: dict) -> dict:
+        """Microdata item -> JSON-LD shaped dict."""
+        node = {"@type": _types(item)}
+        for name, value in item["props"].items():
+            node[name] = self._flatten(value) if isinstance(value, dict) and "props" in value else value
+        return node
+
+    # --- Price meta tags ---
+    def _meta(self, parser: _PageParser) -> List[dict]:
+        meta = parser.meta
+        price = meta.get("product:price:amount") or meta.get("og:price:amount")
+        if not price:
+            return []
+        return self._product_records({
+            "name": meta.get("og:title") or parser.title,
+            "offers": {
+                "price": price,
+                "priceCurrency": meta.get("product:price:currency") or meta.get("og:price:currency"),
+                "availability": meta.get("product:availability") or meta.get("og:availability")
+            }
+        }, "meta")
+
+    def _product_records(self, product: dict, source: str) -> List[dict]:
+        """One record per offer (per seller), or one without a price if the product has no offer."""
+        base = {
+            "name": _text(product.get("name")),
+            "brand": _text(product.get("brand")),
+            "sku": _text(product.get("sku") or product.get("mpn")),
+            "gtin": _text(product.get("gtin13") or product.get("gtin12") or product.get("gtin")),
+        }
+        offers = product.get("offers") or []
+        offers = offers if isinstance(offers, list) else [offers]
+        # Some pages put the price on the product itself
+        if not offers and product.get("price") is not None:
+            offers = [product]
+
+        records = []
+        for offer in self._offers(offers):
+            spec = offer.get("priceSpecification") or {}
+            spec = spec[0] if isinstance(spec, list) and spec else spec
+            spec = spec if isinstance(spec, dict) else {}
+            amount = parse_amount(offer.get("price", spec.get("price")), decimal_point=True)
+            low = parse_amount(offer.get("lowPrice"), decimal_point=True)
+            high = parse_amount(offer.get("highPrice"), decimal_point=True)
+            price = amount if amount is not None else low
+            if price is None:
+                continue
+            record = {
+                **base,
+                "price": _money(price),
+                "price_in_cents": to_cents(price),
+                "currency": _text(offer.get("priceCurrency") or spec.get("priceCurrency")),
+                "availability": _availability(offer.get("availability")),
+                "seller": _text(offer.get("seller")),
+                "high_price": _money(high) if high is not None and high != price else None,
+                "url": _text(offer.get("url")),
+                "source": source
+            }
+            records.append({k: v for k, v in record.items() if v is not None})
+        if not records and base["name"]:
+            records.append({**{k: v for k, v in base.items() if v is not None}, "source": source})
+        return records
+
+    def _offers(self, offers: list):
+        for offer in offers:
+            if not isinstance(offer, dict):
+                continue
+            nested = offer.get("offers")
+            if "AggregateOffer" in _types(offer) and nested:
+                yield from self._offers(nested if isinstance(nested, list) else [nested])
+                if offer.get("lowPrice") is None:
+                    continue
+            yield offer
+
+    @staticmethod
+    def _dedupe(products: List[dict]) -> List[dict]:
+        """The same offer is often both in JSON-LD and microdata: the first (more reliable) one wins."""
+        seen, unique = set(), []
+        for product in products:
+            key = (product.get("name"), product.get("price_in_cents"), product.get("seller"))
+            if key not in seen:
+                seen.add(key)
+                unique.append(product)
+        # Products with a price first
+        return sorted(unique, key=lambda p: "price_in_cents" not in p)
+
+    # --- Currency amounts in the text ---
+    def price_mentions(self, text: str) -> List[dict]:
+        mentions: Dict[Tuple[int, str], dict] = {}
+        for match in PRICE_PATTERN.finditer(text):
+            amount = parse_amount(match.group("amt1") or match.group("amt2"))
+            if amount is None or amount == 0:
+                continue
+            symbol = match.group("cur1") or match.group("cur2")
+            currency = CURRENCY_SYMBOLS.get(symbol, symbol)
+            key = (to_cents(amount), currency)
+            if key in mentions:
+                mentions[key]["count"] += 1
+                continue
+            if len(mentions) >= self.max_price_mentions:
+                continue
+            start, end = match.start(), match.end()
+            context = text[max(0, start - self.context_chars):end + self.context_chars]
+            mentions[key] = {
+                "price": _money(amount),
+                "price_in_cents": key[0],
+                "currency": currency,
+                "context": context.strip(),
+                "count": 1
+            }
+        return list(mentions.values())
+
+
+class FetchExtraction:
+    """
+    Post-processing of page fetches in MCPHubManager. The page is fetched as
+    raw HTML (when the tool supports it) so JSON-LD and microdata survive,
+    and the model gets the extracted records instead of the page text. The
+    text is still available: the fetch tool gets a `page_text` argument, and
+    pages with no price at all get their visible text, taken from the HTML
+    already fetched.
+    """
+
+    NOTE = (
+        "Prices extracted from the page; price_in_cents is already computed, use it as is. "
+        "Call this tool again with page_text=true only if you need the page text."
+    )
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or {}
+        self.enabled = bool(settings.get("enabled", True))
+        self.tools = set(settings.get("tools", ["fetch"]))
+        # mcp-server-fetch accepts max_length < 1,000,000
+        self.max_html_chars = int(settings.get("max_html_chars", 500000))
+        # Text of pages with no price, unless the model set max_length (mcp-server-fetch's default)
+        self.text_max_chars = int(settings.get("text_max_chars", 5000))
+        self.extractor = ProductExtractor(
+            int(settings.get("max_products", 20)),
+            int(settings.get("max_price_mentions", 10)),
+            int(settings.get("context_chars", 80))
+        )
+
+    @classmethod
+    def from_config(cls, config: dict) -> "FetchExtraction":
+        return cls(config.get("fetch_extraction"))
+
+    def applies(self, tool_name: str) -> bool:
+        return self.enabled and tool_name in self.tools
+
+    @staticmethod
+    def wants_page(arguments: dict) -> bool:
+        """Raw HTML or a later chunk of the page asked for explicitly: no extraction."""
+        return bool(arguments.get("raw")) or bool(arguments.get("start_index"))
+
+    def page_arguments(self, arguments: dict, parameters: set) -> dict:
+        """The model's arguments, asking for the whole raw page if the tool has those parameters."""
+        arguments = dict(arguments)
+        if "raw" in parameters:
+            arguments["raw"] = True
+        if "max_length" in parameters:
+            arguments["max_length"] = self.max_html_chars
+        return arguments
+
+    def summarize(self, page: str, url: str = "") -> Tuple[Optional[dict], str]:
+        """
+        The records extracted from a fetch result (None if the page has no
+        price) and the visible text of the page.
+        """
+        page = FETCH_TRUNCATED.sub("", FETCH_PREFIX.sub("", page, count=1))
+        result = self.extractor.extract(page, url)
+        text = result.pop("text")
+        # Products without an offer (name and brand only) do not make it a price page
+        if not any("price" in product for product in result["products"]) and not result["price_mentions"]:
+            return None, text
+        result = {k: v for k, v in result.items() if v}
+        result["page_chars"] = len(page)
+        result["note"] = self.NOTE
+        return result, text
+
+    def page_text(self, text: str, url: str, max_length: Optional[int] = None) -> str:
+        """The visible text in the shape of a fetch result, cut at `max_length` characters."""
+        limit = int(max_length or self.text_max_chars)
+        if len(text) > limit:
+            text = text[:limit] + (
+                "\n\n<error>Content truncated. Call the fetch tool with page_text=true to read the page.</error>"
+            )
+        return f"Contents of {url}:\n{text}"
+
+    @staticmethod
+    def render(summary: dict) -> str:
+        return json.dumps(summary, ensure_ascii=False)
@@ -0,0 +1,282 @@
+import time
+import random
+import asyncio
+
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app.core.cancellation import aborted
+from app.core.telemetry import telemetry
+
+T = TypeVar("T")
+
+DEFAULT_MAX_TOKENS_PER_RUN = 30000
+DEFAULT_SAFE_MARGIN = 2000
+DEFAULT_COMPLETION_TOKENS = 512
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 30.0
+
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+admission_wait = telemetry.registry.histogram(
+    "agent_llm_admission_wait_seconds", "Time LLM calls waited for their model's RPM/TPM budget", WAIT_BUCKETS
+)
+rate_limited = telemetry.registry.counter(
+    "agent_llm_rate_limited_total", "429 responses from the LLM provider, by model and outcome"
+)
+
+
+class TokenBucket:
+    """Refills `capacity` units per minute. A capacity of 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute or 0)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # A single call larger than the bucket waits for a full one instead of forever
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Gives back (positive) or charges (negative) units once the real cost is known."""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class ModelLimiter:
+    """
+    RPM and TPM buckets of one model and the queue of calls waiting for them.
+    Waiting calls are grouped by thread_id and served round-robin, so one
+    thread with many steps cannot starve the others. A 429 pauses the whole
+    model, not just the call that got it.
+    """
+
+    def __init__(self, model: str, rpm: float = 0, tpm: float = 0):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        # thread_id -> futures of its waiting calls (with their token cost), in arrival order
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def _delay(self, cost: float) -> float:
+        now = time.monotonic()
+        return max(self.paused_until - now, self.requests.delay(1, now), self.tokens.delay(cost, now))
+
+    def _take(self, cost: float):
+        now = time.monotonic()
+        self.requests.take(1, now)
+        self.tokens.take(cost, now)
+        self.admitted += 1
+
+    async def admit(self, thread_id: Optional[str], cost: float) -> float:
+        """Waits for the model's budget and reserves `cost` tokens. Returns the seconds waited."""
+        if not self._waiting and self._delay(cost) <= 0:
+            self._take(cost)
+            admission_wait.observe(0.0, model=self.model)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(thread_id or "", deque()).append((future, cost))
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch(), name=f"llm-admission-{self.model}")
+
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Admitted just as the call was cancelled: nothing will use the reservation
+            if future.done() and not future.cancelled():
+                self.release(cost)
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            admission_wait.observe(waited, model=self.model)
+        return waited
+
+    async def _dispatch(self):
+        while self._waiting:
+            thread_id, queue = next(iter(self._waiting.items()))
+            future, cost = queue[0]
+            if not future.done():
+                delay = self._delay(cost)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                self._take(cost)
+                future.set_result(None)
+
+            # Served (or cancelled): the thread goes to the back of the line
+            queue.popleft()
+            if queue:
+                self._waiting.move_to_end(thread_id)
+            else:
+                del self._waiting[thread_id]
+
+    def settle(self, reserved: float, used: float):
+        """Corrects the TPM bucket with the usage the provider reported."""
+        if used:
+            self.tokens.adjust(reserved - used)
+
+    def release(self, reserved: float):
+        """Gives back the reservation of a call that failed: a 429 or an error used no tokens."""
+        self.tokens.adjust(reserved)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "rpm": self.requests.capacity or None,
+            "tpm": self.tokens.capacity or None,
+            "queue_depth": self.queue_depth,
+            "waiting_threads": len(self._waiting),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "avg_wait_ms": round(self.wait_seconds / self.queued * 1000, 2) if self.queued else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 2)
+        }
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Seconds to wait if the error is a provider rate limit (HTTP 429), else None.
+    Uses the Retry-After header when the provider sends one.
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status != 429 and type(error).__name__ != "RateLimitError":
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls, shared by every thread of the worker:
+    - a ModelLimiter (RPM/TPM token buckets + fair queue) per model,
+    - retries of 429 responses with exponential backoff and jitter,
+    - the per-run token budget that stops a thread from calling the model again.
+    Each call reserves its estimated prompt plus `completion_tokens` from the
+    TPM bucket; the difference to the real usage is settled afterwards, and
+    failed attempts (429s included) give the whole reservation back.
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or {}
+        self.max_tokens_per_run = int(settings.get("max_tokens_per_run", DEFAULT_MAX_TOKENS_PER_RUN))
+        self.safe_margin = int(settings.get("safe_margin", DEFAULT_SAFE_MARGIN))
+        self.completion_tokens = int(settings.get("expected_completion_tokens", DEFAULT_COMPLETION_TOKENS))
+        self.max_retries = int(settings.get("max_retries", DEFAULT_MAX_RETRIES))
+        self.backoff_base = float(settings.get("backoff_base", DEFAULT_BACKOFF_BASE))
+        self.backoff_max = float(settings.get("backoff_max", DEFAULT_BACKOFF_MAX))
+        self.rate_limits: Dict[str, dict] = settings.get("rate_limits") or {}
+        self.limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self.limiters.get(model)
+        if limiter is None:
+            limits = self.rate_limits.get(model) or self.rate_limits.get("default") or {}
+            limiter = self.limiters[model] = ModelLimiter(model, limits.get("rpm", 0), limits.get("tpm", 0))
+        return limiter
+
+    def budget_exhausted(self, total_tokens: int, margin: int = 0) -> bool:
+        """True once a run has used its token budget (minus `margin` kept for a last answer)."""
+        return total_tokens > self.max_tokens_per_run - margin
+
+    def backoff(self, attempt: int, retry_after_s: float) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        # Jitter spreads the retries of threads that were rate limited together
+        return max(retry_after_s, delay * random.uniform(0.5, 1.0))
+
+    async def call(self, model: str, thread_id: Optional[str], prompt_tokens: int,
+                   invoke: Callable[[], Awaitable[T]], usage: Callable[[T], int]) -> T:
+        """
+        Runs `invoke` once the model has budget for it. 429 responses pause the
+        model and are retried up to `max_retries` times; other errors propagate.
+        """
+        limiter = self.limiter(model)
+        reserved = prompt_tokens + self.completion_tokens
+        attempt = 0
+        while True:
+            admitted = False
+            try:
+                await limiter.admit(thread_id, reserved)
+                admitted = True
+                result = await invoke()
+            except asyncio.CancelledError:
+                # Queued or streaming when the run was cancelled
+                if admitted:
+                    limiter.release(reserved)
+                aborted("llm")
+                raise
+            except Exception as e:
+                if admitted:
+                    limiter.release(reserved)
+                wait = retry_after(e)
+                if wait is None:
+                    raise
+                if attempt >= self.max_retries:
+                    rate_limited.inc(model=model, outcome="gave_up")
+                    raise
+                rate_limited.inc(model=model, outcome="retried")
+                delay = self.backoff(attempt, wait)
+                print(f"--- [LLM] {model} rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}) ---")
+                # Every queued call of the model waits, not just this one
+                limiter.pause(delay)
+                attempt += 1
+                continue
+            limiter.settle(reserved, usage(result))
+            return result
+
+    def call_sync(self, model: str, invoke: Callable[[], T]) -> T:
+        """Blocking variant for the sync agent node: 429 retries only, without the shared queue."""
+        attempt = 0
+        while True:
+            try:
+                return invoke()
+            except Exception as e:
+                wait = retry_after(e)
+                if wait is None or attempt >= self.max_retries:
+                    raise
+                rate_limited.inc(model=model, outcome="retried")
+                time.sleep(self.backoff(attempt, wait))
+                attempt += 1
+
+    def stats(self) -> dict:
+        return {model: limiter.stats() for model, limiter in self.limiters.items()}
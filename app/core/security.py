@@ -1,32 +1,110 @@
 import re
 
+from typing import NamedTuple, Optional
+
+# Comments may span lines; written without DOTALL so the pattern stays linear
+_BLOCK_COMMENT = r"/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+# Single \s, not \s+: a repeated \s+ backtracks exponentially when the match fails
+_SKIPPABLE = rf"\s|--[^\n]*|{_BLOCK_COMMENT}"
+
+
+class SQLClassification(NamedTuple):
+    """Outcome of SQLSecurityValidator.classify for a single query."""
+    allowed: bool
+    read_only: bool
+    statement: str
+    reason: Optional[str] = None
+
+
 class SQLSecurityValidator:
     """Validates SQL queries to prevent unauthorized DDL operations."""
 
-    FORBIDDEN_COMMANDS = [
-        r"\bCREATE\b",
-        r"\bDROP\b",
-        r"\bALTER\b",
-        r"\bTRUNCATE\b",
-        r"\bRENAME\b",
-        r"\bDELETE\b"
-    ]
+    FORBIDDEN_COMMANDS = ("CREATE", "DROP", "ALTER", "TRUNCATE", "RENAME", "DELETE", "ATTACH", "DETACH")
+    WRITE_COMMANDS = FORBIDDEN_COMMANDS + ("INSERT", "UPDATE", "REPLACE", "UPSERT", "VACUUM", "REINDEX")
+    READ_ONLY_PREFIXES = ("SELECT", "WITH", "EXPLAIN", "VALUES")
+
+    _KEYWORD = rf"(?:{'|'.join(c for c in WRITE_COMMANDS if c != 'REPLACE')}|REPLACE(?!\s*\())\b"
+
+    # One scan over the query. Everything that is not a finding (literals,
+    # quoted identifiers, comments, other words and symbols) is consumed
+    # inside the regex engine, so each match ends at the next keyword, ';' or
+    # unterminated literal. A large INSERT batch is a single match.
+    # REPLACE( is the string function, not a write.
+    _SCANNER = re.compile(
+        rf"""
+        (?:
+            [^'"`\[\-/;a-zA-Z_]+
+          | '[^']*(?:''[^']*)*'
+          | "[^"]*(?:""[^"]*)*"
+          | `[^`]*`
+          | \[[^\]]*\]
+          | --[^\n]*
+          | {_BLOCK_COMMENT}
+          | -(?!-)
+          | /(?!\*)
+          | (?!{_KEYWORD})[a-zA-Z_]\w*
+        )*
+        (?:
+            (?P<keyword>{_KEYWORD})
+          | (?P<semicolon>;)
+          | (?P<unterminated>['"`\[]|/\*)
+          | \Z
+        )
+        """,
+        re.IGNORECASE | re.VERBOSE
+    )
+    _LEADING = re.compile(rf"(?:{_SKIPPABLE})*(\w*)")
+    _TRAILER = re.compile(rf"(?:{_SKIPPABLE}|;)*\Z")
+
+    @classmethod
+    def classify(cls, query: str) -> SQLClassification:
+        """Checks a query in a single pass and tells whether it only reads data (safe to cache)."""
+        statement = cls._LEADING.match(query).group(1).upper()
+        if not statement:
+            return SQLClassification(False, False, "", "empty query")
+
+        writes = False
+        for match in cls._SCANNER.finditer(query):
+            group = match.lastgroup
+            if group is None:
+                continue
+            if group == "keyword":
+                keyword = match.group("keyword").upper()
+                if keyword in cls.FORBIDDEN_COMMANDS:
+                    return SQLClassification(False, False, statement, f"{keyword} is not allowed")
+                writes = True
+            elif group == "semicolon":
+                # Only whitespace, comments and more ';' may follow the statement
+                if not cls._TRAILER.match(query, match.end()):
+                    return SQLClassification(False, False, statement, "multiple statements")
+                break
+            else:
+                return SQLClassification(False, False, statement, "unterminated literal or comment")
+
+        read_only = statement in cls.READ_ONLY_PREFIXES and not writes
+        return SQLClassification(True, read_only, statement)
 
     @staticmethod
     def validate_query(query: str) -> bool:
         """Returns True if the query is safe (DML only), False otherwise."""
-        query_upper = query.upper()
-        for command in SQLSecurityValidator.FORBIDDEN_COMMANDS:
-            if re.search(command, query_upper):
-                return False
-        return True
+        return SQLSecurityValidator.classify(query).allowed
+
+    @staticmethod
+    def is_read_only(query: str) -> bool:
+        """Returns True if the query only reads data (safe to cache)."""
+        return SQLSecurityValidator.classify(query).read_only
 
     @staticmethod
-    def get_security_error_message() -> str:
+    def get_security_error_message(reason: Optional[str] = None) -> str:
+        if reason == "multiple statements":
+            return (
+                "ERROR: Only one SQL statement per call is allowed. Send each statement in its own "
+                "call, or use the bulk_upsert_products tool to save many products at once."
+            )
         return (
             "ERROR: Security Policy Violation. You are only allowed to perform "
             "DML operations (SELECT, INSERT, UPDATE) on existing tables. "
             "Schema modifications (CREATE, DROP, etc.) are strictly prohibited."
             "DO NOT retry this action. Move to the next task or inform the user that this "
             "action is not allowed by corporate policy."
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,62 @@
+import time
+import asyncio
+
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.core.telemetry import telemetry
+
+# States of the MCP tools attach
+PENDING = "pending"
+ATTACHING = "attaching"
+ATTACHED = "attached"
+FAILED = "failed"
+
+
+class StartupTracker:
+    """
+    Duration of each startup phase and the state of the MCP tools, which may
+    attach in the background after the API is already serving. Phases are
+    also recorded as "startup" spans in agent_span_duration_seconds.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.graph_ready_ms: Optional[float] = None
+        self.mcp_state = PENDING
+        self.mcp_ready_ms: Optional[float] = None
+        self.mcp_error: Optional[str] = None
+        self.mcp_task: Optional[asyncio.Task] = None
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            with telemetry.span("startup", name):
+                yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def graph_ready(self):
+        self.graph_ready_ms = self._elapsed_ms()
+
+    def mcp_done(self, error: Optional[BaseException] = None):
+        self.mcp_state = FAILED if error else ATTACHED
+        self.mcp_error = str(error) if error else None
+        self.mcp_ready_ms = self._elapsed_ms()
+        phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.phases.items())
+        print(f"--- [STARTUP] {self.mcp_state} in {self.mcp_ready_ms:.0f}ms ({phases}) ---")
+
+    def report(self) -> dict:
+        return {
+            "graph_ready_ms": self.graph_ready_ms,
+            "mcp": self.mcp_state,
+            "mcp_ready_ms": self.mcp_ready_ms,
+            "mcp_error": self.mcp_error,
+            "phases_ms": dict(self.phases),
+            "started_at": self.started_at
+        }
@@ -0,0 +1,237 @@
+import time
+import asyncio
+import bisect
+import threading
+
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from app.core.config import load_config
+
+# Seconds; covers SQLite reads (~1ms) up to slow LLM calls and page fetches
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (500, 1000, 2500, 5000, 10000, 20000, 30000, 50000)
+
+# Thread the current request works on; spans without an explicit thread_id use it
+current_thread_id: ContextVar[Optional[str]] = ContextVar("current_thread_id", default=None)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.values[_label_key(labels)] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in self.values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry (no external client library)."""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        # name -> (help, callback returning {labels dict as tuple: value}) evaluated at scrape time
+        self.gauges: Dict[str, Tuple[str, Callable[[], Dict[tuple, float]]]] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Dict[tuple, float]]):
+        self.gauges[name] = (help_text, callback)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        for name, (help_text, callback) in self.gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            try:
+                values = callback()
+            except Exception as e:
+                print(f"--- [METRICS ERROR] Gauge {name} failed: {e} ---")
+                continue
+            lines += [f"{name}{_format_labels(_label_key(dict(key)))} {value}" for key, value in values.items()]
+        return "\n".join(lines) + "\n"
+
+
+class TraceStore:
+    """Last spans of the most recently active threads, for per-thread inspection."""
+
+    def __init__(self, max_threads: int = 1000, max_spans: int = 500):
+        self.max_threads = max_threads
+        self.max_spans = max_spans
+        self._threads: "OrderedDict[str, deque]" = OrderedDict()
+        # Callback handlers that don't run inline execute on executor threads
+        self._lock = threading.Lock()
+
+    def add(self, thread_id: str, span: dict):
+        with self._lock:
+            spans = self._threads.get(thread_id)
+            if spans is None:
+                spans = self._threads[thread_id] = deque(maxlen=self.max_spans)
+                if len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            else:
+                self._threads.move_to_end(thread_id)
+            spans.append(span)
+
+    def get(self, thread_id: str) -> Optional[List[dict]]:
+        with self._lock:
+            spans = self._threads.get(thread_id)
+            return sorted(spans, key=lambda s: s["start"]) if spans is not None else None
+
+
+class Telemetry:
+    """
+    Timing spans for graph nodes, LLM calls, tools, MCP round-trips, searches
+    and checkpoint I/O. Every span feeds the agent_span_duration_seconds
+    histogram and, when it belongs to a thread, that thread's trace.
+    """
+
+    def __init__(self, max_threads: int = 1000, max_spans: int = 500):
+        self.registry = MetricsRegistry()
+        self.traces = TraceStore(max_threads, max_spans)
+        self.span_seconds = self.registry.histogram(
+            "agent_span_duration_seconds", "Duration of timed operations by kind (node, llm, tool, mcp, search, checkpoint)"
+        )
+        self.tokens = self.registry.counter("agent_llm_tokens_total", "LLM tokens (prompt + completion) used, by model")
+        self.run_tokens = self.registry.histogram(
+            "agent_run_total_tokens", "total_tokens of the thread at the end of each run", TOKEN_BUCKETS
+        )
+        self.stream_events = self.registry.counter("agent_stream_events_total", "Stream events sent to clients")
+        self.stream_serialize = self.registry.counter(
+            "agent_stream_serialize_seconds_total", "Time spent serializing stream events"
+        )
+
+    def record(self, kind: str, name: str, start: float, seconds: float, status: str = "ok",
+               thread_id: Optional[str] = None, **attrs):
+        self.span_seconds.observe(seconds, kind=kind, name=name, status=status)
+        thread_id = thread_id or current_thread_id.get()
+        if thread_id:
+            self.traces.add(thread_id, {
+                "kind": kind, "name": name, "start": start, "duration_ms": round(seconds * 1000, 3),
+                "status": status, **attrs
+            })
+
+    @contextmanager
+    def span(self, kind: str, name: str, thread_id: Optional[str] = None, **attrs):
+        """Times the block. Yields the attrs dict so callers can add details to the span."""
+        start_wall = time.time()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield attrs
+        except BaseException as e:
+            # GeneratorExit: the client of a stream went away
+            status = "cancelled" if isinstance(e, (asyncio.CancelledError, GeneratorExit)) else "error"
+            raise
+        finally:
+            self.record(kind, name, start_wall, time.perf_counter() - start, status, thread_id, **attrs)
+
+    @contextmanager
+    def run(self, kind: str, thread_id: str):
+        """Span for a whole graph run; nested spans without a thread_id are attributed to it."""
+        token = current_thread_id.set(thread_id)
+        try:
+            with self.span("run", kind, thread_id) as attrs:
+                yield attrs
+        finally:
+            try:
+                current_thread_id.reset(token)
+            except ValueError:
+                # Stream generator finalized from another context
+                pass
+
+    def handler(self) -> "NodeTimingHandler":
+        return NodeTimingHandler(self)
+
+
+class NodeTimingHandler(BaseCallbackHandler):
+    """Times every LangGraph node run (the chain whose name is its langgraph_node)."""
+
+    run_inline = True
+
+    def __init__(self, telemetry: Telemetry):
+        self.telemetry = telemetry
+        self._starts: Dict[UUID, Tuple[str, Optional[str], float, float]] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._starts[run_id] = (node, metadata.get("thread_id"), time.time(), time.perf_counter())
+
+    def _finish(self, run_id: UUID, status: str):
+        started = self._starts.pop(run_id, None)
+        if started:
+            node, thread_id, start_wall, start = started
+            self.telemetry.record("node", node, start_wall, time.perf_counter() - start, status, thread_id)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        self._finish(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        # GraphInterrupt and friends also land here; they are not failures of the node itself
+        self._finish(run_id, "error" if not type(error).__name__.startswith("Graph") else "interrupted")
+
+
+_settings = load_config().get("telemetry") or {}
+telemetry = Telemetry(
+    max_threads=int(_settings.get("trace_threads", 1000)),
+    max_spans=int(_settings.get("spans_per_thread", 500))
+)
@@ -0,0 +1,136 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import aiosqlite
+
+from contextlib import asynccontextmanager
+from typing import Optional
+
+DEFAULT_LEASE_TTL = 60.0
+
+# Identifies this process in lease rows, e.g. "web-1:4242"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ThreadBusyError(RuntimeError):
+    """Raised when another request (in this or another worker) is running the thread."""
+
+    def __init__(self, thread_id: str, owner: str):
+        self.thread_id = thread_id
+        self.owner = owner
+        super().__init__(f"Thread '{thread_id}' is already being processed by {owner}. Retry when it finishes.")
+
+
+class ThreadLeaseManager:
+    """
+    Exclusive, expiring leases on thread_ids stored next to the checkpoints.
+    Every worker opens the same SQLite file, so a lease taken by one worker is
+    seen by all of them. A lease is renewed while its run is alive; if the
+    worker dies, it expires after `ttl` seconds and the thread can be resumed.
+    """
+
+    def __init__(self, db_path: str, ttl: float = DEFAULT_LEASE_TTL, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.ttl = float(ttl)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.conn: Optional[aiosqlite.Connection] = None
+        self.lock = asyncio.Lock()
+        self.conflicts = 0
+
+    async def open(self):
+        if self.conn is not None:
+            return
+        # Autocommit: every statement below is its own atomic transaction
+        self.conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+        await self.conn.executescript(
+            f"""
+            PRAGMA journal_mode=WAL;
+            PRAGMA busy_timeout={self.busy_timeout_ms};
+            CREATE TABLE IF NOT EXISTS thread_leases (
+                thread_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def acquire(self, thread_id: str) -> str:
+        """Takes the lease or raises ThreadBusyError. Returns the lease token."""
+        token = f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        async with self.lock:
+            try:
+                cur = await self.conn.execute(
+                    "INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE thread_leases.expires_at < ?",
+                    (thread_id, token, now + self.ttl, now)
+                )
+            except asyncio.CancelledError:
+                # The statement still runs on aiosqlite's thread: don't leave a lease nobody holds
+                await asyncio.shield(self.conn.execute(
+                    "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?", (thread_id, token)
+                ))
+                raise
+            if cur.rowcount == 1:
+                return token
+
+            cur = await self.conn.execute("SELECT owner FROM thread_leases WHERE thread_id = ?", (thread_id,))
+            row = await cur.fetchone()
+        self.conflicts += 1
+        raise ThreadBusyError(thread_id, row[0] if row else "another worker")
+
+    async def renew(self, thread_id: str, token: str) -> bool:
+        async with self.lock:
+            cur = await self.conn.execute(
+                "UPDATE thread_leases SET expires_at = ? WHERE thread_id = ? AND owner = ?",
+                (time.time() + self.ttl, thread_id, token)
+            )
+        return cur.rowcount == 1
+
+    async def release(self, thread_id: str, token: str):
+        async with self.lock:
+            await self.conn.execute(
+                "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?", (thread_id, token)
+            )
+
+    async def _keep_alive(self, thread_id: str, token: str):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                if not await self.renew(thread_id, token):
+                    print(f"--- [THREAD LEASE] Lost lease on {thread_id} ---")
+                    return
+            except Exception as e:
+                print(f"--- [THREAD LEASE ERROR] Renewing {thread_id} failed: {e} ---")
+
+    async def holder(self, thread_id: str) -> Optional[str]:
+        """Owner of the live lease on the thread, if any."""
+        async with self.lock:
+            cur = await self.conn.execute(
+                "SELECT owner FROM thread_leases WHERE thread_id = ? AND expires_at >= ?", (thread_id, time.time())
+            )
+            row = await cur.fetchone()
+        return row[0] if row else None
+
+    @asynccontextmanager
+    async def hold(self, thread_id: str, token: Optional[str] = None):
+        """
+        Holds the thread for the duration of the block, renewing the lease in
+        the background. Pass the token of a lease acquired earlier to hand it
+        over to the block instead of taking a new one.
+        """
+        token = token or await self.acquire(thread_id)
+        keep_alive = asyncio.create_task(self._keep_alive(thread_id, token), name=f"lease-{thread_id}")
+        try:
+            yield token
+        finally:
+            keep_alive.cancel()
+            await self.release(thread_id, token)
@@ -0,0 +1,54 @@
+import json
+import hashlib
+
+from typing import Dict, List, Sequence, Tuple
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class ToolBindingCache:
+    """
+    Converts each tool to its OpenAI JSON schema once and caches bound models
+    by (model, hash of the tool set). Schemas are sorted by name so the tool
+    block sent to the provider is byte-identical for the same tool set, which
+    keeps provider-side prompt prefix caches warm.
+    """
+
+    def __init__(self):
+        # id(tool) -> (tool, schema); the tool reference keeps the id stable
+        self._schemas: Dict[int, Tuple[object, dict]] = {}
+        self._bound: Dict[Tuple[int, str], Runnable] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def schema(self, tool) -> dict:
+        entry = self._schemas.get(id(tool))
+        if entry is None:
+            entry = (tool, convert_to_openai_tool(tool))
+            self._schemas[id(tool)] = entry
+        return entry[1]
+
+    def schemas(self, tools: Sequence) -> List[dict]:
+        return sorted((self.schema(t) for t in tools), key=lambda s: s["function"]["name"])
+
+    @staticmethod
+    def fingerprint(schemas: List[dict]) -> str:
+        return hashlib.sha256(json.dumps(schemas, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def bind(self, llm, tools: Sequence) -> Tuple[Runnable, str]:
+        """Returns the bound model for this tool set and the tool set fingerprint."""
+        schemas = self.schemas(tools)
+        key = (id(llm), self.fingerprint(schemas))
+        bound = self._bound.get(key)
+        if bound is None:
+            self.misses += 1
+            bound = llm.bind_tools(schemas)
+            self._bound[key] = bound
+        else:
+            self.hits += 1
+        return bound, key[1]
+
+    def forget(self, tools: Sequence):
+        """Drops cached schemas of tools that are no longer in use."""
+        for tool in tools:
+            self._schemas.pop(id(tool), None)
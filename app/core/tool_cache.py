@@ -0,0 +1,174 @@
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_MAX_MEMORY_MB = 64
+
+
+def normalize_arguments(arguments: dict) -> dict:
+    """Canonical form of tool arguments so equivalent calls share a cache entry."""
+    normalized = {}
+    for key, value in arguments.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if key.lower() == "url":
+                parts = urlsplit(value)
+                # Scheme and host are case-insensitive, fragments never reach the server
+                value = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+            elif key.lower() in ("query", "sql"):
+                value = re.sub(r"\s+", " ", value).rstrip(";")
+        normalized[key] = value
+    return normalized
+
+
+def cache_key(tool_name: str, arguments: dict) -> str:
+    payload = json.dumps(normalize_arguments(arguments), sort_keys=True, default=str)
+    return hashlib.sha256(f"{tool_name}\x00{payload}".encode("utf-8")).hexdigest()
+
+
+class ToolResultCache:
+    """
+    Content-addressed cache for read-only MCP tool results.
+    Entries live in a memory-bounded LRU and, optionally, in a SQLite file
+    so they survive restarts. Only tools with a configured TTL are cached.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+                 persist_path: Optional[str] = None):
+        self.ttls = ttls
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.persist_path = persist_path or None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        # key -> (tool_name, value, expires_at)
+        self._entries: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._bytes = 0
+
+        if self.persist_path:
+            with closing(sqlite3.connect(self.persist_path)) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS tool_cache "
+                    "(key TEXT PRIMARY KEY, tool_name TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_cache_tool ON tool_cache (tool_name)")
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ToolResultCache":
+        ttls = {}
+        for settings in config.get("mcp_servers", {}).values():
+            ttls.update(settings.get("cache_ttl") or {})
+        cache_settings = config.get("tool_cache") or {}
+        return cls(
+            ttls=ttls,
+            max_memory_mb=cache_settings.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB),
+            persist_path=cache_settings.get("persist_path")
+        )
+
+    def ttl_for(self, tool_name: str) -> float:
+        return float(self.ttls.get(tool_name, 0))
+
+    async def get(self, tool_name: str, arguments: dict) -> Optional[str]:
+        key = cache_key(tool_name, arguments)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._drop(key)
+
+        if self.persist_path:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, tool_name, row[0], row[1])
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    async def put(self, tool_name: str, arguments: dict, value: str):
+        ttl = self.ttl_for(tool_name)
+        if ttl <= 0:
+            return
+        key = cache_key(tool_name, arguments)
+        expires_at = time.time() + ttl
+        self._remember(key, tool_name, value, expires_at)
+        if self.persist_path:
+            await asyncio.to_thread(self._disk_put, key, tool_name, value, expires_at)
+
+    async def invalidate(self, tool_names):
+        """
+        Drops every entry of the given tools (e.g. reads after a write).
+        Only this process's entries: other workers keep theirs until they expire.
+        """
+        tool_names = set(tool_names)
+        for key in [k for k, e in self._entries.items() if e[0] in tool_names]:
+            self._drop(key)
+        if self.persist_path and tool_names:
+            await asyncio.to_thread(self._disk_delete, tool_names)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "memory_bytes": self._bytes,
+            "max_memory_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+    # --- In-memory LRU ---
+
+    def _remember(self, key: str, tool_name: str, value: str, expires_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (tool_name, value, expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key: str):
+        _, value, _ = self._entries.pop(key)
+        self._bytes -= len(value.encode("utf-8"))
+
+    # --- SQLite persistence (run in a worker thread) ---
+
+    def _disk_get(self, key: str, now: float):
+        with closing(sqlite3.connect(self.persist_path)) as conn, conn:
+            return conn.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+
+    def _disk_put(self, key: str, tool_name: str, value: str, expires_at: float):
+        with closing(sqlite3.connect(self.persist_path)) as conn, conn:
+            conn.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool_name, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, tool_name, value, expires_at)
+            )
+
+    def _disk_delete(self, tool_names):
+        with closing(sqlite3.connect(self.persist_path)) as conn, conn:
+            conn.executemany("DELETE FROM tool_cache WHERE tool_name = ?", [(t,) for t in tool_names])
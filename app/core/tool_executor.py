@@ -0,0 +1,156 @@
+import json
+import time
+import asyncio
+
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Sequence
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import ToolNode
+from app.core.cancellation import aborted
+from app.core.telemetry import telemetry
+
+DEFAULT_CALL_TIMEOUT = 90.0
+
+
+def format_tool_error(e: Exception) -> str:
+    """Structured error payload returned to the model for a single failed call."""
+    return json.dumps({"status": "error", "error_type": type(e).__name__, "message": str(e)})
+
+
+class ToolLimits:
+    """
+    Per-tool and per-server semaphores and the call stats. Every node built
+    with the same ToolLimits shares them, so a recompiled graph keeps the
+    limits and counters of the one it replaces while its runs finish.
+    """
+
+    def __init__(self, tool_limits: Optional[Dict[str, int]] = None):
+        self.tool_semaphores = {name: asyncio.Semaphore(int(limit)) for name, limit in (tool_limits or {}).items()}
+        self.server_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats = defaultdict(lambda: {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+
+    def add_servers(self, server_limits: Dict[str, int]):
+        """Servers seen for the first time get a semaphore; the ones already in use are kept."""
+        for name, limit in server_limits.items():
+            if name not in self.server_semaphores:
+                self.server_semaphores[name] = asyncio.Semaphore(int(limit))
+
+
+class ParallelToolNode(ToolNode):
+    """
+    ToolNode that runs every tool call of an AIMessage concurrently, bounded by
+    per-tool and per-MCP-server semaphores shared across all threads (and,
+    through `limits`, across recompiles).
+    Each call has its own deadline, counted from when it gets its semaphores
+    (time queued behind other calls does not count); a failure or timeout
+    only affects that call.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence,
+        tool_servers: Optional[Dict[str, str]] = None,
+        server_limits: Optional[Dict[str, int]] = None,
+        settings: Optional[dict] = None,
+        on_result: Optional[Callable[[str, str], None]] = None,
+        limits: Optional[ToolLimits] = None,
+        **kwargs
+    ):
+        super().__init__(tools, handle_tool_errors=format_tool_error, **kwargs)
+        settings = settings or {}
+        self.tool_servers = tool_servers or {}
+        self.call_timeout = float(settings.get("call_timeout", DEFAULT_CALL_TIMEOUT))
+        self.tool_timeouts = {k: float(v) for k, v in (settings.get("timeouts") or {}).items()}
+        # Sees each successful result as soon as its call returns, before the rest of the step
+        self.on_result = on_result
+
+        self.limits = limits or ToolLimits(settings.get("max_concurrency"))
+        self.limits.add_servers(server_limits or {})
+
+    @classmethod
+    def from_hub(
+        cls, tools: Sequence, mcp_hub, settings: Optional[dict] = None, limits: Optional[ToolLimits] = None
+    ) -> "ParallelToolNode":
+        tool_servers = {
+            tool_name: server for server, names in mcp_hub.server_tools.items() for tool_name in names
+        }
+        server_limits = {
+            name: pool.settings.get("max_concurrency", pool.size) for name, pool in mcp_hub.pools.items()
+        }
+        return cls(
+            tools, tool_servers=tool_servers, server_limits=server_limits, settings=settings,
+            on_result=mcp_hub.observe_tool_result, limits=limits
+        )
+
+    async def _run_limited(self, call, input_type, config: RunnableConfig, timeout: float):
+        tool_sem = self.limits.tool_semaphores.get(call["name"])
+        server_sem = self.limits.server_semaphores.get(self.tool_servers.get(call["name"]))
+
+        # Acquire in a fixed order (tool, then server) to avoid deadlocks
+        if tool_sem:
+            await tool_sem.acquire()
+        try:
+            if server_sem:
+                await server_sem.acquire()
+            try:
+                return await asyncio.wait_for(super()._arun_one(call, input_type, config), timeout)
+            finally:
+                if server_sem:
+                    server_sem.release()
+        finally:
+            if tool_sem:
+                tool_sem.release()
+
+    async def _arun_one(self, call, input_type, config: RunnableConfig):
+        timeout = self.tool_timeouts.get(call["name"], self.call_timeout)
+        start_wall = time.time()
+        start = time.perf_counter()
+        timed_out = False
+
+        try:
+            output = await self._run_limited(call, input_type, config, timeout)
+        except asyncio.CancelledError:
+            aborted("tool")
+            raise
+        except asyncio.TimeoutError:
+            timed_out = True
+            output = ToolMessage(
+                content=json.dumps({
+                    "status": "error",
+                    "error_type": "Timeout",
+                    "message": f"Tool '{call['name']}' exceeded its {timeout}s deadline. "
+                               "Other tool results from this step are still valid."
+                }),
+                name=call["name"],
+                tool_call_id=call["id"],
+                status="error"
+            )
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        failed = getattr(output, "status", "success") == "error"
+        self._record(call["name"], latency_ms, timed_out, failed)
+        telemetry.record(
+            "tool", call["name"], start_wall, latency_ms / 1000,
+            "timeout" if timed_out else "error" if failed else "ok",
+            config.get("configurable", {}).get("thread_id"), tool_call_id=call["id"]
+        )
+        if isinstance(output, ToolMessage):
+            output.response_metadata["latency_ms"] = round(latency_ms, 2)
+            if self.on_result and not failed and isinstance(output.content, str):
+                self.on_result(call["name"], output.content)
+        return output
+
+    def _record(self, tool_name: str, latency_ms: float, timed_out: bool, failed: bool):
+        stats = self.limits.stats[tool_name]
+        stats["calls"] += 1
+        stats["errors"] += int(failed)
+        stats["timeouts"] += int(timed_out)
+        stats["total_ms"] += latency_ms
+        stats["max_ms"] = max(stats["max_ms"], latency_ms)
+
+    def stats(self) -> dict:
+        return {
+            name: {**s, "avg_ms": round(s["total_ms"] / s["calls"], 2) if s["calls"] else 0.0}
+            for name, s in self.limits.stats.items()
+        }
@@ -0,0 +1,165 @@
+import re
+import math
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from app.core.telemetry import telemetry
+
+tool_selections = telemetry.registry.counter(
+    "agent_tool_selection_total",
+    "Agent steps by tool binding: subset, all (whole catalogue) or fallback (the model called an unbound tool)"
+)
+bound_tools = telemetry.registry.histogram(
+    "agent_bound_tools", "Tools bound to the model per agent step", (1, 2, 4, 6, 8, 12, 16, 24, 32, 64)
+)
+
+DEFAULT_MAX_TOOLS = 8
+DEFAULT_LEXICAL_TOP_K = 3
+DEFAULT_ALWAYS = ("web_search_tool",)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CAMEL = re.compile(r"([a-z])([A-Z])")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it its me my of on or the this that to what with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words with snake_case and camelCase split and a trailing plural 's' dropped."""
+    tokens = []
+    for word in _WORD.findall(_CAMEL.sub(r"\1 \2", text).lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class LexicalToolIndex:
+    """BM25 over tool names (counted twice), descriptions and argument names."""
+
+    def __init__(self, tools: Sequence, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.docs: Dict[str, Counter] = {}
+        for tool in tools:
+            # Argument descriptions are left out: get_all_mcp_tools appends the same db_context to many of them
+            text = " ".join([tool.name, tool.name, tool.description or "", " ".join(getattr(tool, "args", None) or {})])
+            self.docs[tool.name] = Counter(tokenize(text))
+        self.lengths = {name: sum(doc.values()) for name, doc in self.docs.items()}
+        self.avg_length = sum(self.lengths.values()) / len(self.docs) if self.docs else 0.0
+        frequency = Counter(term for doc in self.docs.values() for term in doc)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequency.items()}
+
+    def scores(self, query: str) -> Dict[str, float]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        scores = {}
+        for name, doc in self.docs.items():
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[name] / self.avg_length)
+            score = sum(self.idf[t] * doc[t] * (self.k1 + 1) / (doc[t] + norm) for t in terms if doc[t])
+            if score > 0:
+                scores[name] = score
+        return scores
+
+
+class ToolSelector:
+    """
+    Picks the tools bound to the model for one agent step, so the whole
+    MCP catalogue is not sent with every request. A step gets:
+    - the `always` tools,
+    - the `follow_ups` of the tools whose results just came in,
+    - the tools already called since the user's latest message (retries, more pages),
+    - the best lexical matches of the user's latest message,
+    in that order, up to `max_tools`. A first step that matches no tool, or
+    a catalogue no larger than `max_tools`, gets every tool.
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or {}
+        self.enabled = bool(settings.get("enabled", True))
+        self.max_tools = int(settings.get("max_tools", DEFAULT_MAX_TOOLS))
+        self.lexical_top_k = int(settings.get("lexical_top_k", DEFAULT_LEXICAL_TOP_K))
+        self.always = list(settings.get("always", DEFAULT_ALWAYS))
+        self.follow_ups: Dict[str, List[str]] = settings.get("follow_ups") or {}
+        self.max_variants = int(settings.get("max_variants", 64))
+        self.tools: Dict[str, object] = {}
+        self.index = LexicalToolIndex([])
+        # Latest user message -> lexical picks; every step of a run asks with the same message
+        self._matches: Dict[str, List[str]] = {}
+        self._stats = {"steps": 0, "subset": 0, "all": 0, "fallback": 0, "bound_tools": 0}
+
+    @classmethod
+    def from_config(cls, settings: Optional[dict]) -> "ToolSelector":
+        return cls(settings)
+
+    def index_tools(self, tools: Sequence):
+        self.tools = {tool.name: tool for tool in tools}
+        self.index = LexicalToolIndex(tools)
+        self._matches.clear()
+
+    def tools_for(self, subset: Tuple[str, ...]) -> list:
+        return [self.tools[name] for name in subset]
+
+    def _lexical(self, query: str) -> List[str]:
+        matches = self._matches.get(query)
+        if matches is None:
+            scores = self.index.scores(query)
+            matches = sorted(scores, key=lambda name: (-scores[name], name))[:self.lexical_top_k]
+            if len(self._matches) >= 256:
+                self._matches.clear()
+            self._matches[query] = matches
+        return matches
+
+    def select(self, messages: Sequence[BaseMessage]) -> Optional[Tuple[str, ...]]:
+        """Sorted names of the tools to bind for this step, or None for the whole catalogue."""
+        subset = self._select(messages) if self.enabled and len(self.tools) > self.max_tools else None
+        self._stats["steps"] += 1
+        self._stats["bound_tools"] += len(subset) if subset else len(self.tools)
+        self._stats["subset" if subset else "all"] += 1
+        tool_selections.inc(outcome="subset" if subset else "all")
+        bound_tools.observe(len(subset) if subset else len(self.tools))
+        return subset
+
+    def _select(self, messages: Sequence[BaseMessage]) -> Optional[Tuple[str, ...]]:
+        results, called, query = [], [], ""
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                query = message.content if isinstance(message.content, str) else ""
+                break
+            if isinstance(message, ToolMessage) and not called:
+                results.append(message.name)
+            elif isinstance(message, AIMessage):
+                called.extend(call["name"] for call in message.tool_calls or [])
+
+        lexical = self._lexical(query)
+        if not called and not lexical:
+            return None
+
+        chosen = dict.fromkeys(self.always)
+        for name in results:
+            chosen.update(dict.fromkeys(self.follow_ups.get(name, [])))
+        chosen.update(dict.fromkeys(called))
+        chosen.update(dict.fromkeys(lexical))
+        names = [name for name in chosen if name in self.tools][:self.max_tools]
+        return tuple(sorted(names)) if len(names) < len(self.tools) else None
+
+    def record_fallback(self):
+        self._stats["fallback"] += 1
+        tool_selections.inc(outcome="fallback")
+
+    def stats(self) -> dict:
+        steps = self._stats["steps"]
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "catalogue_tools": len(self.tools),
+            "avg_bound_tools": round(self._stats["bound_tools"] / steps, 2) if steps else 0.0
+        }
+
+
+def unbound_tool_error(e: Exception) -> bool:
+    """The provider rejected a call to a tool that was not bound (e.g. Groq's tool call validation)."""
+    text = str(e).lower()
+    return "tool" in text and ("not in request.tools" in text or "not in the list of tools" in text)
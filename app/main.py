@@ -8,18 +8,23 @@ if sys.platform == 'win32':
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.endpoints import router as api_router
-from app.core.graph import initialize_graph, saver_context
+from app.api.endpoints import router as api_router, batch_service
+from app.api.metrics import router as metrics_router
+from app.core.graph import initialize_graph, stop_background_startup, close_graph
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- STARTUP ---
-    # We initialize the graph and the active connection here
+    # We initialize the graph and the active connection here.
+    # By default MCP tools keep attaching in the background; GET /ready reports the progress
     await initialize_graph()
     yield
     # --- SHUTDOWN ---
     # We close the connection properly
-    await saver_context.__aexit__(None, None, None)
+    # Running batches stop here and are resumed with POST /batches/{batch_id}/resume
+    await stop_background_startup()
+    await batch_service.shutdown()
+    await close_graph()
 
 app = FastAPI(
     title="AgenticAnalyst PRO API",
@@ -28,6 +33,8 @@ app = FastAPI(
 )
 
 app.include_router(api_router, prefix="/api/v1", tags=["Agent"])
+# Unprefixed, where Prometheus scrapes by default
+app.include_router(metrics_router, tags=["Monitoring"])
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
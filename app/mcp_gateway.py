@@ -0,0 +1,102 @@
+"""
+Per-host MCP gateway for multi-worker deployments.
+
+Runs one session pool per server in mcp_config.yaml and exposes each server
+over MCP's SSE transport at /<server>/sse. API workers started with
+MCP_GATEWAY_URL (or deployment.mcp_gateway_url) connect here instead of
+spawning their own subprocesses, so a host runs `pool_size` subprocesses per
+server no matter how many workers it has.
+
+Usage:
+    python -m app.mcp_gateway [--host 127.0.0.1] [--port 8765]
+"""
+
+import sys
+import asyncio
+import argparse
+
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+import uvicorn
+import mcp.types as types
+
+from contextlib import asynccontextmanager
+from typing import Dict
+from mcp.server import Server
+from mcp.server.sse import SseServerTransport
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from app.core.config import load_config
+from app.core.mcp_pool import MCPSessionPool
+
+
+def build_server(pool: MCPSessionPool) -> Server:
+    """An MCP server that forwards every request to the pooled sessions."""
+    server = Server(pool.name)
+
+    @server.list_tools()
+    async def list_tools():
+        return (await pool.list_tools()).tools
+
+    @server.call_tool()
+    async def call_tool(name: str, arguments: dict):
+        try:
+            result = await pool.call_tool(name, arguments)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"The '{pool.name}' MCP server did not answer within {pool.call_timeout}s")
+        if result.isError:
+            # Raising keeps isError=True on the way back to the worker
+            raise RuntimeError("\n".join(c.text for c in result.content if isinstance(c, types.TextContent)))
+        return result.content
+
+    return server
+
+
+class SseEndpoint:
+    """ASGI app serving one MCP server's SSE stream (one per worker session)."""
+
+    def __init__(self, server: Server, transport: SseServerTransport):
+        self.server = server
+        self.transport = transport
+
+    async def __call__(self, scope, receive, send):
+        async with self.transport.connect_sse(scope, receive, send) as (read_stream, write_stream):
+            await self.server.run(read_stream, write_stream, self.server.create_initialization_options())
+
+
+def build_app(server_settings: Dict[str, dict]) -> Starlette:
+    pools = {name: MCPSessionPool(name, settings) for name, settings in server_settings.items()}
+
+    routes = []
+    for name, pool in pools.items():
+        transport = SseServerTransport(f"/{name}/messages/")
+        routes.append(Route(f"/{name}/sse", endpoint=SseEndpoint(build_server(pool), transport)))
+        routes.append(Mount(f"/{name}/messages/", app=transport.handle_post_message))
+
+    async def health(request):
+        return JSONResponse({
+            name: {"size": pool.size, "healthy": pool.healthy_count, "respawns": pool.respawn_count}
+            for name, pool in pools.items()
+        })
+
+    routes.append(Route("/health", endpoint=health))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await asyncio.gather(*(pool.start() for pool in pools.values()))
+        print(f"--- [MCP GATEWAY] Serving {', '.join(pools)} ---")
+        yield
+        await asyncio.gather(*(pool.close() for pool in pools.values()))
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    deployment = load_config().get("deployment", {})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=deployment.get("mcp_gateway_host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=deployment.get("mcp_gateway_port", 8765))
+    args = parser.parse_args()
+    uvicorn.run(build_app(load_config()["mcp_servers"]), host=args.host, port=args.port)
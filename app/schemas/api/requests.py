@@ -1,12 +1,44 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 
 class ChatRequest(BaseModel):
     """Initial chat request with optional thread continuity."""
-    message: str = Field(..., example="Search for NVIDIA price and save to nvidia.txt")
+    message: Optional[str] = Field(
+        ...,
+        example="Search for NVIDIA price and save to nvidia.txt",
+        description="null continues the thread_id from its last checkpoint, e.g. after a disconnect."
+    )
     thread_id: Optional[str] = Field(None, example="550e8400-e29b-41d4-a716-446655440000")
+    stream_mode: Literal["delta", "values"] = Field(
+        "delta",
+        description="'delta' streams typed events with new messages only; 'values' re-emits the last message of every step."
+    )
 
 class ApprovalRequest(BaseModel):
     """Request to approve or reject a pending agent action."""
     thread_id: str = Field(..., example="550e8400-e29b-41d4-a716-446655440000")
-    approve: bool = Field(..., example=True)
\ No newline at end of file
+    approve: bool = Field(..., example=True)
+
+class ApprovalStreamRequest(ApprovalRequest):
+    """Approval that streams the resumed run like /chat/stream."""
+    stream_mode: Literal["delta", "values"] = Field("delta", description="Same modes as /chat/stream.")
+
+class BulkApprovalRequest(BaseModel):
+    """Approve or reject many pending threads at once."""
+    thread_ids: List[str] = Field(..., min_length=1, max_length=100)
+    approve: bool = Field(..., example=True)
+
+class BatchJob(BaseModel):
+    """A single prompt of a batch; without a thread_id the batch assigns one."""
+    message: str = Field(..., example="Find the current price of the RTX 5090 and store it")
+    thread_id: Optional[str] = Field(None, example="550e8400-e29b-41d4-a716-446655440000")
+
+class BatchRequest(BaseModel):
+    """Many chat jobs run in the background with bounded concurrency."""
+    jobs: List[BatchJob] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1, description="Jobs run at once; capped by batch.max_concurrency.")
+    auto_approve: bool = Field(
+        False,
+        description="Approve report writes automatically. Otherwise jobs stop at 'waiting_approval' for /chat/approve."
+    )
+    stream: bool = Field(True, description="Stream NDJSON progress; false returns the batch id right away.")
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Literal
+
+StreamEventType = Literal["node_start", "node_end", "token", "tool_call", "tool_result", "message"]
 
 class ErrorResponse(BaseModel):
     """Standard error response schema."""
@@ -8,14 +10,90 @@ class ErrorResponse(BaseModel):
 class StreamResponse(BaseModel):
     """Schema representing a single chunk of data in the stream."""
     thread_id: str
-    content: str
-    node: str
+    content: str = ""
+    node: str = ""
     status: str
     next_step: Optional[List[str]] = None
+    # Delta mode only: typed event and tool details
+    event: Optional[StreamEventType] = None
+    tool_name: Optional[str] = None
+    tool_call_id: Optional[str] = None
+    tool_args: Optional[Dict[str, Any]] = None
+    content_length: Optional[int] = None
 
 class ApprovalResponse(BaseModel):
     """Response after an approval action."""
     status: str = Field(..., example="success")
     thread_id: str
     agent_response: str
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+
+class PendingApproval(BaseModel):
+    """A thread paused before human_approval."""
+    thread_id: str
+    requested_at: float
+    checkpoint_id: Optional[str] = None
+    tool_calls: List[Dict[str, Any]] = Field(..., description="Tool calls waiting for approval (name, args, id).")
+
+class ApprovalListResponse(BaseModel):
+    """One page of pending approvals, oldest first."""
+    approvals: List[PendingApproval]
+    next_cursor: Optional[str] = Field(None, description="Pass as ?cursor= for the next page; null on the last one.")
+    total: int
+
+class BulkApprovalResult(BaseModel):
+    thread_id: str
+    status: str = Field(..., example="success", description="success, aborted, busy or error")
+    agent_response: Optional[str] = None
+    message: Optional[str] = None
+
+class BulkApprovalResponse(BaseModel):
+    results: List[BulkApprovalResult]
+    counts: Dict[str, int]
+
+BatchEventType = Literal["batch", "job_start", "job_step", "job_end", "batch_end"]
+
+class BatchEvent(BaseModel):
+    """One NDJSON line of batch progress."""
+    event: BatchEventType
+    batch_id: str
+    status: Optional[str] = None
+    index: Optional[int] = None
+    thread_id: Optional[str] = None
+    node: Optional[str] = None
+    resumed: Optional[bool] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+    total: Optional[int] = None
+    counts: Optional[Dict[str, int]] = None
+
+class BatchJobStatus(BaseModel):
+    index: int
+    thread_id: str
+    message: str
+    status: str = Field(..., example="completed")
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchStatusResponse(BaseModel):
+    """State of a batch and of each of its jobs."""
+    batch_id: str
+    status: str = Field(..., example="running", description="running, interrupted or finished")
+    active_in_this_worker: bool
+    total: int
+    counts: Dict[str, int]
+    concurrency: int
+    auto_approve: bool
+    created_at: float
+    finished_at: Optional[float] = None
+    jobs: List[BatchJobStatus]
+
+class ReportInfo(BaseModel):
+    name: str = Field(..., example="rtx5090.md")
+    stored_bytes: int
+    compressed: bool
+    modified_at: float
+
+class ReportListResponse(BaseModel):
+    """Reports saved by save_report_to_disk, newest first."""
+    reports: List[ReportInfo]
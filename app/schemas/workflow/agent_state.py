@@ -13,4 +13,8 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
     # We will use this to track token usage across the lifecycle
-    total_tokens: int
\ No newline at end of file
+    total_tokens: int
+
+    # Estimated size of the last (compacted) prompt sent to the LLM.
+    # 'messages' always keeps the full history; compaction only shapes the prompt.
+    context_tokens: int
\ No newline at end of file
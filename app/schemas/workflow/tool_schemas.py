@@ -1,4 +1,6 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
 
 class WriteReportSchema(BaseModel):
     """Schema for the report writing tool."""
@@ -7,4 +9,27 @@ class WriteReportSchema(BaseModel):
 
 class WebSearchSchema(BaseModel):
     """Schema for the web search tool."""
-    query: str = Field(description="The search query to look up on the internet.")
\ No newline at end of file
+    query: str = Field(description="The search query to look up on the internet.")
+    queries: Optional[List[str]] = Field(
+        default=None,
+        description="Optional extra search queries, executed in parallel with 'query' in the same call."
+    )
+
+class ProductRecord(BaseModel):
+    """A single scraped product price."""
+    name: str = Field(description="Product name as shown by the retailer.")
+    price_in_cents: int = Field(ge=0, description="Price in cents, e.g. $1,999.99 -> 199999. Never invent prices.")
+    stock: int = Field(default=0, ge=0, description="Units in stock, 0 if unknown.")
+    source_url: str = Field(description="URL of the page the price was read from.")
+    observed_at: Optional[datetime] = Field(
+        default=None, description="ISO timestamp of the observation. Defaults to now."
+    )
+
+class BulkUpsertProductsSchema(BaseModel):
+    """Schema for the bulk product ingestion tool."""
+    records: List[ProductRecord] = Field(description="All product records found, in a single call.")
+
+class PriceSummarySchema(BaseModel):
+    """Schema for the price history summary tool."""
+    products: List[str] = Field(description="Exact product names as stored in the 'products' table.")
+    window_days: int = Field(default=7, ge=1, le=365, description="Comparison window in days, e.g. 7 for last week.")
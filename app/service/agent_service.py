@@ -1,56 +1,317 @@
+import time
 import uuid
 import json
+import asyncio
 
-from typing import AsyncGenerator, Optional
-from langchain_core.messages import HumanMessage
+from typing import AsyncGenerator, Awaitable, Callable, List, Optional
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
 from app.core import graph  # Import the module to access the global app_graph
+from app.core.approvals import APPROVAL_NODE
+from app.core.cancellation import RunScope, run_detached
+from app.core.config import load_config
+from app.core.telemetry import telemetry
+from app.core.thread_lock import ThreadBusyError
+from app.schemas.api.responses import StreamResponse
+
+# Tool outputs (e.g. scraped pages) are only previewed in delta mode
+TOOL_RESULT_PREVIEW_CHARS = 200
+
 
 class AgentService:
+    def __init__(self, config: Optional[dict] = None):
+        config = config if config is not None else load_config()
+        # Approvals run at once by POST /approvals/bulk
+        self.bulk_concurrency = max(1, int((config.get("approvals") or {}).get("bulk_concurrency", 4)))
+        # Seconds between checks for a gone client while a run sends no events
+        self.disconnect_poll = float((config.get("cancellation") or {}).get("disconnect_poll_interval", 1.0))
+
     @staticmethod
     def generate_thread_id() -> str:
         return str(uuid.uuid4())
 
-    async def stream_chat(self, message: str, thread_id: Optional[str] = None) -> AsyncGenerator[str, None]:
+    @staticmethod
+    def _event(**fields) -> str:
+        """Validates an event against StreamResponse and serializes it."""
+        start = time.perf_counter()
+        data = StreamResponse(**fields).model_dump_json(exclude_none=True)
+        telemetry.stream_serialize.inc(time.perf_counter() - start)
+        telemetry.stream_events.inc(event=fields.get("event") or fields["status"])
+        return data
+
+    @staticmethod
+    def _text(content) -> str:
+        return content if isinstance(content, str) else json.dumps(content)
+
+    async def stream_chat(
+        self,
+        message: Optional[str],
+        thread_id: Optional[str] = None,
+        stream_mode: str = "delta",
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Runs the graph for a new user message; message=None continues the thread
+        from its last checkpoint. With `disconnected` (HTTP clients) the run is
+        cancelled when the client goes away.
+        """
         print(f"stream_chat: {thread_id}")
         current_thread_id = thread_id or self.generate_thread_id()
-        config = {"configurable": {"thread_id": current_thread_id}, "recursion_limit": 25}
+        config = self._config(current_thread_id)
 
         inputs = {
             "messages": [HumanMessage(content=message)],
             "total_tokens": 0
+        } if message is not None else None
+
+        stream = self._run_stream(inputs, config, current_thread_id, stream_mode, "stream")
+        async for event_data in self._cancellable(stream, "stream", current_thread_id, disconnected):
+            yield event_data
+
+    async def stream_approval(
+        self,
+        thread_id: str,
+        stream_mode: str = "delta",
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncGenerator[str, None]:
+        """Resumes a paused thread, streaming the same events as stream_chat."""
+        print(f"stream_approval: {thread_id}")
+        stream = self._run_stream(None, self._config(thread_id), thread_id, stream_mode, "approve")
+        async for event_data in self._cancellable(stream, "approve", thread_id, disconnected):
+            yield event_data
+
+    def _cancellable(self, stream: AsyncGenerator[str, None], kind: str, thread_id: str, disconnected):
+        """Runs the stream detached from the response when there is a client to watch."""
+        if disconnected is None:
+            return stream
+        return run_detached(stream, RunScope(kind, thread_id), disconnected, self.disconnect_poll)
+
+    @staticmethod
+    def _config(thread_id: str) -> dict:
+        return {
+            "configurable": {"thread_id": thread_id},
+            "recursion_limit": 25,
+            "callbacks": [telemetry.handler()]
         }
 
+    async def _run_stream(
+        self, inputs, config: dict, thread_id: str, stream_mode: str, kind: str
+    ) -> AsyncGenerator[str, None]:
+        """
+        Streams one run under the thread's lease and updates the approval index
+        from the checkpoint it ends on. inputs=None resumes: a stalled thread is
+        rerouted first; for an approval (kind "approve") the thread must have a
+        pending step.
+        """
+        if stream_mode == "values":
+            stream = self._stream_values(inputs, config, thread_id)
+        else:
+            stream = self._stream_deltas(inputs, config, thread_id)
+
+        try:
+            async with graph.thread_leases.hold(thread_id):
+                with telemetry.run(kind, thread_id):
+                    if inputs is None and kind == "stream":
+                        await self._reroute_stalled(config)
+                    if kind == "approve" and not (await graph.app_graph.aget_state(config)).next:
+                        await graph.approval_index.remove([thread_id])
+                        yield self._event(thread_id=thread_id, status="error", content="No pending actions found.")
+                        return
+
+                    async for event_data in stream:
+                        yield event_data
+
+                    snapshot = await graph.app_graph.aget_state(config)
+                telemetry.run_tokens.observe(snapshot.values.get("total_tokens", 0))
+                await self._index_approval(thread_id, snapshot)
+        except ThreadBusyError as e:
+            yield self._event(thread_id=thread_id, status="error", content=str(e))
+            return
+
+        if snapshot.next:
+            yield self._event(thread_id=thread_id, status="waiting_approval", next_step=list(snapshot.next))
+
+    async def _index_approval(self, thread_id: str, snapshot):
+        """Lists the thread in the approval index while it is paused before human_approval."""
+        try:
+            if APPROVAL_NODE not in snapshot.next:
+                await graph.approval_index.remove([thread_id])
+                return
+            messages = snapshot.values.get("messages", [])
+            tool_calls = (getattr(messages[-1], "tool_calls", None) or []) if messages else []
+            await graph.approval_index.add(
+                thread_id,
+                (snapshot.config or {}).get("configurable", {}).get("checkpoint_id"),
+                [{"name": call["name"], "args": call["args"], "id": call["id"]} for call in tool_calls]
+            )
+        except Exception as e:
+            # The checkpoint stays the source of truth; a missed update only affects GET /approvals
+            print(f"--- [APPROVALS ERROR] Index update for {thread_id} failed: {e} ---")
+
+    async def _stream_values(self, inputs, config: dict, thread_id: str) -> AsyncGenerator[str, None]:
+        """Legacy mode: re-emits the last message of the full state on every step."""
         # Accessing the globally initialized graph
-        async for event in graph.app_graph.astream(inputs, config, stream_mode="values"):
-            if event:
+        # 'messages' carries token chunks from the async agent node, 'values' the full state
+        async for mode, event in graph.app_graph.astream(inputs, config, stream_mode=["values", "messages"]):
+            if mode == "messages":
+                chunk, metadata = event
+                if isinstance(chunk, AIMessageChunk) and isinstance(chunk.content, str) and chunk.content:
+                    yield self._event(
+                        thread_id=thread_id, status="token", node=metadata.get("langgraph_node", "agent"),
+                        content=chunk.content
+                    )
+            elif event:
                 last_message = event["messages"][-1]
-                yield json.dumps({
-                    "thread_id": current_thread_id,
-                    "content": last_message.content,
-                    "node": "agent_execution",
-                    "status": "in_progress"
-                })
-
-        snapshot = await graph.app_graph.aget_state(config)
-        if snapshot.next:
-            yield json.dumps({
-                "thread_id": current_thread_id,
-                "status": "waiting_approval",
-                "next_step": snapshot.next
-            })
+                yield self._event(
+                    thread_id=thread_id, status="in_progress", node="agent_execution",
+                    content=self._text(last_message.content)
+                )
+
+    async def _stream_deltas(self, inputs, config: dict, thread_id: str) -> AsyncGenerator[str, None]:
+        """
+        Delta mode: emits typed events built from each node's own writes, so
+        every message crosses the wire once and tool outputs only as a summary.
+        """
+        streamed_tokens = False
+
+        async for mode, event in graph.app_graph.astream(inputs, config, stream_mode=["debug", "messages"]):
+            if mode == "messages":
+                chunk, metadata = event
+                if isinstance(chunk, AIMessageChunk) and isinstance(chunk.content, str) and chunk.content:
+                    streamed_tokens = True
+                    yield self._event(
+                        thread_id=thread_id, status="in_progress", event="token",
+                        node=metadata.get("langgraph_node", "agent"), content=chunk.content
+                    )
+                continue
+
+            if event["type"] == "task":
+                streamed_tokens = False
+                yield self._event(
+                    thread_id=thread_id, status="in_progress", event="node_start", node=event["payload"]["name"]
+                )
+
+            elif event["type"] == "task_result":
+                node = event["payload"]["name"]
+                for channel, value in event["payload"]["result"]:
+                    if channel != "messages":
+                        continue
+                    for msg in value if isinstance(value, list) else [value]:
+                        for event_data in self._message_events(msg, node, thread_id, streamed_tokens):
+                            yield event_data
+
+                yield self._event(
+                    thread_id=thread_id, status="in_progress", event="node_end", node=node,
+                    content=str(event["payload"]["error"] or "")
+                )
+
+    def _message_events(self, msg, node: str, thread_id: str, streamed_tokens: bool):
+        """Maps a single new message to its delta events."""
+        if isinstance(msg, ToolMessage):
+            content = self._text(msg.content)
+            yield self._event(
+                thread_id=thread_id, status="in_progress", event="tool_result", node=node,
+                tool_name=msg.name, tool_call_id=msg.tool_call_id,
+                content=content[:TOOL_RESULT_PREVIEW_CHARS], content_length=len(content)
+            )
+        elif isinstance(msg, AIMessage):
+            # Text already sent as tokens is not repeated
+            if msg.content and not streamed_tokens:
+                yield self._event(
+                    thread_id=thread_id, status="in_progress", event="message", node=node,
+                    content=self._text(msg.content)
+                )
+            for tool_call in msg.tool_calls:
+                yield self._event(
+                    thread_id=thread_id, status="in_progress", event="tool_call", node=node,
+                    tool_name=tool_call["name"], tool_call_id=tool_call["id"], tool_args=tool_call["args"]
+                )
+
+    @staticmethod
+    def _stalled(snapshot) -> bool:
+        """Tool calls with no step scheduled to run them."""
+        messages = snapshot.values.get("messages", []) if snapshot.values else []
+        return not snapshot.tasks and bool(messages) and bool(getattr(messages[-1], "tool_calls", None))
+
+    async def _reroute_stalled(self, config: dict):
+        """
+        A run cancelled while the agent node's writes were being saved can keep
+        the AIMessage but lose the routing write. Replaying the agent's edge
+        (an empty update as "agent") schedules the step that was lost.
+        """
+        if self._stalled(await graph.app_graph.aget_state(config)):
+            await graph.app_graph.aupdate_state(config, {"messages": []}, as_node="agent")
+
+    async def thread_snapshot(self, thread_id: str) -> dict:
+        """
+        Latest checkpoint of a thread: its id, the nodes of the unfinished step
+        and the last message. The step's tasks are used instead of
+        snapshot.next: a run cancelled after a node saved its writes, but before
+        the step was committed, has an empty `next` and is still unfinished.
+        A stalled thread (see _reroute_stalled) reports the agent's edge as next.
+        """
+        snapshot = await graph.app_graph.aget_state({"configurable": {"thread_id": thread_id}})
+        messages = snapshot.values.get("messages", []) if snapshot.values else []
+        return {
+            "checkpoint_id": (snapshot.config or {}).get("configurable", {}).get("checkpoint_id"),
+            "next": [task.name for task in snapshot.tasks] or (["agent"] if self._stalled(snapshot) else []),
+            "last_message": self._text(messages[-1].content) if messages else None
+        }
 
     async def approve_agent_action(self, thread_id: str) -> dict:
+        """Resumes a paused thread. Raises ThreadBusyError if it is already running elsewhere."""
         print(f"approve_agent_action: {thread_id}")
-        config = {"configurable": {"thread_id": thread_id}}
+        config = {"configurable": {"thread_id": thread_id}, "callbacks": [telemetry.handler()]}
 
-        snapshot = await graph.app_graph.aget_state(config)
-        if not snapshot.next:
-            return {"status": "error", "message": "No pending actions found."}
+        async with graph.thread_leases.hold(thread_id):
+            with telemetry.run("approve", thread_id):
+                snapshot = await graph.app_graph.aget_state(config)
+                if not snapshot.next:
+                    await graph.approval_index.remove([thread_id])
+                    return {"status": "error", "message": "No pending actions found."}
 
-        # Resume with None as input
-        result = await graph.app_graph.ainvoke(None, config)
+                # Resume with None as input
+                result = await graph.app_graph.ainvoke(None, config)
+                # The agent may have asked to save another report
+                snapshot = await graph.app_graph.aget_state(config)
+            telemetry.run_tokens.observe(result.get("total_tokens", 0))
+            await self._index_approval(thread_id, snapshot)
         return {
             "status": "success",
             "thread_id": thread_id,
             "agent_response": result["messages"][-1].content
-        }
\ No newline at end of file
+        }
+
+    async def reject_pending(self, thread_ids: List[str]) -> int:
+        """
+        Drops threads from the approval index. Their checkpoints are left as
+        they are, so a thread can still be approved or continued with a new message.
+        """
+        return await graph.approval_index.remove(thread_ids)
+
+    async def list_pending(self, limit: int, cursor: Optional[str] = None) -> dict:
+        items, next_cursor = await graph.approval_index.page(limit, cursor)
+        return {"approvals": items, "next_cursor": next_cursor, "total": await graph.approval_index.count()}
+
+    async def bulk_approve(self, thread_ids: List[str]) -> List[dict]:
+        """Approves each thread, at most bulk_concurrency at a time. One result per thread, in request order."""
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+
+        async def approve(thread_id: str) -> dict:
+            async with semaphore:
+                try:
+                    result = await self.approve_agent_action(thread_id)
+                except ThreadBusyError as e:
+                    return {"thread_id": thread_id, "status": "busy", "message": str(e)}
+                except Exception as e:
+                    return {"thread_id": thread_id, "status": "error", "message": str(e)}
+            if result["status"] != "success":
+                return {"thread_id": thread_id, "status": "error", "message": result["message"]}
+            return {"thread_id": thread_id, "status": "success", "agent_response": self._text(result["agent_response"])}
+
+        # An approval whose run was cancelled comes back as its CancelledError: report it for that thread only
+        results = await asyncio.gather(*(approve(thread_id) for thread_id in thread_ids), return_exceptions=True)
+        return [
+            result if isinstance(result, dict)
+            else {"thread_id": thread_id, "status": "error", "message": str(result) or type(result).__name__}
+            for thread_id, result in zip(thread_ids, results)
+        ]
@@ -0,0 +1,239 @@
+import json
+import uuid
+import asyncio
+
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, AsyncGenerator, Dict, List, Optional
+from app.core.approvals import APPROVAL_NODE
+from app.core.batch_store import BatchStore, COMPLETED, FAILED, FINISHED_STATES, WAITING_APPROVAL
+from app.core.config import load_config
+from app.core.thread_lock import ThreadLeaseManager
+from app.schemas.api.responses import BatchEvent
+
+if TYPE_CHECKING:
+    # The agent service module builds the graph (and the LLM client) on import
+    from app.service.agent_service import AgentService
+
+# Runs of the graph per job and attempt: the first one, plus continuations of a thread
+# that stopped early (see AgentService._reroute_stalled)
+MAX_PASSES = 3
+
+
+class BatchService:
+    """
+    Runs batches of chat jobs through AgentService in the background, at most
+    `concurrency` jobs of a batch at a time. Progress is published to any
+    number of NDJSON followers; a follower going away does not stop the batch.
+
+    Each job runs on its own thread_id and its state is kept in the BatchStore.
+    Resuming a batch skips finished jobs and continues unfinished ones from the
+    last checkpoint of their thread, so completed graph steps are not redone.
+    """
+
+    def __init__(self, agent_service: "AgentService", store: BatchStore, leases: ThreadLeaseManager,
+                 settings: Optional[dict] = None):
+        settings = settings if settings is not None else load_config().get("batch") or {}
+        self.agent_service = agent_service
+        self.store = store
+        self.leases = leases
+        self.default_concurrency = int(settings.get("default_concurrency", 4))
+        self.max_concurrency = int(settings.get("max_concurrency", 16))
+        self.max_jobs = int(settings.get("max_jobs", 1000))
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.followers: Dict[str, List[asyncio.Queue]] = defaultdict(list)
+
+    @staticmethod
+    def _lease_key(batch_id: str) -> str:
+        # Batch runners share the thread lease table; one runner per batch across workers
+        return f"batch:{batch_id}"
+
+    async def submit(self, jobs: List[dict], concurrency: Optional[int] = None, auto_approve: bool = False) -> str:
+        """Stores a new batch and starts it. `jobs` are dicts with message and optional thread_id."""
+        if not jobs:
+            raise ValueError("A batch needs at least one job.")
+        if len(jobs) > self.max_jobs:
+            raise ValueError(f"A batch accepts at most {self.max_jobs} jobs, got {len(jobs)}.")
+
+        # Jobs of a batch run concurrently: two of them on one thread would fight over its lease
+        given = Counter(job["thread_id"] for job in jobs if job.get("thread_id"))
+        duplicates = sorted(thread_id for thread_id, n in given.items() if n > 1)
+        if duplicates:
+            raise ValueError(f"Each job of a batch needs its own thread_id, repeated: {', '.join(duplicates)}.")
+
+        batch_id = str(uuid.uuid4())
+        concurrency = max(1, min(concurrency or self.default_concurrency, self.max_concurrency))
+        jobs = [
+            {"message": job["message"], "thread_id": job.get("thread_id") or f"{batch_id}-{i}"}
+            for i, job in enumerate(jobs)
+        ]
+        await self.store.create(batch_id, jobs, concurrency, auto_approve)
+        await self._start(batch_id)
+        return batch_id
+
+    async def resume(self, batch_id: str):
+        """
+        Restarts the unfinished jobs of a batch. Raises KeyError for unknown
+        batches and ThreadBusyError if another worker is running it.
+        """
+        if await self.store.get_batch(batch_id) is None:
+            raise KeyError(batch_id)
+        if batch_id in self.tasks:
+            return
+        await self.store.reopen_batch(batch_id)
+        await self._start(batch_id)
+
+    async def _start(self, batch_id: str):
+        token = await self.leases.acquire(self._lease_key(batch_id))
+        self.tasks[batch_id] = asyncio.create_task(self._run(batch_id, token), name=f"batch-{batch_id}")
+
+    async def shutdown(self):
+        """Cancels the running batches; their unfinished jobs can be resumed later."""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def _publish(self, batch_id: str, event: Optional[BatchEvent]):
+        for queue in self.followers.get(batch_id, []):
+            queue.put_nowait(event)
+
+    async def _run(self, batch_id: str, token: str):
+        try:
+            async with self.leases.hold(self._lease_key(batch_id), token):
+                batch = await self.store.get_batch(batch_id)
+                jobs = [job for job in await self.store.get_jobs(batch_id) if job["status"] != COMPLETED]
+                semaphore = asyncio.Semaphore(batch["concurrency"])
+                # return_exceptions: when cancelled, wait until every job has let go of its thread
+                # lease, instead of returning as soon as the first one stops
+                await asyncio.gather(*(
+                    self._run_job(batch_id, job, semaphore, bool(batch["auto_approve"])) for job in jobs
+                ), return_exceptions=True)
+                await self.store.finish_batch(batch_id)
+                self._publish(batch_id, await self._summary_event(batch_id, "batch_end", "finished"))
+        except Exception as e:
+            print(f"--- [BATCH ERROR] Batch {batch_id} stopped: {e} ---")
+            self._publish(batch_id, BatchEvent(event="batch_end", batch_id=batch_id, status="error", error=str(e)))
+        finally:
+            self.tasks.pop(batch_id, None)
+            self._publish(batch_id, None)
+
+    async def _run_job(self, batch_id: str, job: dict, semaphore: asyncio.Semaphore, auto_approve: bool):
+        index, thread_id = job["job_index"], job["thread_id"]
+        async with semaphore:
+            try:
+                snapshot = await self.agent_service.thread_snapshot(thread_id)
+                # The thread moved past the checkpoint the job started from: continue, don't start over
+                progressed = job["started_at"] is not None and snapshot["checkpoint_id"] != job["start_checkpoint"]
+                await self.store.start_job(batch_id, index, snapshot["checkpoint_id"])
+                self._publish(batch_id, BatchEvent(
+                    event="job_start", batch_id=batch_id, index=index, thread_id=thread_id, resumed=progressed
+                ))
+
+                message = None if progressed else job["message"]
+                for _ in range(MAX_PASSES):
+                    if message is None and (not snapshot["next"] or APPROVAL_NODE in snapshot["next"]):
+                        break
+                    await self._drain(batch_id, index, thread_id, message)
+                    message = None
+                    snapshot = await self.agent_service.thread_snapshot(thread_id)
+
+                status, result, error = await self._outcome(thread_id, snapshot, auto_approve)
+            except Exception as e:
+                status, result, error = FAILED, None, str(e)
+
+            await self.store.finish_job(batch_id, index, status, result, error)
+            self._publish(batch_id, BatchEvent(
+                event="job_end", batch_id=batch_id, index=index, thread_id=thread_id,
+                status=status, result=result, error=error
+            ))
+
+    async def _drain(self, batch_id: str, index: int, thread_id: str, message: Optional[str]):
+        """Runs the graph for a job, forwarding finished nodes as progress."""
+        async for event_data in self.agent_service.stream_chat(message, thread_id):
+            event = json.loads(event_data)
+            if event.get("status") == "error":
+                raise RuntimeError(event.get("content") or "The agent run failed.")
+            if event.get("event") == "node_end":
+                self._publish(batch_id, BatchEvent(
+                    event="job_step", batch_id=batch_id, index=index, thread_id=thread_id, node=event["node"]
+                ))
+
+    async def _outcome(self, thread_id: str, snapshot: dict, auto_approve: bool):
+        """Job status from the thread's last checkpoint, approving the pending report if allowed."""
+        if APPROVAL_NODE in snapshot["next"]:
+            if not auto_approve:
+                return WAITING_APPROVAL, None, None
+            approval = await self.agent_service.approve_agent_action(thread_id)
+            if approval.get("status") != "success":
+                return FAILED, None, approval.get("message")
+            return COMPLETED, approval["agent_response"], None
+        if snapshot["next"]:
+            return FAILED, None, f"The run stopped before finishing (next: {', '.join(snapshot['next'])})."
+        return COMPLETED, snapshot["last_message"], None
+
+    async def status(self, batch_id: str) -> Optional[dict]:
+        batch = await self.store.get_batch(batch_id)
+        if batch is None:
+            return None
+        jobs = await self.store.get_jobs(batch_id)
+        counts = defaultdict(int)
+        for job in jobs:
+            counts[job["status"]] += 1
+
+        active = batch_id in self.tasks
+        if active or await self.leases.holder(self._lease_key(batch_id)):
+            state = "running"
+        elif any(job["status"] not in FINISHED_STATES for job in jobs):
+            # Unfinished jobs and nobody running them: the worker stopped or crashed
+            state = "interrupted"
+        else:
+            state = "finished"
+        return {
+            "batch_id": batch_id,
+            "status": state,
+            "active_in_this_worker": active,
+            "total": len(jobs),
+            "counts": dict(counts),
+            "concurrency": batch["concurrency"],
+            "auto_approve": bool(batch["auto_approve"]),
+            "created_at": batch["created_at"],
+            "finished_at": batch["finished_at"],
+            "jobs": [
+                {
+                    "index": job["job_index"],
+                    "thread_id": job["thread_id"],
+                    "message": job["message"],
+                    "status": job["status"],
+                    "result": job["result"],
+                    "error": job["error"]
+                }
+                for job in jobs
+            ]
+        }
+
+    async def _summary_event(self, batch_id: str, event: str, state: Optional[str] = None) -> BatchEvent:
+        status = await self.status(batch_id)
+        return BatchEvent(
+            event=event, batch_id=batch_id, status=state or status["status"], total=status["total"],
+            counts=status["counts"]
+        )
+
+    async def follow(self, batch_id: str) -> AsyncGenerator[str, None]:
+        """
+        NDJSON lines: the current state of the batch first, then live events
+        until it ends. Batches not running in this worker only get the first line.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self.followers[batch_id].append(queue)
+        try:
+            yield (await self._summary_event(batch_id, "batch")).model_dump_json(exclude_none=True) + "\n"
+            if batch_id not in self.tasks:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            self.followers[batch_id].remove(queue)
+            if not self.followers[batch_id]:
+                del self.followers[batch_id]
@@ -1,29 +1,221 @@
 import os
+import gzip
+import asyncio
+import hashlib
+import tempfile
 
-from langchain_core.tools import tool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from langchain_core.tools import StructuredTool
+from app.core.config import load_config
 from app.schemas.workflow.tool_schemas import WriteReportSchema
 
-@tool(args_schema=WriteReportSchema)
-def save_report_to_disk(filename: str, content: str) -> str:
+DEFAULT_OUTPUT_DIR = "output"
+DEFAULT_CHUNK_SIZE = 64 * 1024
+GZIP_SUFFIX = ".gz"
+REPORT_TOOL_NAME = "save_report_to_disk"
+
+
+class ReportStore:
     """
-    Saves a professional report to the local 'output' directory.
-    Use this tool when the user asks to save results or generate a file.
-    IMPORTANT: The 'content' argument must be the FINAL, complete text with all
-    variables and data points already populated. Do not send templates or placeholders.
+    Report files in a single directory. A report is written in chunks to a
+    temp file next to its target and moved into place with an atomic rename,
+    so a crash or a concurrent reader never sees a partial file. Writing the
+    same content again (same sha256) leaves the file untouched. With gzip on,
+    reports are stored as `<name>.gz` and still addressed by `<name>`.
     """
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, compress: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.output_dir = Path(output_dir)
+        self.compress = bool(compress)
+        self.chunk_size = max(1024, int(chunk_size))
+        self._dir_ready = False
+        # file name -> (size, mtime_ns, sha256 of the uncompressed content)
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+
+    @classmethod
+    def from_config(cls, settings: Optional[dict]) -> "ReportStore":
+        settings = settings or {}
+        return cls(
+            output_dir=settings.get("output_dir") or DEFAULT_OUTPUT_DIR,
+            compress=settings.get("gzip", False),
+            chunk_size=int(settings.get("chunk_size_kb", DEFAULT_CHUNK_SIZE // 1024)) * 1024
+        )
+
+    @staticmethod
+    def safe_name(filename: str) -> str:
+        """The bare file name; directories (and path traversal) are not allowed in report names."""
+        name = os.path.basename((filename or "").replace("\\", "/")).strip()
+        if name in ("", ".", "..") or name.startswith("."):
+            raise ValueError(f"Invalid report file name: {filename!r}")
+        return name
+
+    def _ensure_dir(self):
+        if not self._dir_ready:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._dir_ready = True
+
+    def _stored_hash(self, path: Path) -> Optional[str]:
+        """sha256 of the content of an existing report, cached by size and mtime."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        cached = self._hashes.get(path.name)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        opener = gzip.open if path.name.endswith(GZIP_SUFFIX) else open
+        try:
+            with opener(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    digest.update(chunk)
+        except (OSError, EOFError):
+            # Unreadable or truncated (e.g. written by an older version in place): rewrite it
+            return None
+        self._hashes[path.name] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+        return digest.hexdigest()
+
+    def _write_chunks(self, target: Path, data: bytes, compress: bool):
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=f".{target.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                # mtime=0: the same report always compresses to the same bytes
+                out = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) if compress else raw
+                view = memoryview(data)
+                for start in range(0, len(data), self.chunk_size):
+                    out.write(view[start:start + self.chunk_size])
+                if compress:
+                    out.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def write(self, filename: str, content: str, compress: Optional[bool] = None) -> dict:
+        """Writes a report unless the stored copy already has this content. Blocking."""
+        name = self.safe_name(filename)
+        compress = self.compress if compress is None else compress
+        self._ensure_dir()
+
+        data = content.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        target = self.output_dir / (name + GZIP_SUFFIX if compress else name)
+        other = self.output_dir / (name if compress else name + GZIP_SUFFIX)
+
+        skipped = self._stored_hash(target) == sha
+        if not skipped:
+            self._write_chunks(target, data, compress)
+            stat = target.stat()
+            self._hashes[target.name] = (stat.st_size, stat.st_mtime_ns, sha)
+        # Only one copy per report: drop the one written with the other compression setting
+        if other.exists():
+            other.unlink()
+            self._hashes.pop(other.name, None)
+
+        return {
+            "name": name,
+            "path": str(target),
+            "content_bytes": len(data),
+            "stored_bytes": target.stat().st_size,
+            "sha256": sha,
+            "compressed": compress,
+            "skipped": skipped
+        }
+
+    async def awrite(self, filename: str, content: str, compress: Optional[bool] = None) -> dict:
+        """Same as write(), with the file I/O off the event loop."""
+        return await asyncio.to_thread(self.write, filename, content, compress)
+
+    def find(self, filename: str) -> Optional[Tuple[Path, bool]]:
+        """(path, compressed) of a stored report, or None."""
+        name = self.safe_name(filename)
+        for path, compressed in ((self.output_dir / name, False), (self.output_dir / (name + GZIP_SUFFIX), True)):
+            if path.is_file():
+                return path, compressed
+        return None
+
+    def sha256(self, path: Path) -> Optional[str]:
+        return self._stored_hash(path)
+
+    def read_bytes(self, filename: str) -> Optional[bytes]:
+        """Uncompressed content of a report, or None if it doesn't exist."""
+        found = self.find(filename)
+        if found is None:
+            return None
+        path, compressed = found
+        return gzip.decompress(path.read_bytes()) if compressed else path.read_bytes()
+
+    def list(self) -> List[dict]:
+        if not self.output_dir.is_dir():
+            return []
+        reports = []
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                # Hidden files include temp files of writes in progress
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                compressed = entry.name.endswith(GZIP_SUFFIX)
+                stat = entry.stat()
+                reports.append({
+                    "name": entry.name[:-len(GZIP_SUFFIX)] if compressed else entry.name,
+                    "stored_bytes": stat.st_size,
+                    "compressed": compressed,
+                    "modified_at": stat.st_mtime
+                })
+        return sorted(reports, key=lambda r: r["modified_at"], reverse=True)
+
+
+report_store = ReportStore.from_config(load_config().get("reports"))
+
+
+def _summary(result: dict) -> str:
+    size_kb = result["content_bytes"] / 1024
+    stored = f", {result['stored_bytes'] / 1024:.1f} KB gzipped" if result["compressed"] else ""
+    return f"{result['path']} ({size_kb:.1f} KB{stored}, sha256 {result['sha256'][:12]})"
+
+
+def _report_message(result: dict) -> str:
+    # Only a size/hash summary is logged, never the report itself
+    state = "unchanged, not rewritten" if result["skipped"] else "written"
+    print(f"--- Tool {REPORT_TOOL_NAME}: {_summary(result)} {state} ---")
+    if result["skipped"]:
+        return f"Report {_summary(result)} already has this content, nothing to rewrite."
+    return f"Successfully saved report to {_summary(result)}"
+
+
+def _save_report_sync(filename: str, content: str) -> str:
+    try:
+        return _report_message(report_store.write(filename, content))
+    except Exception as e:
+        print(f"Error saving report: {str(e)}")
+        return f"Error saving report: {str(e)}"
+
+
+async def _save_report(filename: str, content: str) -> str:
     try:
-        print(f"--- Tool save_report_to_disk received: {content} ---")
-        # Create output directory if it doesn't exist
-        output_dir = "output"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        file_path = os.path.join(output_dir, filename)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"Saving report to {filename}")
-        return f"Successfully saved report to {file_path}"
+        return _report_message(await report_store.awrite(filename, content))
     except Exception as e:
         print(f"Error saving report: {str(e)}")
-        return f"Error saving report: {str(e)}"
\ No newline at end of file
+        return f"Error saving report: {str(e)}"
+
+
+save_report_to_disk = StructuredTool.from_function(
+    func=_save_report_sync,
+    coroutine=_save_report,
+    name=REPORT_TOOL_NAME,
+    description=(
+        "Saves a professional report to the local 'output' directory.\n"
+        "Use this tool when the user asks to save results or generate a file.\n"
+        "IMPORTANT: The 'content' argument must be the FINAL, complete text with all "
+        "variables and data points already populated. Do not send templates or placeholders."
+    ),
+    args_schema=WriteReportSchema
+)
@@ -0,0 +1,373 @@
+import re
+import json
+import asyncio
+import sqlite3
+
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from langchain_core.tools import StructuredTool
+from app.core.config import load_config
+from app.core.tool_cache import normalize_arguments
+from app.schemas.workflow.tool_schemas import BulkUpsertProductsSchema, PriceSummarySchema, ProductRecord
+
+BULK_UPSERT_TOOL_NAME = "bulk_upsert_products"
+PRICE_SUMMARY_TOOL_NAME = "get_price_summary"
+BUSY_TIMEOUT_MS = 5000
+
+# Databases whose schema was already checked by this process
+_schema_ready = set()
+
+# Natural key (name, source_url), not unique: plain INSERTs sent through the sqlite
+# MCP server's write_query may add a row per capture, and the bulk tool updates
+# the existing rows instead. The second index serves "latest price of X" /
+# history range scans without touching the table.
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price_in_cents INTEGER NOT NULL,
+    stock INTEGER NOT NULL,
+    source_url TEXT NOT NULL DEFAULT '',
+    observed_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_products_name_source ON products (name, source_url);
+CREATE INDEX IF NOT EXISTS idx_products_name_observed ON products (name, observed_at, price_in_cents);
+"""
+
+NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%SZ', 'now')"
+
+# Append-only price history plus two aggregates kept up to date by triggers:
+# price_latest (one row per product) and price_daily (one row per product and
+# UTC day). Window queries read at most one daily row per day, however many
+# observations were recorded. Every write to products, including INSERTs sent
+# through the sqlite MCP server, is recorded; resending an observation is a no-op.
+HISTORY_SQL = f"""
+CREATE TABLE IF NOT EXISTS price_observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    source_url TEXT NOT NULL DEFAULT '',
+    price_in_cents INTEGER NOT NULL,
+    stock INTEGER NOT NULL DEFAULT 0,
+    observed_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_observations_key ON price_observations (name, source_url, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_name_observed ON price_observations (name, observed_at, price_in_cents);
+
+CREATE TABLE IF NOT EXISTS price_latest (
+    name TEXT PRIMARY KEY,
+    price_in_cents INTEGER NOT NULL,
+    source_url TEXT NOT NULL,
+    observed_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS price_daily (
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    min_price INTEGER NOT NULL,
+    max_price INTEGER NOT NULL,
+    sum_price INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    first_price INTEGER NOT NULL,
+    first_observed_at TEXT NOT NULL,
+    last_price INTEGER NOT NULL,
+    last_observed_at TEXT NOT NULL,
+    PRIMARY KEY (name, day)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_observations_aggregate AFTER INSERT ON price_observations
+BEGIN
+    INSERT INTO price_latest (name, price_in_cents, source_url, observed_at)
+    VALUES (new.name, new.price_in_cents, new.source_url, new.observed_at)
+    ON CONFLICT (name) DO UPDATE SET
+        price_in_cents = excluded.price_in_cents,
+        source_url = excluded.source_url,
+        observed_at = excluded.observed_at
+    WHERE excluded.observed_at >= price_latest.observed_at;
+
+    INSERT INTO price_daily (name, day, min_price, max_price, sum_price, samples,
+                             first_price, first_observed_at, last_price, last_observed_at)
+    VALUES (new.name, substr(new.observed_at, 1, 10), new.price_in_cents, new.price_in_cents,
+            new.price_in_cents, 1, new.price_in_cents, new.observed_at, new.price_in_cents, new.observed_at)
+    ON CONFLICT (name, day) DO UPDATE SET
+        min_price = min(min_price, excluded.min_price),
+        max_price = max(max_price, excluded.max_price),
+        sum_price = sum_price + excluded.sum_price,
+        samples = samples + 1,
+        first_price = CASE WHEN excluded.first_observed_at < first_observed_at
+                           THEN excluded.first_price ELSE first_price END,
+        first_observed_at = min(first_observed_at, excluded.first_observed_at),
+        last_price = CASE WHEN excluded.last_observed_at >= last_observed_at
+                          THEN excluded.last_price ELSE last_price END,
+        last_observed_at = max(last_observed_at, excluded.last_observed_at);
+END;
+"""
+
+# The bulk tool records observations itself; the NOT EXISTS guards skip them here.
+OBSERVED_AT_SQL = f"(SELECT COALESCE(NULLIF(new.observed_at, ''), {NOW_SQL}) AS ts)"
+UPDATED_AT_SQL = (
+    f"(SELECT CASE WHEN new.observed_at = '' OR new.observed_at IS old.observed_at "
+    f"THEN {NOW_SQL} ELSE new.observed_at END AS ts)"
+)
+
+PRODUCT_TRIGGERS_SQL = f"""
+CREATE TRIGGER IF NOT EXISTS trg_products_history_insert AFTER INSERT ON products
+BEGIN
+    INSERT INTO price_observations (name, source_url, price_in_cents, stock, observed_at)
+    SELECT new.name, new.source_url, new.price_in_cents, new.stock, ts FROM {OBSERVED_AT_SQL}
+    WHERE NOT EXISTS (SELECT 1 FROM price_observations
+                      WHERE name = new.name AND source_url = new.source_url AND observed_at = ts);
+END;
+
+-- An UPDATE that leaves observed_at as it was is a new observation made now
+CREATE TRIGGER IF NOT EXISTS trg_products_history_update AFTER UPDATE OF price_in_cents, stock, observed_at ON products
+WHEN new.price_in_cents IS NOT old.price_in_cents OR new.stock IS NOT old.stock
+     OR new.observed_at IS NOT old.observed_at
+BEGIN
+    INSERT INTO price_observations (name, source_url, price_in_cents, stock, observed_at)
+    SELECT new.name, new.source_url, new.price_in_cents, new.stock, ts FROM {UPDATED_AT_SQL}
+    WHERE NOT EXISTS (SELECT 1 FROM price_observations
+                      WHERE name = new.name AND source_url = new.source_url AND observed_at = ts);
+END;
+"""
+
+# Runs once, when the history is created: seed the history with every current row.
+# Rows from before observed_at existed get "now" minus one second per later row,
+# so each one is kept and the newest id is the latest price.
+BACKFILL_SQL = """
+INSERT OR IGNORE INTO price_observations (name, source_url, price_in_cents, stock, observed_at)
+SELECT name, source_url, price_in_cents, stock, COALESCE(
+    NULLIF(observed_at, ''),
+    strftime('%Y-%m-%dT%H:%M:%SZ', 'now', '-' || ((SELECT MAX(id) FROM products) - id) || ' seconds')
+) FROM products
+"""
+
+OBSERVATION_SQL = """
+INSERT OR IGNORE INTO price_observations (name, price_in_cents, stock, source_url, observed_at)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+# Newest stored observation of each key of the batch, by name (one JSON array parameter)
+STORED_SQL = """
+SELECT name, source_url, MAX(observed_at) FROM products
+WHERE name IN (SELECT value FROM json_each(?))
+GROUP BY name, source_url
+"""
+
+UPDATE_SQL = """
+UPDATE products SET price_in_cents = ?, stock = ?, observed_at = ?
+WHERE name = ? AND source_url = ?
+"""
+
+INSERT_SQL = """
+INSERT INTO products (name, price_in_cents, stock, source_url, observed_at)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def default_db_path() -> str:
+    """The product store: `product_store.db_path`, else the database of the sqlite MCP server."""
+    config = load_config()
+    path = (config.get("product_store") or {}).get("db_path")
+    if path:
+        return path
+    args = config.get("mcp_servers", {}).get("sqlite", {}).get("args", [])
+    if "--db-path" in args:
+        return args[args.index("--db-path") + 1]
+    return "external_data.db"
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """
+    Creates the products table, or upgrades the original (id, name, price, stock)
+    one in place, and the price history with its aggregates.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+    if columns:
+        if "source_url" not in columns:
+            conn.execute("ALTER TABLE products ADD COLUMN source_url TEXT NOT NULL DEFAULT ''")
+        if "observed_at" not in columns:
+            conn.execute("ALTER TABLE products ADD COLUMN observed_at TEXT NOT NULL DEFAULT ''")
+    conn.executescript(SCHEMA_SQL)
+    has_history = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_observations'"
+    ).fetchone()
+    if not has_history:
+        conn.executescript(HISTORY_SQL)
+        conn.execute(BACKFILL_SQL)
+    conn.executescript(PRODUCT_TRIGGERS_SQL)
+
+
+def _timestamp(value: Optional[datetime]) -> str:
+    """UTC ISO-8601 with a fixed width, so text comparison orders observations."""
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _row(record: ProductRecord) -> Tuple[str, int, int, str, str]:
+    name = re.sub(r"\s+", " ", record.name).strip()
+    url = normalize_arguments({"url": record.source_url})["url"] if record.source_url.strip() else ""
+    return name, record.price_in_cents, record.stock, url, _timestamp(record.observed_at)
+
+
+def dedupe(rows: List[Tuple[str, int, int, str, str]]) -> List[Tuple[str, int, int, str, str]]:
+    """One row per natural key; the latest observation wins."""
+    latest: Dict[Tuple[str, str], Tuple[str, int, int, str, str]] = {}
+    for row in rows:
+        key = (row[0], row[3])
+        if key not in latest or row[4] >= latest[key][4]:
+            latest[key] = row
+    return list(latest.values())
+
+
+def upsert_products(db_path: str, records: List[ProductRecord]) -> dict:
+    """
+    Writes all records in one transaction. Older observations never overwrite
+    newer ones in products, but every distinct observation joins the history.
+    """
+    observed = [_row(record) for record in records]
+    rows = dedupe(observed)
+    with _connect(db_path) as conn:
+        with conn:
+            history_added = conn.executemany(OBSERVATION_SQL, observed).rowcount
+            names = json.dumps(sorted({row[0] for row in rows}))
+            stored = {(name, url): latest for name, url, latest in conn.execute(STORED_SQL, (names,))}
+            # Keys stored with a newer observation are left as they are. The others are
+            # updated (every row of the key) or inserted, each with one executemany.
+            fresh = [row for row in rows if stored.get((row[0], row[3]), "") <= row[4]]
+            conn.executemany(UPDATE_SQL, [
+                (price, stock, observed_at, name, url)
+                for name, price, stock, url, observed_at in fresh if (name, url) in stored
+            ])
+            conn.executemany(INSERT_SQL, [row for row in fresh if (row[0], row[3]) not in stored])
+    return {
+        "received": len(records),
+        "duplicates_merged": len(records) - len(rows),
+        "written": len(fresh),
+        "stale_skipped": len(rows) - len(fresh),
+        "history_added": history_added
+    }
+
+
+def _connect(db_path: str) -> closing:
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    if db_path not in _schema_ready:
+        with conn:
+            ensure_schema(conn)
+        _schema_ready.add(db_path)
+    return closing(conn)
+
+
+def _percent(new: Optional[int], old: Optional[int]) -> Optional[float]:
+    return round((new - old) * 100.0 / old, 2) if new is not None and old else None
+
+
+def price_summary(db_path: str, names: List[str], window_days: int = 7, as_of: Optional[datetime] = None) -> List[dict]:
+    """
+    Latest price, min/max/avg over the last `window_days` UTC days (including
+    the day of `as_of`) and the percent change from the price at the start of
+    the window, read from the precomputed aggregates.
+    """
+    end = (as_of or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    start = (end - timedelta(days=window_days - 1)).strftime("%Y-%m-%d")
+    end = end.strftime("%Y-%m-%d")
+
+    summaries = []
+    with _connect(db_path) as conn:
+        for name in names:
+            name = re.sub(r"\s+", " ", name).strip()
+            latest = conn.execute(
+                "SELECT price_in_cents, source_url, observed_at FROM price_latest WHERE name = ?", (name,)
+            ).fetchone()
+            if latest is None:
+                summaries.append({"name": name, "found": False})
+                continue
+            low, high, total, samples = conn.execute(
+                "SELECT MIN(min_price), MAX(max_price), SUM(sum_price), SUM(samples) FROM price_daily "
+                "WHERE name = ? AND day BETWEEN ? AND ?", (name, start, end)
+            ).fetchone()
+            # Price as of the window start: last one before it, else the first one inside it
+            reference = conn.execute(
+                "SELECT last_price FROM price_daily WHERE name = ? AND day < ? ORDER BY day DESC LIMIT 1",
+                (name, start)
+            ).fetchone() or conn.execute(
+                "SELECT first_price FROM price_daily WHERE name = ? AND day BETWEEN ? AND ? ORDER BY day LIMIT 1",
+                (name, start, end)
+            ).fetchone()
+            summaries.append({
+                "name": name,
+                "found": True,
+                "latest_price_in_cents": latest[0],
+                "latest_source_url": latest[1],
+                "latest_observed_at": latest[2],
+                "window_days": window_days,
+                "window_samples": samples or 0,
+                "window_min_in_cents": low,
+                "window_max_in_cents": high,
+                "window_avg_in_cents": round(total / samples, 2) if samples else None,
+                "change_percent": _percent(latest[0], reference[0] if reference else None)
+            })
+    return summaries
+
+
+async def _invalidate_sqlite_reads():
+    # Cached read_query results of the sqlite MCP server are stale after a write.
+    # Imported here: the graph module builds the agent, which imports this tool.
+    from app.core.graph import mcp_hub
+    await mcp_hub.cache.invalidate(mcp_hub.server_tools.get("sqlite", []))
+
+
+def _bulk_upsert_sync(records: List[ProductRecord]) -> str:
+    try:
+        result = upsert_products(default_db_path(), records)
+    except sqlite3.Error as e:
+        return f"ERROR: Bulk upsert failed, nothing was written: {e}"
+    return f"Bulk upsert committed in one transaction: {result}"
+
+
+async def _bulk_upsert(records: List[ProductRecord]) -> str:
+    try:
+        result = await asyncio.to_thread(upsert_products, default_db_path(), records)
+    except sqlite3.Error as e:
+        return f"ERROR: Bulk upsert failed, nothing was written: {e}"
+    await _invalidate_sqlite_reads()
+    return f"Bulk upsert committed in one transaction: {result}"
+
+
+def _price_summary_sync(products: List[str], window_days: int = 7) -> str:
+    try:
+        return json.dumps(price_summary(default_db_path(), products, window_days))
+    except sqlite3.Error as e:
+        return f"ERROR: Price summary failed: {e}"
+
+
+async def _price_summary(products: List[str], window_days: int = 7) -> str:
+    return await asyncio.to_thread(_price_summary_sync, products, window_days)
+
+
+bulk_upsert_products = StructuredTool.from_function(
+    func=_bulk_upsert_sync,
+    coroutine=_bulk_upsert,
+    name=BULK_UPSERT_TOOL_NAME,
+    description=(
+        "Save many scraped product prices to the 'products' table in ONE call. "
+        "Pass every record found (name, price_in_cents, stock, source_url, observed_at). "
+        "Records for the same product and source URL are updated instead of duplicated. "
+        "Prefer this over writing INSERT statements one by one."
+    ),
+    args_schema=BulkUpsertProductsSchema
+)
+
+get_price_summary = StructuredTool.from_function(
+    func=_price_summary_sync,
+    coroutine=_price_summary,
+    name=PRICE_SUMMARY_TOOL_NAME,
+    description=(
+        "Price comparison for stored products without writing SQL: latest price, min/max/avg "
+        "over the last N days and the percent change since the start of that window. "
+        "Use it for questions like 'compare with last week'."
+    ),
+    args_schema=PriceSummarySchema
+)
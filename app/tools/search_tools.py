@@ -1,27 +1,157 @@
-from langchain_core.tools import tool
+import asyncio
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+from langchain_core.tools import StructuredTool
+from app.core.config import load_config
+from app.core.telemetry import telemetry
+from app.core.tool_cache import ToolResultCache
 from app.schemas.workflow.tool_schemas import WebSearchSchema
-from langchain_community.tools.tavily_search import TavilySearchResults
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    # langchain_community is slow to import; it is only needed for the first search
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
 # Load again here just in case this module is loaded first
 load_dotenv()
 
-# We initialize the base tool from LangChain
-# k=3 means it will bring the top 3 most relevant results
-tavily_tool = TavilySearchResults(k=3)
-
-@tool(args_schema=WebSearchSchema)
-def web_search_tool(query: str) -> str:
-    """
-    Search the internet for real-time information with Tavily, news, or specific facts.
-    Use this tool when the information is not in your internal knowledge
-    or when you need up-to-date data.
-    """
-    # This is a wrapper to ensure it follows our architectural patterns
+SEARCH_TOOL_NAME = "web_search_tool"
+SNIPPET_CHARS = 400
+
+_settings = load_config().get("search") or {}
+MAX_RESULTS = int(_settings.get("max_results", 3))
+
+# Normalized query -> formatted results, shared by every thread
+search_cache = ToolResultCache(
+    ttls={SEARCH_TOOL_NAME: _settings.get("cache_ttl", 900)},
+    max_memory_mb=_settings.get("max_memory_mb", 16),
+    persist_path=_settings.get("persist_path")
+)
+
+_tavily_tool: Optional["TavilySearchResults"] = None
+_in_flight: Dict[str, asyncio.Future] = {}
+_stats = {"upstream_calls": 0, "coalesced": 0}
+
+
+def get_tavily_tool() -> "TavilySearchResults":
+    """Builds the LangChain Tavily tool on first use, so importing needs no API key."""
+    global _tavily_tool
+    if _tavily_tool is None:
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        # max_results is the number of most relevant results returned per query
+        _tavily_tool = TavilySearchResults(max_results=MAX_RESULTS)
+    return _tavily_tool
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def format_results(results: list) -> str:
+    """Compact, token-efficient rendering: one numbered line per hit plus a trimmed snippet."""
+    lines = []
+    for i, result in enumerate(results, 1):
+        content = " ".join(str(result.get("content", "")).split())
+        if len(content) > SNIPPET_CHARS:
+            content = content[:SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+        lines.append(f"[{i}] {result.get('url', '')}\n{content}")
+    return "\n".join(lines) or "No results found."
+
+
+async def _search_upstream(query: str) -> str:
+    _stats["upstream_calls"] += 1
+    with telemetry.span("search", "tavily"):
+        results = await get_tavily_tool().ainvoke({"query": query})
+        # The LangChain tool reports API failures as a string instead of raising
+        if isinstance(results, str):
+            raise RuntimeError(results)
+    return format_results(results)
+
+
+async def search(query: str) -> str:
+    """Cached search. Identical concurrent queries share a single upstream call."""
+    key = normalize_query(query)
+
+    cached = await search_cache.get(SEARCH_TOOL_NAME, {"query": key})
+    if cached is not None:
+        return cached
+
+    pending = _in_flight.get(key)
+    if pending is not None:
+        _stats["coalesced"] += 1
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled() or asyncio.current_task().cancelling():
+                raise
+        # The caller making the upstream call was cancelled, not this one: search again
+        return await search(query)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
     try:
-        print(f"Web search: {query}")
-        results = tavily_tool.invoke({"query": query})
-        return str(results)
+        text = await _search_upstream(key)
+        await search_cache.put(SEARCH_TOOL_NAME, {"query": key}, text)
+        future.set_result(text)
+        return text
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
     except Exception as e:
-        print(f"Search failed: {str(e)}")
-        return f"Search failed: {str(e)}"
\ No newline at end of file
+        future.set_exception(e)
+        # Mark as retrieved when nobody else was waiting
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(key, None)
+
+
+def search_stats() -> dict:
+    return {**_stats, **search_cache.stats()}
+
+
+async def _web_search(query: str, queries: Optional[List[str]] = None) -> str:
+    # Several searches in one call are deduplicated and run concurrently
+    unique = {}
+    for q in [query, *(queries or [])]:
+        if q and q.strip():
+            unique.setdefault(normalize_query(q), q)
+    batch = list(unique.values())
+    print(f"Web search: {batch}")
+    results = await asyncio.gather(*(search(q) for q in batch), return_exceptions=True)
+
+    blocks = []
+    for q, result in zip(batch, results):
+        if isinstance(result, BaseException):
+            error = str(result) or type(result).__name__
+            print(f"Search failed: {error}")
+            result = f"Search failed: {error}"
+        blocks.append(result if len(batch) == 1 else f"## {q}\n{result}")
+    return "\n\n".join(blocks)
+
+
+def _web_search_sync(query: str, queries: Optional[List[str]] = None) -> str:
+    # Blocking fallback for sync graph runners, no cache or coalescing
+    blocks = []
+    for q in [query, *(queries or [])]:
+        try:
+            results = get_tavily_tool().invoke({"query": q})
+            blocks.append(results if isinstance(results, str) else format_results(results))
+        except Exception as e:
+            print(f"Search failed: {str(e)}")
+            blocks.append(f"Search failed: {str(e)}")
+    return "\n\n".join(blocks)
+
+
+web_search_tool = StructuredTool.from_function(
+    func=_web_search_sync,
+    coroutine=_web_search,
+    name=SEARCH_TOOL_NAME,
+    description=(
+        "Search the internet for real-time information with Tavily, news, or specific facts. "
+        "Use this tool when the information is not in your internal knowledge "
+        "or when you need up-to-date data. Pass several related searches in 'queries' "
+        "to run them in a single call."
+    ),
+    args_schema=WebSearchSchema
+)
@@ -0,0 +1,95 @@
+"""
+Agent per-step and startup overhead: time spent preparing the prompt and
+binding tool schemas, excluding the LLM round-trip itself.
+
+Compares the previous behaviour (isinstance scan + new SystemMessage per step,
+bind_tools over every tool on each update) with the cached binding.
+
+Usage:
+    python -m benchmarks.bench_agent_overhead [--mcp-tools 20] [--history 60]
+"""
+
+import os
+import time
+import argparse
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from pydantic import Field, create_model
+from langchain_core.tools import StructuredTool
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from app.core.agent import AgentManager
+
+
+def make_mcp_tools(count: int) -> list:
+    """Tools shaped like the ones MCPHubManager.get_all_mcp_tools builds."""
+    tools = []
+    for i in range(count):
+        fields = {
+            "query": (object, Field(..., description="SQL query. Target table: 'products'. " * 5)),
+            "url": (object, Field(..., description="URL to fetch")),
+        }
+
+        async def runner(**kwargs):
+            return ""
+
+        tools.append(StructuredTool.from_function(
+            name=f"mcp_tool_{i}", description=f"MCP tool number {i}. " * 10,
+            coroutine=runner, args_schema=create_model(f"mcp_tool_{i}Args", **fields)
+        ))
+    return tools
+
+
+def make_history(length: int) -> list:
+    # Ids are assigned by the add_messages reducer in a real run
+    messages = [HumanMessage(id="human-0", content="Find the RTX 5090 price and save a report.")]
+    for i in range(length // 2):
+        messages.append(AIMessage(id=f"ai-{i}", content="",
+                                  tool_calls=[{"name": "fetch", "args": {"url": f"u{i}"}, "id": f"c{i}"}]))
+        messages.append(ToolMessage(id=f"tool-{i}", content="price $1,999.99 " * 20, tool_call_id=f"c{i}", name="fetch"))
+    return messages
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(mcp_tool_count: int, history: int, repeat: int):
+    start = time.perf_counter()
+    manager = AgentManager()
+    print(f"AgentManager startup: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    tools = make_mcp_tools(mcp_tool_count)
+    state = {"messages": make_history(history), "total_tokens": 0}
+
+    def legacy_update():
+        manager.llm.bind_tools(manager.static_tools + tools)
+
+    def legacy_prepare():
+        messages = state["messages"]
+        if not any(isinstance(m, SystemMessage) for m in messages):
+            messages = [SystemMessage(content=manager.system_prompt)] + list(messages)
+        return messages
+
+    cold = timed(lambda: manager.update_tools(tools), 1)
+    print(f"\n{'operation':<40} {'before (ms)':>12} {'after (ms)':>12}")
+    print(f"{'update_tools, first bind':<40} {timed(legacy_update, repeat):>12.3f} {cold:>12.3f}")
+    print(f"{'update_tools, same MCP tool set':<40} {timed(legacy_update, repeat):>12.3f} "
+          f"{timed(lambda: manager.update_tools(tools), repeat):>12.3f}")
+
+    print(f"{'prepare prompt per step':<40} {timed(legacy_prepare, repeat):>12.3f} "
+          f"{timed(lambda: manager._prepare_messages(state), repeat):>12.3f}")
+    print("  (after includes context compaction, which replaces the full history with a bounded view)")
+    print(f"\nBinding cache: {manager.binding_cache.hits} hits, {manager.binding_cache.misses} misses")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mcp-tools", type=int, default=20)
+    parser.add_argument("--history", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.mcp_tools, args.history, args.repeat)
@@ -0,0 +1,103 @@
+"""
+Checkpoint store benchmark: write latency (aput + aput_writes) and read latency
+(aget_tuple, what aget_state uses) as concurrent threads and history length grow.
+Compares the stock single-connection AsyncSqliteSaver with the tuned store.
+
+Usage:
+    python -m benchmarks.bench_checkpoints [--threads 1 10 50] [--history 10 100 400]
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from contextlib import asynccontextmanager
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint, create_checkpoint
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from app.core.checkpointer import open_checkpointer
+
+
+@asynccontextmanager
+async def stock_saver(path: str):
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        yield saver
+
+
+@asynccontextmanager
+async def tuned_saver(path: str):
+    async with open_checkpointer(path, {"prune_interval": 0}) as saver:
+        yield saver
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+
+async def _run_thread(saver, thread_id: str, steps: int, write_ms: list, read_ms: list):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    messages = [HumanMessage(content="Find the RTX 5090 price")]
+
+    for step in range(steps):
+        messages = messages + [AIMessage(content=f"step {step} " + "price data " * 50)]
+        checkpoint = create_checkpoint(checkpoint, None, step)
+        checkpoint["channel_values"] = {"messages": messages, "total_tokens": step * 100}
+
+        start = time.perf_counter()
+        config = await saver.aput(config, checkpoint, {"step": step, "source": "loop", "writes": {}}, {})
+        await saver.aput_writes(config, [("messages", messages[-1:])], f"task-{step}")
+        write_ms.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await saver.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        read_ms.append(time.perf_counter() - start)
+
+
+async def run_case(factory, threads: int, history: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoints.db")
+        async with factory(path) as saver:
+            await saver.setup()
+            write_ms, read_ms = [], []
+            await asyncio.gather(*(
+                _run_thread(saver, f"thread-{i}", history, write_ms, read_ms) for i in range(threads)
+            ))
+            prune = None
+            if hasattr(saver, "prune"):
+                start = time.perf_counter()
+                await saver.prune(keep_last=20, retention_days=14)
+                prune = (time.perf_counter() - start) * 1000
+
+    return {
+        "write_p50_ms": _percentile(write_ms, 0.50),
+        "write_p95_ms": _percentile(write_ms, 0.95),
+        "read_p50_ms": _percentile(read_ms, 0.50),
+        "read_p95_ms": _percentile(read_ms, 0.95),
+        "read_mean_ms": statistics.mean(read_ms) * 1000,
+        "prune_ms": prune
+    }
+
+
+async def main(thread_counts, history_lengths):
+    print(f"{'store':<6} {'threads':>7} {'history':>7} {'write p50':>10} {'write p95':>10} "
+          f"{'read p50':>9} {'read p95':>9} {'prune':>8}")
+    for threads in thread_counts:
+        for history in history_lengths:
+            for name, factory in (("stock", stock_saver), ("tuned", tuned_saver)):
+                r = await run_case(factory, threads, history)
+                prune = f"{r['prune_ms']:.1f}" if r["prune_ms"] is not None else "-"
+                print(f"{name:<6} {threads:>7} {history:>7} {r['write_p50_ms']:>10.2f} {r['write_p95_ms']:>10.2f} "
+                      f"{r['read_p50_ms']:>9.2f} {r['read_p95_ms']:>9.2f} {prune:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100])
+    args = parser.parse_args()
+    asyncio.run(main(args.threads, args.history))
@@ -0,0 +1,224 @@
+"""
+Offline end-to-end benchmark: initialize_graph, AgentService.stream_chat and
+approve_agent_action against the fakes in benchmarks/fakes.py (scripted chat
+model, fake stdio MCP servers, fake Tavily). No network or API keys needed.
+
+Each request plays a full run: search, two parallel fetches, an INSERT, the
+report (pause + approval) and a streamed final answer. Reports p50/p95/p99
+latency, time to first event, approval latency, requests/sec and RSS for
+every concurrency level, and compares them with the saved baseline.
+
+Usage:
+    python -m benchmarks.bench_e2e [--concurrency 1 8 32] [--requests 64]
+                                   [--save-baseline] [--tolerance 0.5]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+
+from pathlib import Path
+
+from benchmarks.fakes import install_fakes
+
+BASELINE_PATH = Path(__file__).parent / "results" / "e2e_baseline.json"
+# Metrics compared with the baseline: (higher is better, changes smaller than this are noise)
+TRACKED = {
+    "req_per_s": (True, 0.5),
+    "latency_p95_ms": (False, 50.0),
+    "ttfe_p95_ms": (False, 50.0),
+    "rss_mb": (False, 20.0)
+}
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000 if ordered else 0.0
+
+
+def _rss_mb() -> float:
+    """Resident set size of this process (the fake MCP subprocesses are not included)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # Peak instead of current RSS; bytes on macOS, KiB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+async def run_request(service, thread_id: str, product: str) -> dict:
+    start = time.perf_counter()
+    first_event = None
+    last = None
+    async for event_data in service.stream_chat(f"Find the current price of {product}", thread_id):
+        if first_event is None:
+            first_event = time.perf_counter() - start
+        last = json.loads(event_data)
+
+    approve = None
+    if last and last.get("status") == "waiting_approval":
+        approve_start = time.perf_counter()
+        result = await service.approve_agent_action(thread_id)
+        approve = time.perf_counter() - approve_start
+        if result.get("status") != "success":
+            raise RuntimeError(f"Approval failed: {result}")
+    elif last and last.get("status") == "error":
+        raise RuntimeError(last.get("content"))
+
+    return {"latency": time.perf_counter() - start, "ttfe": first_event or 0.0, "approve": approve}
+
+
+async def run_level(service, concurrency: int, requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], []
+
+    async def one(i: int):
+        async with semaphore:
+            try:
+                samples.append(await run_request(service, f"c{concurrency}-{i}", f"gpu-{concurrency}-{i}"))
+            except Exception as e:
+                errors.append(repr(e))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [s["latency"] for s in samples]
+    ttfe = [s["ttfe"] for s in samples]
+    approvals = [s["approve"] for s in samples if s["approve"] is not None]
+    if errors:
+        print(f"  {len(errors)} failed requests, first: {errors[0]}")
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "req_per_s": round(len(samples) / elapsed, 2),
+        "latency_p50_ms": round(_percentile(latencies, 0.50), 1),
+        "latency_p95_ms": round(_percentile(latencies, 0.95), 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99), 1),
+        "ttfe_p50_ms": round(_percentile(ttfe, 0.50), 1),
+        "ttfe_p95_ms": round(_percentile(ttfe, 0.95), 1),
+        "ttfe_p99_ms": round(_percentile(ttfe, 0.99), 1),
+        "approve_p50_ms": round(_percentile(approvals, 0.50), 1),
+        "rss_mb": round(_rss_mb(), 1)
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Returns a description of every tracked metric that got worse than the tolerance allows."""
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in results:
+        old = previous.get(level["concurrency"])
+        if not old:
+            continue
+        for metric, (higher_is_better, noise) in TRACKED.items():
+            before, after = old.get(metric), level[metric]
+            if not before or abs(after - before) < noise:
+                continue
+            change = (after - before) / before
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"concurrency {level['concurrency']}: {metric} {before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: list):
+    print(f"\n{'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'ttfe p50':>9} {'ttfe p95':>9} {'approve':>8} {'rss MB':>7} {'errors':>6}")
+    for r in results:
+        print(f"{r['concurrency']:>5} {r['req_per_s']:>8.2f} {r['latency_p50_ms']:>8.0f} {r['latency_p95_ms']:>8.0f} "
+              f"{r['latency_p99_ms']:>8.0f} {r['ttfe_p50_ms']:>9.1f} {r['ttfe_p95_ms']:>9.1f} "
+              f"{r['approve_p50_ms']:>8.0f} {r['rss_mb']:>7.1f} {r['errors']:>6}")
+
+
+async def main(args) -> int:
+    baseline_path = Path(args.baseline).resolve()
+    # Checkpoints, leases and saved reports go to a scratch directory
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.chdir(workdir)
+
+    install_fakes(args.first_token_ms, args.token_ms, args.mcp_latency_ms, args.search_latency_ms, args.page_size)
+    from app.main import lifespan, app
+    from app.core import graph
+    from app.service.agent_service import AgentService
+
+    # The app logs every step with print(); that output is dropped unless --verbose
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        start = time.perf_counter()
+        async with lifespan(app):
+            api_ready_ms = (time.perf_counter() - start) * 1000
+            await graph.wait_until_ready()
+            startup_ms = (time.perf_counter() - start) * 1000
+            graph.mcp_hub.prefetcher.enabled = args.prefetch
+            service = AgentService()
+            await run_level(service, 1, 2)  # warm-up: imports, first bind, SQLite pages
+
+            results = []
+            for concurrency in args.concurrency:
+                results.append(await run_level(service, concurrency, max(args.requests, concurrency)))
+
+    print(f"\nStartup: API serving after {api_ready_ms:.0f} ms, MCP tools attached after {startup_ms:.0f} ms, "
+          f"workdir {workdir}")
+    print("Startup phases (ms): " + ", ".join(f"{k} {v:.0f}" for k, v in graph.startup.phases.items()))
+    print_table(results)
+    if args.prefetch:
+        print("Prefetch: " + ", ".join(f"{k} {v}" for k, v in graph.mcp_hub.prefetcher.stats().items()))
+
+    report = {
+        "settings": {
+            k: v for k, v in vars(args).items()
+            if k not in ("save_baseline", "baseline", "tolerance", "verbose") and (k != "prefetch" or v)
+        },
+        "python": platform.python_version(),
+        "startup_ms": round(startup_ms, 1),
+        "api_ready_ms": round(api_ready_ms, 1),
+        "startup_phases_ms": graph.startup.phases,
+        "levels": results
+    }
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print("\nNo baseline yet, run with --save-baseline to record one.")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("settings") != report["settings"]:
+        print("\nWarning: the baseline was recorded with different settings, comparing anyway.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions against {baseline_path} (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against {baseline_path} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--first-token-ms", type=float, default=50.0, help="fake LLM latency to the first token")
+    parser.add_argument("--token-ms", type=float, default=2.0, help="fake LLM delay between streamed chunks")
+    parser.add_argument("--mcp-latency-ms", type=float, default=20.0)
+    parser.add_argument("--search-latency-ms", type=float, default=30.0)
+    parser.add_argument("--page-size", type=int, default=8000, help="characters per fetched page")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative change before failing")
+    parser.add_argument("--prefetch", action="store_true", help="prefetch the top search results (prefetch.enabled)")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    sys.exit(asyncio.run(main(parser.parse_args())))
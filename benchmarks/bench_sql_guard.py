@@ -0,0 +1,60 @@
+"""
+Micro-benchmark of the SQL guard run before every MCP call: the previous
+validator (upper-case copy + six re.search calls, then a second pass for
+read/write) against SQLSecurityValidator.classify.
+
+Usage:
+    python -m benchmarks.bench_sql_guard [--rows 10 1000 50000] [--repeat 20]
+"""
+
+import re
+import time
+import argparse
+
+from app.core.security import SQLSecurityValidator
+
+LEGACY_FORBIDDEN = [r"\bCREATE\b", r"\bDROP\b", r"\bALTER\b", r"\bTRUNCATE\b", r"\bRENAME\b", r"\bDELETE\b"]
+LEGACY_WRITES = r"\b(INSERT|UPDATE|DELETE|REPLACE|UPSERT|CREATE|DROP|ALTER|TRUNCATE|RENAME|ATTACH|VACUUM)\b"
+
+
+def legacy_guard(query: str):
+    """What MCPHubManager did before: validate_query, then is_read_only."""
+    query_upper = query.upper()
+    for command in LEGACY_FORBIDDEN:
+        if re.search(command, query_upper):
+            return False, False
+    query_upper = query.strip().upper()
+    if not query_upper.startswith(("SELECT", "WITH", "EXPLAIN")):
+        return True, False
+    return True, not re.search(LEGACY_WRITES, query_upper)
+
+
+def insert_batch(rows: int) -> str:
+    values = ", ".join(f"('Graphics card model {i} (refurbished)', {100000 + i}, {i % 7})" for i in range(rows))
+    return f"INSERT INTO products (name, price_in_cents, stock) VALUES {values};"
+
+
+def timed(fn, query: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(query)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(args):
+    queries = [("select", "SELECT name, price_in_cents FROM products WHERE name LIKE '%RTX%' ORDER BY price_in_cents")]
+    queries += [(f"insert x{rows}", insert_batch(rows)) for rows in args.rows]
+
+    print(f"{'query':>14} {'size KB':>9} {'legacy ms':>10} {'guard ms':>9} {'speedup':>8}")
+    for label, query in queries:
+        repeat = args.repeat if len(query) > 100_000 else args.repeat * 100
+        legacy = timed(legacy_guard, query, repeat)
+        guard = timed(SQLSecurityValidator.classify, query, repeat)
+        print(f"{label:>14} {len(query) / 1024:>9.1f} {legacy:>10.3f} {guard:>9.3f} {legacy / guard:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 1000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
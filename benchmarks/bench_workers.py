@@ -0,0 +1,136 @@
+"""
+Multi-worker load test: starts the API with 1..N uvicorn workers (sharing
+checkpoints.db and, optionally, one MCP gateway) and measures completed
+/chat/stream requests per second at a fixed client concurrency.
+
+Runs that pause for approval are approved through /chat/approve, which may
+land on a different worker. Also sends pairs of requests on the same
+thread_id to check that only one of them runs and the other gets the
+"thread busy" error event.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1 2 4] [--requests 40] [--concurrency 8]
+                                       [--app app.main:app] [--gateway http://127.0.0.1:8765]
+
+Use --app benchmarks.offline_app:app to run against the offline fakes.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent
+
+PROMPT = "Find the current price of the RTX 5090 in two stores."
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # full=true: MCP tools attach in the background after the API starts serving
+            if (await client.get("/ready", params={"full": "true"})).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("API did not start in time")
+
+
+async def _chat(client: httpx.AsyncClient, thread_id: str) -> list:
+    events = []
+    async with client.stream("POST", "/api/v1/chat/stream", json={"message": PROMPT, "thread_id": thread_id}) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                events.append(json.loads(line[6:]))
+    return events
+
+
+async def _load(client: httpx.AsyncClient, requests: int, concurrency: int, tag: str) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                events = await _chat(client, f"{tag}-{i}")
+                if events and events[-1].get("status") == "waiting_approval":
+                    response = await client.post("/api/v1/chat/approve", json={"thread_id": f"{tag}-{i}", "approve": True})
+                    response.raise_for_status()
+                if any(e.get("status") == "error" for e in events):
+                    failures += 1
+            except httpx.HTTPError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "req_per_s": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "failures": failures
+    }
+
+
+async def _contention(client: httpx.AsyncClient, tag: str) -> int:
+    """Runs two requests on one thread_id at once; returns how many were rejected as busy."""
+    results = await asyncio.gather(_chat(client, f"{tag}-shared"), _chat(client, f"{tag}-shared"))
+    return sum(1 for events in results if any("already being processed" in e.get("content", "") for e in events))
+
+
+def _start_api(app: str, workers: int, port: int, workdir: str, gateway: str) -> subprocess.Popen:
+    """Runs the workers from a scratch directory, so checkpoints and reports stay out of the repo."""
+    env = {**os.environ, "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db")}
+    if gateway:
+        env["MCP_GATEWAY_URL"] = gateway
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--app-dir", str(REPO_ROOT), "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=workdir, stdout=subprocess.DEVNULL
+    )
+
+
+async def main(args):
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'failed':>7} {'busy':>5}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            process = _start_api(args.app, workers, args.port, tmp, args.gateway)
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=300) as client:
+                    await _wait_ready(client)
+                    tag = f"w{workers}-{int(time.time())}"
+                    result = await _load(client, args.requests, args.concurrency, tag)
+                    busy = await _contention(client, tag)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        baseline = baseline or result["req_per_s"]
+        print(f"{workers:>7} {result['req_per_s']:>8.2f} {result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} "
+              f"{result['failures']:>7} {busy:>5}   x{result['req_per_s'] / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--app", default="app.main:app", help="ASGI app the workers run")
+    parser.add_argument("--gateway", default="", help="MCP gateway URL shared by the workers")
+    parser.add_argument("--port", type=int, default=8010)
+    asyncio.run(main(parser.parse_args()))
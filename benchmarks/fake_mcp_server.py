@@ -0,0 +1,129 @@
+"""
+Fake stdio MCP server for offline benchmarks. Mimics the tool names and
+result shapes of mcp-server-fetch (`fetch`) and mcp-server-sqlite
+(`read_query`, `write_query`, `list_tables`) with a fixed latency per call.
+
+Usage (spawned by the harness, not run by hand):
+    python benchmarks/fake_mcp_server.py --kind fetch --latency-ms 20
+"""
+
+import json
+import random
+import asyncio
+import argparse
+
+import mcp.types as types
+from mcp.server import Server
+from mcp.server.stdio import stdio_server
+
+FETCH_TOOLS = [
+    types.Tool(
+        name="fetch",
+        description="Fetches a URL from the internet and extracts its contents as markdown.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "url": {"type": "string", "description": "URL to fetch"},
+                "max_length": {"type": "integer", "description": "Maximum number of characters to return."},
+                "start_index": {"type": "integer", "description": "Start the content from this character index."},
+                "raw": {"type": "boolean", "description": "Get the actual HTML content of the requested page."}
+            },
+            "required": ["url"]
+        }
+    )
+]
+
+SQLITE_TOOLS = [
+    types.Tool(
+        name=name,
+        description=description,
+        inputSchema={
+            "type": "object",
+            "properties": {"query": {"type": "string", "description": "SQL query to execute"}},
+            "required": ["query"]
+        }
+    )
+    for name, description in (
+        ("read_query", "Execute a SELECT query on the SQLite database"),
+        ("write_query", "Execute an INSERT, UPDATE, or DELETE query on the SQLite database")
+    )
+] + [
+    types.Tool(name="list_tables", description="List all tables in the SQLite database",
+               inputSchema={"type": "object", "properties": {}})
+]
+
+
+def product_page(url: str, size: int, raw: bool = False) -> str:
+    """A product page as markdown (or HTML with JSON-LD), padded to roughly `size` characters."""
+    rng = random.Random(url)
+    price = rng.randint(1500, 2500) + 0.99
+    filler = "Specifications and reviews. " * max(0, (size - 200) // 28)
+    if raw:
+        offer = {"@type": "Offer", "price": f"{price:.2f}", "priceCurrency": "USD",
+                 "availability": "https://schema.org/InStock"}
+        product = {"@context": "https://schema.org", "@type": "Product", "name": "NVIDIA GeForce RTX 5090",
+                   "offers": offer}
+        return (
+            f'<html><head><title>NVIDIA GeForce RTX 5090</title><script type="application/ld+json">'
+            f"{json.dumps(product)}</script></head><body><h1>NVIDIA GeForce RTX 5090</h1>"
+            f"<p>Price: ${price:,.2f}</p><p>{filler}</p></body></html>"
+        )
+    head = f"# NVIDIA GeForce RTX 5090\n\nSource: {url}\n\n**Price: ${price:,.2f}**\n\nIn stock.\n\n"
+    return head + filler
+
+
+def fetch_result(arguments: dict, size: int) -> str:
+    """Output of mcp-server-fetch: a header line, then the requested slice of the page."""
+    url = arguments["url"]
+    page = product_page(url, size, bool(arguments.get("raw")))
+    start, length = int(arguments.get("start_index") or 0), int(arguments.get("max_length") or 5000)
+    content = page[start:start + length]
+    if start + length < len(page):
+        content += (
+            f"\n\n<error>Content truncated. Call the fetch tool with a start_index of {start + length} "
+            "to get more content.</error>"
+        )
+    prefix = "Content type text/html cannot be simplified to markdown, but here is the raw content:\n" \
+        if arguments.get("raw") else ""
+    return f"{prefix}Contents of {url}:\n{content}"
+
+
+def build_server(kind: str, latency: float, page_size: int) -> Server:
+    server = Server(f"fake-{kind}")
+    rows = []
+
+    @server.list_tools()
+    async def list_tools():
+        return FETCH_TOOLS if kind == "fetch" else SQLITE_TOOLS
+
+    @server.call_tool()
+    async def call_tool(name: str, arguments: dict):
+        await asyncio.sleep(latency)
+        if name == "fetch":
+            text = fetch_result(arguments, page_size)
+        elif name == "write_query":
+            rows.append(arguments["query"])
+            text = json.dumps([{"affected_rows": 1}])
+        elif name == "read_query":
+            text = json.dumps([{"id": i, "query": q[:60]} for i, q in enumerate(rows[-5:])])
+        elif name == "list_tables":
+            text = json.dumps([{"name": "products"}])
+        else:
+            raise ValueError(f"Unknown tool: {name}")
+        return [types.TextContent(type="text", text=text)]
+
+    return server
+
+
+async def main(args):
+    server = build_server(args.kind, args.latency_ms / 1000, args.page_size)
+    async with stdio_server() as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", choices=["fetch", "sqlite"], required=True)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--page-size", type=int, default=8000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,178 @@
+"""
+Offline stand-ins for the external services, used by the benchmarks:
+a scripted chat model, fake stdio MCP servers and a fake Tavily backend.
+
+install_fakes() must run before initialize_graph(). It swaps the model on
+the global AgentManager, points the MCP hub at benchmarks/fake_mcp_server.py
+and replaces the Tavily tool, so the real graph, tool node, caches and
+checkpointer are exercised end to end.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+os.environ.setdefault("GROQ_API_KEY", "offline")
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+FAKE_MCP_SERVER = str(Path(__file__).parent / "fake_mcp_server.py")
+FINAL_ANSWER = (
+    "The lowest price found is listed in the report. Prices were taken from two retailers, "
+    "stored in the products table and saved to disk after approval. Let me know if you need "
+    "a comparison with previous generations or other regions."
+)
+
+
+def _slug(messages: List[BaseMessage]) -> str:
+    """The product the user asked about: the last word of the first user message."""
+    first = next((m for m in messages if isinstance(m, HumanMessage)), None)
+    words = first.content.lower().split() if first is not None else []
+    return words[-1].strip(".?!") if words else "product"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Plays the usual agent plan: search -> fetch two pages in parallel ->
+    insert into SQLite -> save the report (pauses for approval) -> answer.
+    The next step is derived from the last tool result in the prompt, so one
+    instance serves any number of concurrent threads.
+    """
+
+    model_name: str = "scripted-fake"
+    first_token_ms: float = 50.0
+    token_ms: float = 2.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _plan(self, messages: List[BaseMessage]) -> AIMessage:
+        slug = _slug(messages)
+        last = messages[-1]
+        previous = last.name if isinstance(last, ToolMessage) else None
+        step = len([m for m in messages if isinstance(m, AIMessage)])
+
+        def call(name: str, args: dict, n: int = 0) -> dict:
+            return {"name": name, "args": args, "id": f"call_{step}_{n}"}
+
+        if previous is None:
+            calls = [call("web_search_tool", {"query": f"{slug} price"})]
+        elif previous == "web_search_tool":
+            calls = [call("fetch", {"url": f"https://shop{n}.example/{slug}"}, n) for n in range(2)]
+        elif previous == "fetch":
+            calls = [call("write_query", {
+                "query": f"INSERT INTO products (name, price_in_cents, stock) VALUES ('{slug}', 199999, 1)"
+            })]
+        elif previous == "write_query":
+            calls = [call("save_report_to_disk", {"filename": f"{slug}.md", "content": f"# {slug}\n\n$1,999.99"})]
+        else:
+            return AIMessage(content=FINAL_ANSWER)
+        return AIMessage(content="", tool_calls=calls)
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], reply: AIMessage) -> dict:
+        prompt = sum(len(str(m.content)) for m in messages) // 4
+        completion = len(reply.content) // 4 + 20 * len(reply.tool_calls)
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    def _chunks(self, messages: List[BaseMessage]) -> Iterator[AIMessageChunk]:
+        reply = self._plan(messages)
+        for word in reply.content.split(" ") if reply.content else []:
+            yield AIMessageChunk(content=word + " ")
+        yield AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": n}
+                for n, c in enumerate(reply.tool_calls)
+            ],
+            usage_metadata=self._usage(messages, reply)
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.first_token_ms / 1000)
+        reply = self._plan(messages)
+        reply.usage_metadata = self._usage(messages, reply)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_ms / 1000)
+        for chunk in self._chunks(messages):
+            time.sleep(self.token_ms / 1000)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for chunk in self._chunks(messages):
+            await asyncio.sleep(self.token_ms / 1000)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+class FakeTavily:
+    """Replaces TavilySearchResults: same input/output shape, fixed latency."""
+
+    def __init__(self, latency_ms: float = 30.0, max_results: int = 3):
+        self.latency = latency_ms / 1000
+        self.max_results = max_results
+        self.calls = 0
+
+    def _results(self, query: str) -> list:
+        slug = query.split()[0] if query.split() else "product"
+        return [
+            {"url": f"https://shop{n}.example/{slug}", "content": f"{query}: listed at $1,999.99 with free shipping."}
+            for n in range(self.max_results)
+        ]
+
+    async def ainvoke(self, tool_input: dict, *args, **kwargs) -> list:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._results(tool_input["query"])
+
+    def invoke(self, tool_input: dict, *args, **kwargs) -> list:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._results(tool_input["query"])
+
+
+def fake_mcp_servers(servers: dict, latency_ms: float = 20.0, page_size: int = 8000) -> dict:
+    """The configured MCP servers with their commands pointed at the fake server."""
+    fakes = {}
+    for name, settings in servers.items():
+        kind = "fetch" if name == "fetch" else "sqlite"
+        fakes[name] = {
+            **settings,
+            "command": sys.executable,
+            "args": [FAKE_MCP_SERVER, "--kind", kind, "--latency-ms", str(latency_ms), "--page-size", str(page_size)]
+        }
+    return fakes
+
+
+def install_fakes(first_token_ms: float = 50.0, token_ms: float = 2.0, mcp_latency_ms: float = 20.0,
+                  search_latency_ms: float = 30.0, page_size: int = 8000):
+    """Swaps every external dependency of the global graph for its offline fake."""
+    from app.core import graph
+    from app.tools import search_tools
+
+    # One fake per tier, so per-model stats stay apart; both play the same script
+    graph.manager.set_models({
+        tier: ScriptedChatModel(model_name=f"scripted-{tier}", first_token_ms=first_token_ms, token_ms=token_ms)
+        for tier in graph.manager.model_names
+    })
+    graph.mcp_hub.config = {
+        **graph.mcp_hub.config,
+        "mcp_servers": fake_mcp_servers(graph.mcp_hub.config["mcp_servers"], mcp_latency_ms, page_size)
+    }
+    search_tools._tavily_tool = FakeTavily(search_latency_ms, search_tools.MAX_RESULTS)
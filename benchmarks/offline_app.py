@@ -0,0 +1,12 @@
+"""
+The API with the offline fakes installed, for load tests without API keys:
+
+    python -m benchmarks.bench_workers --app benchmarks.offline_app:app
+"""
+
+from benchmarks.fakes import install_fakes
+
+# Must run before the lifespan builds the graph in each worker
+install_fakes()
+
+from app.main import app
@@ -10,6 +10,8 @@ Usage:
 import sqlite3
 import os
 
+from app.tools.product_tools import ensure_schema
+
 DB_NAME = "external_data.db"
 
 def create_fresh_db():
@@ -22,30 +24,27 @@ def create_fresh_db():
 
     print(f"Connected to {DB_NAME}...")
 
-    # Drop existing table to avoid duplicates on re-run
-    cursor.execute("DROP TABLE IF EXISTS products")
-    print("Dropped existing 'products' table (if any).")
-
-    # Create a table for the agent to query
-    cursor.execute('''
-                   CREATE TABLE products
-                   (
-                       id INTEGER PRIMARY KEY AUTOINCREMENT,
-                       name TEXT NOT NULL,
-                       price_in_cents INTEGER NOT NULL,
-                       stock INTEGER NOT NULL
-                   )
-                   ''')
-    print("Created 'products' table.")
+    # Drop existing tables to avoid duplicates on re-run
+    for table in ("products", "price_observations", "price_latest", "price_daily"):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    print("Dropped existing 'products' and price history tables (if any).")
+
+    # Create a table for the agent to query, with the natural key, the price
+    # history and its aggregates (same DDL as the product tools)
+    ensure_schema(conn)
+    print("Created 'products' and price history tables.")
 
     # Sample data to verify database interactions
     products = [
-        ('Laptop Pro', 120050, 10),       # $1200.50
-        ('Monitor 4K', 35000, 25),        # $350.00
-        ('Mechanical Keyboard', 8999, 50) # $89.99
+        ('Laptop Pro', 120050, 10, 'https://shop.example/laptop-pro', '2026-01-01T00:00:00Z'),      # $1200.50
+        ('Monitor 4K', 35000, 25, 'https://shop.example/monitor-4k', '2026-01-01T00:00:00Z'),       # $350.00
+        ('Mechanical Keyboard', 8999, 50, 'https://shop.example/keyboard', '2026-01-01T00:00:00Z')  # $89.99
     ]
 
-    cursor.executemany('INSERT INTO products (name, price_in_cents, stock) VALUES (?, ?, ?)', products)
+    cursor.executemany(
+        'INSERT INTO products (name, price_in_cents, stock, source_url, observed_at) VALUES (?, ?, ?, ?, ?)',
+        products
+    )
     conn.commit()
     print(f"Inserted {len(products)} sample records.")
 
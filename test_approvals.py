@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+
+from app.core.approvals import ApprovalIndex
+from app.core.checkpointer import open_checkpointer
+from app.service.agent_service import AgentService
+
+
+def test_pending_approvals_are_paged_oldest_first(tmp_path):
+    async def run():
+        index = ApprovalIndex(str(tmp_path / "checkpoints.db"))
+        await index.open()
+        try:
+            for i in range(5):
+                await index.add(f"thread-{i}", f"cp-{i}", [{"name": "save_report_to_disk", "args": {}, "id": str(i)}])
+
+            seen, cursor = [], None
+            while True:
+                items, cursor = await index.page(2, cursor)
+                seen += [item["thread_id"] for item in items]
+                if cursor is None:
+                    break
+            assert seen == [f"thread-{i}" for i in range(5)]
+            assert items[-1]["tool_calls"][0]["name"] == "save_report_to_disk"
+
+            # The same pause again keeps its place; a new pause goes to the end
+            await index.add("thread-0", "cp-0", [])
+            assert (await index.page(1))[0][0]["thread_id"] == "thread-0"
+            await index.add("thread-0", "cp-9", [])
+            assert (await index.page(1))[0][0]["thread_id"] == "thread-1"
+
+            assert await index.remove(["thread-1", "thread-2", "missing"]) == 2
+            assert await index.count() == 3
+            with pytest.raises(ValueError):
+                await index.page(2, "not-a-cursor")
+        finally:
+            await index.close()
+
+    asyncio.run(run())
+
+
+def test_pruning_expired_threads_drops_their_pending_approvals(tmp_path):
+    db = str(tmp_path / "checkpoints.db")
+
+    async def run():
+        index = ApprovalIndex(db)
+        await index.open()
+        try:
+            async with open_checkpointer(db, {"prune_interval": 0}) as saver:
+                await saver.conn.executemany(
+                    "INSERT INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                    [("old", 0.0), ("recent", 9e12)]
+                )
+                await saver.conn.commit()
+                for thread_id in ("old", "recent"):
+                    await index.add(thread_id, "cp", [])
+
+                assert (await saver.prune(keep_last=5, retention_days=1))["expired_threads"] == 1
+            items, _ = await index.page(10)
+            assert [item["thread_id"] for item in items] == ["recent"]
+        finally:
+            await index.close()
+
+    asyncio.run(run())
+
+
+def test_a_cancelled_approval_is_reported_for_its_thread_only(monkeypatch):
+    async def approve_agent_action(self, thread_id):
+        if thread_id == "cancelled":
+            raise asyncio.CancelledError()
+        return {"status": "success", "thread_id": thread_id, "agent_response": "Saved"}
+
+    monkeypatch.setattr(AgentService, "approve_agent_action", approve_agent_action)
+    results = asyncio.run(AgentService({}).bulk_approve(["done", "cancelled"]))
+    assert [result["status"] for result in results] == ["success", "error"]
+    assert results[1] == {"thread_id": "cancelled", "status": "error", "message": "CancelledError"}
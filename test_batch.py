@@ -0,0 +1,147 @@
+import json
+import asyncio
+import pytest
+
+from app.core.batch_store import BatchStore
+from app.core.thread_lock import ThreadLeaseManager
+from app.service.batch_service import BatchService
+
+
+class StubAgentService:
+    """
+    In-memory stand-in for AgentService: every run takes two checkpointed
+    steps and then either finishes or pauses before human_approval.
+    """
+
+    def __init__(self, approval_for=(), block_on=None):
+        self.threads = {}
+        self.approval_for = set(approval_for)
+        self.block_on = block_on
+        self.release = asyncio.Event()
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+
+    async def thread_snapshot(self, thread_id):
+        state = self.threads.get(thread_id, {"steps": 0, "next": [], "last": None})
+        return {"checkpoint_id": f"cp-{state['steps']}" if state["steps"] else None,
+                "next": state["next"], "last_message": state["last"]}
+
+    async def stream_chat(self, message, thread_id=None, stream_mode="delta"):
+        self.calls.append((thread_id, message))
+        state = self.threads.setdefault(thread_id, {"steps": 0, "next": [], "last": None})
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            for node in ("agent", "tools"):
+                state["steps"] += 1
+                state["next"] = ["tools"] if node == "agent" else []
+                yield json.dumps({"thread_id": thread_id, "status": "in_progress", "event": "node_end", "node": node})
+                if thread_id == self.block_on:
+                    await self.release.wait()
+                await asyncio.sleep(0.01)
+        finally:
+            self.running -= 1
+        if thread_id in self.approval_for:
+            state["next"] = ["human_approval"]
+        else:
+            state["last"] = f"done: {thread_id}"
+
+    async def approve_agent_action(self, thread_id):
+        self.threads[thread_id].update(next=[], last=f"approved: {thread_id}")
+        return {"status": "success", "thread_id": thread_id, "agent_response": f"approved: {thread_id}"}
+
+
+async def _open(tmp_path):
+    store, leases = BatchStore(str(tmp_path / "cp.db")), ThreadLeaseManager(str(tmp_path / "cp.db"))
+    await store.open()
+    await leases.open()
+    return store, leases
+
+
+def test_batch_runs_with_bounded_concurrency_and_streams_progress(tmp_path):
+    async def run():
+        store, leases = await _open(tmp_path)
+        agent = StubAgentService(approval_for={"report"})
+        service = BatchService(agent, store, leases, {"default_concurrency": 3})
+        jobs = [{"message": f"price of item {i}"} for i in range(9)] + [{"message": "report", "thread_id": "report"}]
+        batch_id = await service.submit(jobs)
+        lines = [json.loads(line) async for line in service.follow(batch_id)]
+        status = await service.status(batch_id)
+        await store.close()
+        await leases.close()
+        return agent, lines, status
+
+    agent, lines, status = asyncio.run(run())
+
+    assert agent.peak == 3
+    assert lines[0]["event"] == "batch" and lines[-1]["event"] == "batch_end"
+    assert lines[-1]["counts"] == {"completed": 9, "waiting_approval": 1}
+    assert sum(1 for line in lines if line["event"] == "job_step") == 20
+    assert status["status"] == "finished"
+    assert status["jobs"][0]["result"] == f"done: {status['batch_id']}-0"
+    assert status["jobs"][9]["status"] == "waiting_approval"
+
+
+def test_interrupted_batch_resumes_from_checkpoints(tmp_path):
+    async def run():
+        store, leases = await _open(tmp_path)
+        agent = StubAgentService(block_on="slow")
+        service = BatchService(agent, store, leases)
+        batch_id = await service.submit(
+            [{"message": "fast"}, {"message": "slow", "thread_id": "slow"}, {"message": "later"}], concurrency=1
+        )
+        while not any(thread == "slow" for thread, _ in agent.calls):
+            await asyncio.sleep(0.01)
+        # The worker stops: the slow job is mid-run, the last one never started
+        await service.shutdown()
+        interrupted = await service.status(batch_id)
+
+        agent.calls.clear()
+        agent.release.set()
+        restarted = BatchService(agent, store, leases)
+        await restarted.resume(batch_id)
+        lines = [json.loads(line) async for line in restarted.follow(batch_id)]
+        await store.close()
+        await leases.close()
+        return agent, interrupted, lines, batch_id
+
+    agent, interrupted, lines, batch_id = asyncio.run(run())
+
+    assert interrupted["status"] == "interrupted"
+    assert interrupted["counts"] == {"completed": 1, "running": 1, "pending": 1}
+    # The finished job is skipped, the slow one continues from its checkpoint, the last one starts
+    assert sorted(agent.calls, key=str) == [(f"{batch_id}-2", "later"), ("slow", None)]
+    resumed = {line["thread_id"]: line["resumed"] for line in lines if line["event"] == "job_start"}
+    assert resumed == {"slow": True, f"{batch_id}-2": False}
+    assert lines[-1]["counts"] == {"completed": 3}
+
+
+def test_auto_approve_completes_paused_jobs(tmp_path):
+    async def run():
+        store, leases = await _open(tmp_path)
+        service = BatchService(StubAgentService(approval_for={"r"}), store, leases)
+        batch_id = await service.submit([{"message": "report", "thread_id": "r"}], auto_approve=True)
+        lines = [json.loads(line) async for line in service.follow(batch_id)]
+        await store.close()
+        await leases.close()
+        return lines
+
+    job_end = [line for line in asyncio.run(run()) if line["event"] == "job_end"][0]
+    assert (job_end["status"], job_end["result"]) == ("completed", "approved: r")
+
+
+def test_jobs_sharing_a_thread_id_are_rejected(tmp_path):
+    async def run():
+        store, leases = await _open(tmp_path)
+        service = BatchService(StubAgentService(), store, leases)
+        try:
+            with pytest.raises(ValueError, match="repeated: t1"):
+                await service.submit([{"message": "a", "thread_id": "t1"}, {"message": "b"},
+                                      {"message": "c", "thread_id": "t1"}])
+            assert not service.tasks
+        finally:
+            await store.close()
+            await leases.close()
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+from app.core.cancellation import RunScope, aborted, run_detached
+
+
+def test_closing_the_response_cancels_the_run_and_lets_it_clean_up():
+    state = {"cleaned_up": False}
+
+    async def run():
+        try:
+            yield "first"
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                aborted("llm")
+                raise
+            yield "never"
+        finally:
+            # e.g. the checkpoint write and the lease release
+            await asyncio.sleep(0.01)
+            state["cleaned_up"] = True
+
+    async def main():
+        scope = RunScope("stream", "t-cancel")
+        relay = run_detached(run(), scope, disconnected=lambda: asyncio.sleep(0, result=False), poll_interval=0.01)
+        assert await relay.__anext__() == "first"
+        await asyncio.sleep(0.05)
+        await relay.aclose()
+        return scope
+
+    scope = asyncio.run(main())
+    assert state["cleaned_up"]
+    assert scope.reason == "client_disconnect" and scope.aborted == {"llm": 1}
+
+
+def test_disconnect_is_noticed_between_events_and_errors_reach_the_client():
+    async def slow():
+        yield "first"
+        await asyncio.sleep(30)
+
+    async def failing():
+        yield "first"
+        raise RuntimeError("boom")
+
+    async def main():
+        gone = asyncio.Event()
+        scope = RunScope("stream", "t-poll")
+        events = []
+        async for event in run_detached(slow(), scope, lambda: asyncio.sleep(0, result=gone.is_set()), 0.01):
+            events.append(event)
+            gone.set()
+        assert events == ["first"] and scope.reason == "client_disconnect"
+
+        with pytest.raises(RuntimeError):
+            async for _ in run_detached(failing(), RunScope("stream", "t-error")):
+                pass
+
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.core.compaction import ContextCompactor, message_tokens
+
+
+def _history(steps: int, page_chars: int = 20000) -> list:
+    messages = [HumanMessage(content="Find the RTX 5090 price on three retailers and save a report.")]
+    for i in range(steps):
+        messages.append(AIMessage(content="", tool_calls=[
+            {"name": "fetch", "args": {"url": f"https://shop{i}.example/rtx"}, "id": f"call_{i}"}
+        ]))
+        messages.append(ToolMessage(content=f"page {i} " + "lorem ipsum dolor " * (page_chars // 18),
+                                    tool_call_id=f"call_{i}", name="fetch"))
+    return messages
+
+
+def test_recent_steps_are_verbatim_and_old_outputs_trimmed():
+    messages = _history(4)
+    compacted, tokens = ContextCompactor(budget_tokens=100000, keep_last_steps=2, tool_output_chars=500).compact(messages)
+
+    assert len(compacted) == len(messages)
+    assert compacted[-1] is messages[-1] and compacted[-3] is messages[-3]
+    assert len(compacted[2].content) < 700 and "chars trimmed" in compacted[2].content
+    assert tokens == sum(message_tokens(m) for m in compacted)
+    # The input history is untouched
+    assert len(messages[2].content) > 19000
+
+
+def test_oldest_steps_are_summarized_to_meet_budget():
+    messages = _history(6)
+    compactor = ContextCompactor(budget_tokens=12000, keep_last_steps=2, tool_output_chars=2000)
+    compacted, tokens = compactor.compact(messages)
+
+    assert tokens <= 12000 or len([m for m in compacted if isinstance(m, ToolMessage)]) == 2
+    assert isinstance(compacted[0], HumanMessage)
+    summary = compacted[1]
+    assert isinstance(summary, SystemMessage) and "fetch" in summary.content
+    # Every remaining AIMessage keeps all of its ToolMessages
+    ids = {m.tool_call_id for m in compacted if isinstance(m, ToolMessage)}
+    for m in compacted:
+        if isinstance(m, AIMessage):
+            assert {c["id"] for c in m.tool_calls} <= ids
+    assert compacted[-1] is messages[-1]
+
+
+def test_prompt_stops_growing_with_history():
+    compactor = ContextCompactor(budget_tokens=8000, keep_last_steps=2, tool_output_chars=1500)
+    _, short = compactor.compact(_history(3, page_chars=6000))
+    _, long = compactor.compact(_history(30, page_chars=6000))
+
+    assert long <= 8000
+    assert long < sum(message_tokens(m) for m in _history(30, page_chars=6000)) / 5
+    assert short <= 8000
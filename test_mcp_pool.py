@@ -0,0 +1,167 @@
+import time
+import asyncio
+import pytest
+
+from app.core import mcp_pool
+from app.core.mcp_pool import MCPSessionPool
+
+
+class FakeSession:
+    def __init__(self, member):
+        self.member = member
+
+    async def call_tool(self, name, arguments):
+        await asyncio.sleep(arguments.get("seconds", 0))
+        return f"{name} on #{self.member.index}"
+
+    async def list_tools(self):
+        return ["echo"]
+
+    async def send_ping(self):
+        if self.member.index in self.member.server.hung_pings:
+            await asyncio.sleep(3600)
+
+
+class FakeMember:
+    """Stands in for a PooledSession: no subprocess, just its lifecycle."""
+
+    def __init__(self, server, index):
+        self.server = server
+        self.index = index
+        self.session = None
+
+    @property
+    def alive(self):
+        return self.session is not None
+
+    async def start(self):
+        # The subprocess runs from here on, even if the caller stops waiting for it
+        self.server.running.add(self.index)
+        await asyncio.sleep(self.server.start_seconds)
+        if self.index in self.server.failing_starts:
+            self.server.running.discard(self.index)
+            raise RuntimeError("uvx not found")
+        self.session = FakeSession(self)
+
+    async def close(self):
+        self.session = None
+        self.server.running.discard(self.index)
+
+
+class FakeServer:
+    def __init__(self, start_seconds=0.0, failing_starts=(), hung_pings=()):
+        self.start_seconds = start_seconds
+        self.failing_starts = set(failing_starts)
+        self.hung_pings = set(hung_pings)
+        # Indexes of the sessions started and not closed yet
+        self.running = set()
+
+
+def fake_pool(server: FakeServer, **settings) -> MCPSessionPool:
+    pool = MCPSessionPool("fake", {"command": "fake", "args": [], **settings})
+
+    def new_member():
+        pool._next_index += 1
+        return FakeMember(server, pool._next_index)
+
+    pool._new_member = new_member
+    return pool
+
+
+def test_calls_run_in_parallel_and_a_busy_pool_times_out():
+    async def run():
+        pool = fake_pool(FakeServer(), pool_size=2, call_timeout=0.2, health_check_interval=60)
+        await pool.start()
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(pool.call_tool("echo", {"seconds": 0.1}) for _ in range(2)))
+            assert time.perf_counter() - start < 0.18
+            assert sorted(results) == ["echo on #1", "echo on #2"]
+
+            # Both sessions taken: the next caller waits call_timeout at most
+            held = [await pool._acquire(), await pool._acquire()]
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.call_tool("echo", {})
+            for member in held:
+                pool._release(member)
+            assert await pool.list_tools() == ["echo"]
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+
+def test_a_hung_call_is_recycled():
+    server = FakeServer()
+
+    async def run():
+        pool = fake_pool(server, pool_size=1, call_timeout=0.05, health_check_interval=60)
+        await pool.start()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.call_tool("echo", {"seconds": 1})
+            # The hung session is replaced by a fresh one
+            assert await pool.call_tool("echo", {}) == "echo on #2"
+            return pool.respawn_count
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == 1
+    assert server.running == set()
+
+
+def test_sessions_that_fail_to_start_are_respawned():
+    async def run():
+        pool = fake_pool(FakeServer(failing_starts={2}), pool_size=2, call_timeout=1, health_check_interval=60)
+        await pool.start()
+        try:
+            assert pool.healthy_count == 1
+            await asyncio.sleep(0.05)
+            assert pool.healthy_count == 2 and pool.respawn_count == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(fake_pool(FakeServer(failing_starts={1}), pool_size=1).start())
+
+
+def test_a_hung_ping_does_not_keep_the_other_sessions_out(monkeypatch):
+    monkeypatch.setattr(mcp_pool, "PING_TIMEOUT", 0.3)
+    server = FakeServer(hung_pings={1})
+
+    async def run():
+        pool = fake_pool(server, pool_size=3, call_timeout=5, health_check_interval=0.05)
+        await pool.start()
+        try:
+            # The health check is pinging: #1 never answers, #2 and #3 go back at once
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            await asyncio.gather(pool.call_tool("echo", {}), pool.call_tool("echo", {}))
+            assert time.perf_counter() - start < 0.1
+
+            # Past the ping timeout, #1 is replaced
+            await asyncio.sleep(0.35)
+            assert 1 not in server.running and pool.respawn_count >= 1
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+
+def test_close_waits_for_respawns_in_progress():
+    server = FakeServer()
+
+    async def run():
+        pool = fake_pool(server, pool_size=1, call_timeout=0.05, health_check_interval=60)
+        await pool.start()
+        server.start_seconds = 0.05
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.call_tool("echo", {"seconds": 1})
+        # The respawn is starting its session when the pool closes
+        await asyncio.sleep(0.01)
+        await pool.close()
+
+    asyncio.run(run())
+    assert server.running == set()
@@ -0,0 +1,45 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from benchmarks.fakes import ScriptedChatModel
+from app.core.agent import AgentManager, ModelRouter
+
+
+def tool_step(*names):
+    calls = [{"name": name, "args": {}, "id": f"call-{i}"} for i, name in enumerate(names)]
+    return [AIMessage(content="", tool_calls=calls)] + [
+        ToolMessage(content="ok", name=name, tool_call_id=f"call-{i}") for i, name in enumerate(names)
+    ]
+
+
+def test_router_uses_graph_position_and_context_size():
+    router = ModelRouter({"large_context_tokens": 1000})
+    question = [HumanMessage(content="Find the price of the RTX 5090")]
+
+    assert router.route(question, 200) == ("small", "first_step")
+    assert router.route(question + tool_step("web_search_tool"), 200) == ("small", "tool_routing")
+    assert router.route(question + tool_step("fetch", "fetch"), 200) == ("small", "tool_routing")
+    assert router.route(question + tool_step("bulk_upsert_products"), 200) == ("large", "synthesis")
+    assert router.route(question + tool_step("web_search_tool"), 5000) == ("large", "long_context")
+    assert ModelRouter({"enabled": False}).route(question + tool_step("write_query"), 5000)[0] == "small"
+
+
+def test_agent_tracks_usage_per_model():
+    manager = AgentManager()
+    manager.set_models({
+        tier: ScriptedChatModel(model_name=f"scripted-{tier}", first_token_ms=0, token_ms=0)
+        for tier in manager.model_names
+    })
+    config = {"configurable": {"thread_id": "router-test"}}
+    question = [HumanMessage(content="Find the price of gpu")]
+
+    async def run():
+        await manager.acall_model({"messages": question, "total_tokens": 0}, config)
+        await manager.acall_model({"messages": question + tool_step("write_query"), "total_tokens": 0}, config)
+
+    asyncio.run(run())
+    stats = manager.usage_stats()
+    assert stats["tiers"] == {"small": "scripted-small", "large": "scripted-large"}
+    assert stats["models"]["scripted-small"]["calls"] == 1
+    assert stats["models"]["scripted-large"]["calls"] == 1
+    assert set(manager.bound_models) == {"small", "large"}
@@ -0,0 +1,107 @@
+import asyncio
+
+from types import SimpleNamespace
+from app.core.mcp_manager import MCPHubManager
+from app.core.prefetch import FetchPrefetcher, result_urls
+from app.core.tool_cache import ToolResultCache
+
+SEARCH_OUTPUT = """## rtx 5090 price
+[1] https://a.example/gpu
+first
+[2] https://a.example/gpu-2
+second
+[3] https://c.example/gpu
+third
+
+## rx 9070 price
+[1] https://d.example/gpu#offers
+first"""
+
+
+def test_top_results_of_each_query():
+    assert result_urls(SEARCH_OUTPUT, 2) == [
+        "https://a.example/gpu", "https://a.example/gpu-2", "https://d.example/gpu#offers"
+    ]
+
+
+def test_limits_hits_and_waste():
+    running, peak = {}, {}
+
+    async def fetch(url):
+        domain = url.split("/")[2]
+        running[domain] = running.get(domain, 0) + 1
+        peak[domain] = max(peak.get(domain, 0), running[domain])
+        await asyncio.sleep(0.02)
+        running[domain] -= 1
+        return f"page {url}"
+
+    async def main():
+        prefetcher = FetchPrefetcher({"enabled": True, "top_k": 2, "budget_per_minute": 3, "max_concurrency": 4})
+        prefetcher.attach(fetch)
+        prefetcher.schedule(result_urls(SEARCH_OUTPUT, prefetcher.top_k))
+        # Still running: the fetch waits for it; the fragment does not matter
+        assert await prefetcher.take("https://d.example/gpu") == "page https://d.example/gpu"
+        await asyncio.sleep(0.05)
+        assert await prefetcher.take("https://a.example/gpu") == "page https://a.example/gpu"
+        assert await prefetcher.take("https://c.example/gpu") is None
+        # Over the budget
+        prefetcher.schedule(["https://e.example/gpu"])
+        await prefetcher.close()
+        prefetcher._expire()
+        return prefetcher
+
+    prefetcher = asyncio.run(main())
+    stats = prefetcher.stats()
+    assert peak["a.example"] == 1
+    assert (stats["started"], stats["joined"], stats["hit"], stats["miss"], stats["skipped_budget"]) == (3, 1, 1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 3)
+
+
+def test_unused_prefetches_expire_as_wasted():
+    async def main():
+        prefetcher = FetchPrefetcher({"enabled": True, "ttl": 0.01})
+        prefetcher.attach(lambda url: asyncio.sleep(0, result="page"))
+        prefetcher.schedule(["https://a.example/1", "https://b.example/2"])
+        await asyncio.sleep(0.02)
+        assert await prefetcher.take("https://a.example/1") is None
+        return prefetcher.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["wasted"], stats["miss"], stats["waste_rate"]) == (2, 1, 1.0)
+
+
+class StubPool:
+    name = "fetch"
+    call_timeout = 5
+
+    def __init__(self):
+        self.calls = []
+
+    async def call_tool(self, name, arguments):
+        self.calls.append(arguments)
+        text = f"Contents of {arguments['url']}:\n# No prices here"
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], isError=False)
+
+
+def test_fetch_runner_checks_the_prefetched_pages_first():
+    hub = MCPHubManager()
+    hub.prefetcher = FetchPrefetcher({"enabled": True})
+    hub.cache = ToolResultCache(ttls={"fetch": 3600})
+    pool = StubPool()
+
+    async def main():
+        hub.prefetcher.attach(lambda url: hub._prefetch(pool, "fetch", url))
+        # An older result of the same fetch in the tool result cache
+        await hub.cache.put("fetch", {"url": "https://a.example/gpu"}, "stale page")
+        hub.observe_tool_result("web_search_tool", SEARCH_OUTPUT)
+        await asyncio.sleep(0.01)
+        prefetched = len(pool.calls)
+        text = await hub._mcp_tool_executor(pool, "fetch", url="https://a.example/gpu")
+        assert text.endswith("# No prices here") and len(pool.calls) == prefetched
+        # Asking for the page text is a different call
+        await hub._mcp_tool_executor(pool, "fetch", url="https://a.example/gpu", page_text=True)
+        assert len(pool.calls) == prefetched + 1
+        await hub.prefetcher.close()
+
+    asyncio.run(main())
+    assert hub.prefetcher.stats()["hit"] == 1
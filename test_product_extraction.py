@@ -0,0 +1,93 @@
+import json
+import asyncio
+
+from pathlib import Path
+from types import SimpleNamespace
+from app.core.mcp_manager import MCPHubManager
+from app.core.product_extraction import FetchExtraction, ProductExtractor, parse_amount
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+
+
+def page(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def test_json_ld_offers_win_over_the_page_text():
+    result = ProductExtractor().extract(page("jsonld_product.html"))
+    offers = [(p["seller"], p["price"], p["price_in_cents"], p["availability"]) for p in result["products"]]
+    assert offers == [
+        ("GPU Store", "1999.99", 199999, "InStock"),
+        ("Marketplace Seller", "2149.00", 214900, "OutOfStock")
+    ]
+    assert {p["source"] for p in result["products"]} == {"json-ld"}
+    # Related products and prices in scripts or banners are not this page's product
+    assert result["price_mentions"] == []
+
+
+def test_microdata_offer():
+    [product] = ProductExtractor().extract(page("microdata_product.html"))["products"]
+    assert product["name"] == "AMD Radeon RX 9070 XT 16GB" and product["brand"] == "AMD"
+    assert (product["price_in_cents"], product["currency"], product["source"]) == (68990, "EUR", "microdata")
+
+
+def test_price_mentions_from_visible_text_only():
+    mentions = ProductExtractor(context_chars=20).extract(page("text_only.html"))["price_mentions"]
+    assert [(m["price_in_cents"], m["currency"], m["count"]) for m in mentions] == [
+        (189900, "USD", 2), (199999, "USD", 1), (224900, "EUR", 1), (179900, "GBP", 1)
+    ]
+    assert "RTX 5090" in mentions[0]["context"]
+    assert parse_amount("1.999,99") == parse_amount("1,999.99") == parse_amount("1999.990", decimal_point=True)
+
+
+class StubPool:
+    """Answers fetch like mcp-server-fetch: raw HTML when asked for it, markdown otherwise."""
+
+    name = "fetch"
+    call_timeout = 5
+
+    def __init__(self, html: str):
+        self.html = html
+        self.calls = []
+
+    async def call_tool(self, name, arguments):
+        self.calls.append(arguments)
+        content = self.html if arguments.get("raw") else "# Page as markdown"
+        text = f"Contents of {arguments['url']}:\n{content}"
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], isError=False)
+
+
+def test_fetch_results_are_replaced_by_the_extracted_records():
+    hub = MCPHubManager()
+    hub.extraction = FetchExtraction({"max_html_chars": 1000})
+    hub.tool_params["fetch"] = {"url", "max_length", "start_index", "raw"}
+
+    async def fetch(html: str, **arguments):
+        pool = StubPool(html)
+        text = await hub._mcp_tool_executor(pool, "fetch", url="https://shop.example/gpu", **arguments)
+        return text, pool.calls
+
+    text, calls = asyncio.run(fetch(page("jsonld_product.html"), page_text=False))
+    assert json.loads(text)["products"][0]["price_in_cents"] == 199999
+    assert calls == [{"url": "https://shop.example/gpu", "raw": True, "max_length": 1000}]
+
+    # Asked for the text: the tool's own output
+    text, calls = asyncio.run(fetch(page("jsonld_product.html"), page_text=True))
+    assert text.endswith("# Page as markdown") and calls == [{"url": "https://shop.example/gpu"}]
+
+    # No price on the page: its text comes from the HTML already fetched, cut at the model's max_length
+    text, calls = asyncio.run(fetch(page("no_prices.html")))
+    assert text.startswith("Contents of https://shop.example/gpu:\nAbout us") and len(calls) == 1
+    text, calls = asyncio.run(fetch(page("no_prices.html"), max_length=20))
+    assert "<error>Content truncated." in text and len(text.split("\n", 1)[1]) < 150 and len(calls) == 1
+
+
+def test_products_without_a_price_are_not_a_price_page():
+    html = (
+        '<html><head><script type="application/ld+json">'
+        '{"@type": "Product", "name": "GeForce RTX 5090", "brand": "NVIDIA"}'
+        '</script></head><body><p>Coming soon.</p></body></html>'
+    )
+    summary, text = FetchExtraction().summarize(html)
+    assert summary is None and "Coming soon." in text
+    assert FetchExtraction().summarize(page("jsonld_product.html"))[0]["products"]
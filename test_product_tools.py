@@ -0,0 +1,175 @@
+import random
+import sqlite3
+
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.workflow.tool_schemas import ProductRecord
+from app.tools.product_tools import bulk_upsert_products, ensure_schema, price_summary, upsert_products
+
+
+def _rows(db_path):
+    with closing(sqlite3.connect(db_path)) as conn:
+        return conn.execute(
+            "SELECT name, price_in_cents, stock, source_url, observed_at FROM products ORDER BY name, source_url"
+        ).fetchall()
+
+
+def test_batch_is_deduped_and_latest_observation_wins(tmp_path):
+    db = str(tmp_path / "store.db")
+    records = [
+        ProductRecord(name="RTX 5090", price_in_cents=199999, stock=3, source_url="https://Shop.example/rtx#specs",
+                      observed_at="2026-01-10T10:00:00Z"),
+        ProductRecord(name="RTX  5090 ", price_in_cents=189999, stock=1, source_url="https://shop.example/rtx",
+                      observed_at="2026-01-11T10:00:00Z"),
+        ProductRecord(name="RTX 5090", price_in_cents=209999, stock=0, source_url="https://other.example/rtx",
+                      observed_at="2026-01-11T10:00:00Z"),
+    ]
+    result = upsert_products(db, records)
+
+    assert result == {"received": 3, "duplicates_merged": 1, "written": 2, "stale_skipped": 0, "history_added": 3}
+    assert _rows(db) == [
+        ("RTX 5090", 209999, 0, "https://other.example/rtx", "2026-01-11T10:00:00Z"),
+        ("RTX 5090", 189999, 1, "https://shop.example/rtx", "2026-01-11T10:00:00Z"),
+    ]
+
+
+def test_older_observations_do_not_overwrite_newer_rows(tmp_path):
+    db = str(tmp_path / "store.db")
+    newer = ProductRecord(name="Monitor 4K", price_in_cents=35000, source_url="https://a.example/m",
+                          observed_at="2026-02-01T00:00:00Z")
+    older = ProductRecord(name="Monitor 4K", price_in_cents=39900, source_url="https://a.example/m",
+                          observed_at="2026-01-01T00:00:00Z")
+    upsert_products(db, [newer])
+    result = upsert_products(db, [older])
+
+    assert result["stale_skipped"] == 1
+    assert _rows(db)[0][1] == 35000
+
+
+def test_legacy_table_is_upgraded_in_place(tmp_path):
+    db = str(tmp_path / "legacy.db")
+    with closing(sqlite3.connect(db)) as conn, conn:
+        conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+                     "price_in_cents INTEGER NOT NULL, stock INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO products (name, price_in_cents, stock) VALUES (?, ?, ?)",
+                         [("Laptop Pro", 120050, 10), ("Laptop Pro", 119900, 9)])
+        ensure_schema(conn)
+
+    # Nothing is dropped: every legacy row joins the history, the newest one is the latest price
+    assert _rows(db) == [("Laptop Pro", 120050, 10, "", ""), ("Laptop Pro", 119900, 9, "", "")]
+    with closing(sqlite3.connect(db)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM price_observations").fetchone() == (2,)
+    assert price_summary(db, ["Laptop Pro"])[0]["latest_price_in_cents"] == 119900
+
+
+def test_plain_inserts_of_the_same_product_and_bulk_updates(tmp_path):
+    db = str(tmp_path / "store.db")
+    upsert_products(db, [])
+    with closing(sqlite3.connect(db)) as conn, conn:
+        # The write_query flow of the db_context prompt, run twice
+        for price in (199999, 189999):
+            conn.execute(f"INSERT INTO products (name, price_in_cents, stock) VALUES ('GPU', {price}, 1)")
+
+    result = upsert_products(db, [ProductRecord(name="GPU", price_in_cents=179999, source_url="",
+                                                observed_at="2026-03-01T00:00:00Z")])
+    assert result["written"] == 1
+    assert _rows(db) == [("GPU", 179999, 0, "", "2026-03-01T00:00:00Z")] * 2
+
+
+def test_tool_accepts_a_batch_in_one_call(tmp_path, monkeypatch):
+    db = str(tmp_path / "store.db")
+    monkeypatch.setattr("app.tools.product_tools.default_db_path", lambda: db)
+    records = [{"name": f"GPU {i}", "price_in_cents": 1000 + i, "source_url": f"https://s.example/{i}"}
+               for i in range(50)]
+
+    output = bulk_upsert_products.invoke({"records": records})
+
+    assert "'written': 50" in output
+    assert len(_rows(db)) == 50
+
+
+def _observation(day: int, price: int, source: str = "https://a.example/gpu", hour: int = 12) -> ProductRecord:
+    return ProductRecord(name="GPU", price_in_cents=price, source_url=source,
+                         observed_at=datetime(2026, 3, day, hour, tzinfo=timezone.utc))
+
+
+def test_price_summary_over_a_window(tmp_path):
+    db = str(tmp_path / "store.db")
+    upsert_products(db, [_observation(1, 100000), _observation(5, 90000), _observation(7, 95000, hour=8)])
+    # An older observation is history, but does not replace the current price
+    upsert_products(db, [_observation(6, 80000), _observation(7, 85000, "https://b.example/gpu", hour=20)])
+
+    [summary] = price_summary(db, ["GPU"], window_days=3, as_of=datetime(2026, 3, 7, 23, tzinfo=timezone.utc))
+
+    assert summary["latest_price_in_cents"] == 85000
+    assert summary["latest_source_url"] == "https://b.example/gpu"
+    assert (summary["window_min_in_cents"], summary["window_max_in_cents"]) == (80000, 95000)
+    assert summary["window_samples"] == 4
+    assert summary["window_avg_in_cents"] == 87500
+    # Reference: the last price before the window (day 1)
+    assert summary["change_percent"] == -15.0
+    assert price_summary(db, ["Unknown"]) == [{"name": "Unknown", "found": False}]
+
+
+def test_plain_sql_writes_are_recorded_in_the_history(tmp_path):
+    db = str(tmp_path / "store.db")
+    upsert_products(db, [])
+    with closing(sqlite3.connect(db)) as conn, conn:
+        # What the LLM sends through the sqlite MCP server's write_query
+        conn.execute("INSERT INTO products (name, price_in_cents, stock, source_url, observed_at) "
+                     "VALUES ('SSD', 10000, 1, 'https://a.example/ssd', '2026-03-01T00:00:00Z')")
+        conn.execute("UPDATE products SET price_in_cents = 9000, observed_at = '2026-03-02T00:00:00Z' WHERE name = 'SSD'")
+
+    [summary] = price_summary(db, ["SSD"], window_days=2, as_of=datetime(2026, 3, 2, tzinfo=timezone.utc))
+    assert summary["latest_price_in_cents"] == 9000
+    assert summary["change_percent"] == -10.0
+
+
+def test_plain_update_after_a_bulk_upsert_is_a_new_observation(tmp_path):
+    db = str(tmp_path / "store.db")
+    upsert_products(db, [ProductRecord(name="SSD", price_in_cents=10000, source_url="https://a.example/ssd",
+                                       observed_at="2026-03-01T00:00:00Z")])
+    with closing(sqlite3.connect(db)) as conn, conn:
+        conn.execute("UPDATE products SET price_in_cents = 9000 WHERE name = 'SSD'")
+        # No change: nothing to record
+        conn.execute("UPDATE products SET stock = stock WHERE name = 'SSD'")
+
+    with closing(sqlite3.connect(db)) as conn:
+        assert conn.execute("SELECT price_in_cents FROM price_latest WHERE name = 'SSD'").fetchone() == (9000,)
+        assert conn.execute("SELECT COUNT(*) FROM price_observations").fetchone() == (2,)
+    assert price_summary(db, ["SSD"])[0]["latest_price_in_cents"] == 9000
+
+
+def test_aggregates_match_a_full_scan(tmp_path):
+    db = str(tmp_path / "store.db")
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    records = [
+        ProductRecord(name=f"P{rng.randrange(5)}", price_in_cents=rng.randrange(1000, 5000),
+                      source_url=f"https://s{rng.randrange(3)}.example", observed_at=start + timedelta(minutes=rng.randrange(60 * 24 * 30)))
+        for _ in range(2000)
+    ]
+    for i in range(0, len(records), 250):
+        upsert_products(db, records[i:i + 250])
+
+    as_of = start + timedelta(days=29)
+    summaries = price_summary(db, [f"P{i}" for i in range(5)], window_days=10, as_of=as_of)
+    with closing(sqlite3.connect(db)) as conn:
+        for summary in summaries:
+            expected = conn.execute(
+                "SELECT MIN(price_in_cents), MAX(price_in_cents), COUNT(*) FROM price_observations "
+                "WHERE name = ? AND observed_at >= ? AND observed_at < ?",
+                (summary["name"], (as_of - timedelta(days=9)).strftime("%Y-%m-%d"), "2026-01-31")
+            ).fetchone()
+            assert (summary["window_min_in_cents"], summary["window_max_in_cents"], summary["window_samples"]) == expected
+            latest = conn.execute(
+                "SELECT price_in_cents FROM price_observations WHERE name = ? ORDER BY observed_at DESC LIMIT 1",
+                (summary["name"],)
+            ).fetchone()
+            assert summary["latest_price_in_cents"] == latest[0]
+
+        plan = " ".join(str(row) for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT price_in_cents FROM price_observations WHERE name = 'P1' AND observed_at >= '2026-01-20'"
+        ))
+        assert "COVERING INDEX idx_observations_name_observed" in plan
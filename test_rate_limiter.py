@@ -0,0 +1,148 @@
+import asyncio
+import pytest
+
+from app.core.rate_limiter import LLMScheduler, ModelLimiter, TokenBucket, retry_after
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after_s=None):
+        super().__init__("Rate limit reached")
+        headers = {"retry-after": str(retry_after_s)} if retry_after_s is not None else {}
+        self.response = type("Response", (), {"status_code": 429, "headers": headers})()
+
+
+def test_token_bucket_delay_and_settle():
+    bucket = TokenBucket(per_minute=600)
+    assert bucket.delay(600, bucket.updated) == 0.0
+
+    bucket.take(600, bucket.updated)
+    # 10 units per second: 5 units are 0.5s away, a call larger than the bucket waits for a full one
+    assert bucket.delay(5, bucket.updated) == pytest.approx(0.5)
+    assert bucket.delay(10_000, bucket.updated) == pytest.approx(60.0)
+
+    bucket.adjust(300)
+    assert bucket.level == pytest.approx(300)
+    assert TokenBucket(0).delay(10_000, 0.0) == 0.0
+
+
+def test_waiting_calls_are_served_round_robin_across_threads():
+    async def scenario():
+        limiter = ModelLimiter("model", rpm=1200)
+        limiter.requests.level = 0
+        order = []
+
+        async def call(thread_id, label):
+            await limiter.admit(thread_id, 100)
+            order.append(label)
+
+        tasks = [asyncio.create_task(call("a", f"a{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("b", "b0")))
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 4
+        await asyncio.gather(*tasks)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["a0", "b0", "a1", "a2"]
+    assert stats["queue_depth"] == 0 and stats["queued"] == 4 and stats["max_wait_ms"] > 0
+
+
+def test_rate_limited_calls_are_retried_and_pause_the_model():
+    scheduler = LLMScheduler({"max_retries": 2, "backoff_base": 0.01, "rate_limits": {"default": {"rpm": 0}}})
+    attempts = []
+
+    async def invoke():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError(retry_after_s=0.02)
+        return "ok"
+
+    assert asyncio.run(scheduler.call("model", "t1", 100, invoke, lambda r: 50)) == "ok"
+    assert len(attempts) == 3
+    assert scheduler.stats()["model"]["admitted"] == 3
+
+    attempts.clear()
+
+    async def always_limited():
+        attempts.append(1)
+        raise RateLimitError()
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(scheduler.call("model", "t1", 100, always_limited, lambda r: 0))
+    assert len(attempts) == 3
+
+
+def test_failed_attempts_give_back_their_tpm_reservation():
+    scheduler = LLMScheduler({"max_retries": 1, "backoff_base": 0.01, "expected_completion_tokens": 100,
+                              "rate_limits": {"default": {"tpm": 6000}}})
+    attempts = []
+
+    async def invoke():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimitError(retry_after_s=0.01)
+        return "ok"
+
+    async def failing():
+        raise ValueError("boom")
+
+    async def scenario():
+        tokens = scheduler.limiter("model").tokens
+        start = tokens.level
+        # Reserves 900 per attempt; only the attempt that answered is charged, with its real usage
+        assert await scheduler.call("model", "t1", 800, invoke, lambda r: 500) == "ok"
+        assert tokens.level == pytest.approx(start - 500, abs=5)
+        with pytest.raises(ValueError):
+            await scheduler.call("model", "t1", 800, failing, lambda r: 0)
+        assert tokens.level == pytest.approx(start - 500, abs=5)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+
+
+def test_cancelled_calls_give_back_their_tpm_reservation():
+    scheduler = LLMScheduler({"expected_completion_tokens": 100, "rate_limits": {"default": {"tpm": 6000}}})
+    limiter = scheduler.limiter("model")
+
+    async def streaming():
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        start = limiter.tokens.level
+        # Cancelled while the model was answering
+        call = asyncio.create_task(scheduler.call("model", "t1", 800, streaming, lambda r: 0))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert limiter.tokens.level == pytest.approx(start, abs=5)
+
+        # Cancelled in the queue after the dispatcher admitted it, before it could resume
+        limiter.requests = TokenBucket(6000)
+        limiter.requests.level = 0
+        queued = asyncio.create_task(limiter.admit("t1", 900))
+        take = limiter._take
+
+        def take_then_cancel(cost):
+            take(cost)
+            asyncio.get_running_loop().call_soon(queued.cancel)
+
+        limiter._take = take_then_cancel
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert limiter.tokens.level == pytest.approx(start, abs=5)
+
+    asyncio.run(scenario())
+
+
+def test_other_errors_and_budget():
+    assert retry_after(ValueError("boom")) is None
+    assert retry_after(RateLimitError(retry_after_s=7)) == 7.0
+
+    scheduler = LLMScheduler({"max_tokens_per_run": 1000, "safe_margin": 100})
+    assert not scheduler.budget_exhausted(950)
+    assert scheduler.budget_exhausted(950, scheduler.safe_margin)
+    assert scheduler.budget_exhausted(1001)
@@ -0,0 +1,48 @@
+import gzip
+import asyncio
+import pytest
+
+from app.tools.file_tools import ReportStore
+
+
+def test_report_is_written_atomically_and_not_rewritten_when_unchanged(tmp_path):
+    store = ReportStore(tmp_path / "output", chunk_size=1024)
+    content = "# RTX 5090\n" + "| store | $1,999.99 |\n" * 500
+
+    first = store.write("rtx5090.md", content)
+    path = tmp_path / "output" / "rtx5090.md"
+    assert not first["skipped"] and path.read_text(encoding="utf-8") == content
+    mtime = path.stat().st_mtime_ns
+
+    second = asyncio.run(store.awrite("rtx5090.md", content))
+    assert second["skipped"] and second["sha256"] == first["sha256"]
+    assert path.stat().st_mtime_ns == mtime
+
+    third = store.write("rtx5090.md", content + "\nUpdated.")
+    assert not third["skipped"] and path.read_text(encoding="utf-8").endswith("Updated.")
+    # No temp files are left behind
+    assert [p.name for p in (tmp_path / "output").iterdir()] == ["rtx5090.md"]
+
+
+def test_gzip_reports_replace_the_plain_copy(tmp_path):
+    store = ReportStore(tmp_path, compress=True)
+    store.write("report.md", "plain", compress=False)
+    result = store.write("report.md", "compressed " * 1000)
+
+    assert result["compressed"] and result["stored_bytes"] < result["content_bytes"]
+    assert gzip.decompress((tmp_path / "report.md.gz").read_bytes()) == b"compressed " * 1000
+    assert not (tmp_path / "report.md").exists()
+    assert store.read_bytes("report.md") == b"compressed " * 1000
+    assert [(r["name"], r["compressed"]) for r in store.list()] == [("report.md", True)]
+    # Same content again: the gzipped copy is not rewritten
+    assert store.write("report.md", "compressed " * 1000)["skipped"]
+
+
+def test_report_names_cannot_leave_the_output_directory(tmp_path):
+    store = ReportStore(tmp_path / "output")
+    result = store.write("../../etc/report.md", "x")
+    assert result["path"] == str(tmp_path / "output" / "report.md")
+    for name in ("", "..", ".hidden"):
+        with pytest.raises(ValueError):
+            store.write(name, "x")
+    assert store.find("missing.md") is None
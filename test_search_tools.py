@@ -0,0 +1,106 @@
+import time
+import asyncio
+import pytest
+
+from app.core.tool_cache import ToolResultCache
+from app.tools import search_tools
+
+
+class StubTavily:
+    """Offline stand-in for TavilySearchResults."""
+
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    async def ainvoke(self, payload: dict):
+        self.calls.append(payload["query"])
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            return "HTTPError('429 Client Error')"
+        return [
+            {"url": "https://shop.example/rtx-5090", "content": "RTX 5090   Founders Edition  $1,999.99 " * 40},
+            {"url": "https://news.example/gpu", "content": "Prices are up."}
+        ]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    client = StubTavily()
+    monkeypatch.setattr(search_tools, "_tavily_tool", client)
+    monkeypatch.setattr(search_tools, "search_cache", ToolResultCache({search_tools.SEARCH_TOOL_NAME: 60}))
+    monkeypatch.setattr(search_tools, "_stats", {"upstream_calls": 0, "coalesced": 0})
+    return client
+
+
+def test_results_are_compact(stub):
+    text = asyncio.run(search_tools.web_search_tool.ainvoke({"query": "rtx 5090 price"}))
+
+    assert text.startswith("[1] https://shop.example/rtx-5090\n")
+    assert "[2] https://news.example/gpu\nPrices are up." in text
+    assert "{'url'" not in text
+    assert len(text) < 2 * search_tools.SNIPPET_CHARS
+
+
+def test_normalized_query_hits_cache(stub):
+    async def run():
+        await search_tools.search("RTX 5090 price")
+        await search_tools.search("  rtx   5090 PRICE ")
+
+    asyncio.run(run())
+
+    assert stub.calls == ["rtx 5090 price"]
+    assert search_tools.search_stats()["hits"] == 1
+
+
+def test_identical_concurrent_queries_are_coalesced(stub):
+    async def run():
+        return await asyncio.gather(*(search_tools.search("rtx 5090") for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(set(results)) == 1
+    assert len(stub.calls) == 1
+    assert search_tools.search_stats()["coalesced"] == 4
+
+
+def test_batched_queries_run_concurrently(stub):
+    stub.delay = 0.2
+    start = time.perf_counter()
+    text = asyncio.run(search_tools.web_search_tool.ainvoke(
+        {"query": "rtx 5090", "queries": ["rtx 5080", "RTX 5090", "rtx 4090"]}
+    ))
+
+    assert time.perf_counter() - start < 0.4
+    assert sorted(stub.calls) == ["rtx 4090", "rtx 5080", "rtx 5090"]
+    assert text.count("## ") == 3
+
+
+def test_waiters_survive_the_cancellation_of_the_caller_they_joined(stub):
+    async def run():
+        # The first caller's run is cancelled (tool deadline, client disconnect) mid-search
+        owner = asyncio.create_task(search_tools.search("rtx 5090 price"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(search_tools._web_search("RTX 5090  price", ["gpu deals"]))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        single = await search_tools._web_search("rtx 5090 price")
+        return await waiter, single
+
+    text, single = asyncio.run(run())
+
+    assert text.count("[1] https://shop.example/rtx-5090") == 2 and "Search failed" not in text
+    assert single.startswith("[1] ")
+    assert stub.calls == ["rtx 5090 price", "gpu deals", "rtx 5090 price"]
+
+
+def test_failures_are_not_cached(stub):
+    stub.fail = True
+    first = asyncio.run(search_tools.web_search_tool.ainvoke({"query": "rtx 5090"}))
+    stub.fail = False
+    second = asyncio.run(search_tools.web_search_tool.ainvoke({"query": "rtx 5090"}))
+
+    assert first.startswith("Search failed: HTTPError")
+    assert second.startswith("[1] ")
+    assert len(stub.calls) == 2
@@ -0,0 +1,51 @@
+import time
+import pytest
+
+from app.core.security import SQLSecurityValidator
+
+
+@pytest.mark.parametrize("query, read_only", [
+    ("SELECT * FROM products", True),
+    ("  /* latest */ select name from products where name = 'Drop-in cooler'", True),
+    ("SELECT replace(name, 'x', 'y') FROM products;  -- done", True),
+    ("WITH cheap AS (SELECT * FROM products WHERE price_in_cents < 1000) SELECT * FROM cheap", True),
+    ("INSERT INTO products (name, price_in_cents, stock) VALUES ('Delete key; CREATE edition', 100, 1)", False),
+    ("UPDATE products SET stock = 0 WHERE name = 'GPU'", False),
+    ("REPLACE INTO products (name, price_in_cents, stock) VALUES ('GPU', 1, 1)", False),
+    ("WITH x AS (SELECT 1) INSERT INTO products SELECT * FROM x", False),
+    ('SELECT "drop", [create] FROM products', True),
+])
+def test_allowed_queries_are_classified(query, read_only):
+    result = SQLSecurityValidator.classify(query)
+    assert result.allowed, result.reason
+    assert result.read_only is read_only
+
+
+@pytest.mark.parametrize("query, reason", [
+    ("DROP TABLE products", "DROP is not allowed"),
+    ("delete from products", "DELETE is not allowed"),
+    ("SELECT 1; DROP TABLE products", "multiple statements"),
+    ("INSERT INTO products VALUES ('a', 1, 1); INSERT INTO products VALUES ('b', 2, 2)", "multiple statements"),
+    ("SELECT 1 /* ; */ ; x", "multiple statements"),
+    ("ATTACH DATABASE 'other.db' AS other", "ATTACH is not allowed"),
+    ("SELECT 'unterminated", "unterminated literal or comment"),
+    ("SELECT 1 /* open", "unterminated literal or comment"),
+    ("-- nothing here", "empty query"),
+])
+def test_rejected_queries(query, reason):
+    result = SQLSecurityValidator.classify(query)
+    assert not result.allowed
+    assert result.reason == reason
+    assert not SQLSecurityValidator.validate_query(query)
+
+
+def test_large_insert_batch_is_scanned_quickly():
+    rows = ", ".join(f"('Product {i} -- drop; create', {i}, 1)" for i in range(50000))
+    query = f"INSERT INTO products (name, price_in_cents, stock) VALUES {rows};"
+
+    start = time.perf_counter()
+    result = SQLSecurityValidator.classify(query)
+    elapsed = time.perf_counter() - start
+
+    assert result.allowed and not result.read_only
+    assert elapsed < 1.0
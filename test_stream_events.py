@@ -0,0 +1,99 @@
+import json
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from langchain_core.messages import AIMessage, AIMessageChunk
+from app.core import graph
+from app.core.thread_lock import WORKER_ID, ThreadLeaseManager
+from app.schemas.api.responses import StreamResponse
+from app.service.agent_service import AgentService
+
+# Block content, as some providers return it
+REPLY = AIMessage(
+    content=[{"type": "text", "text": "Saving the report"}],
+    tool_calls=[{"name": "save_report_to_disk", "args": {"filename": "gpu.md"}, "id": "call-1"}]
+)
+
+
+class FakeGraph:
+    """A run of the agent node that pauses before the approval."""
+
+    async def astream(self, inputs, config, stream_mode):
+        if "debug" in stream_mode:
+            yield "debug", {"type": "task", "payload": {"name": "agent"}}
+        yield "messages", (AIMessageChunk(content="Saving"), {"langgraph_node": "agent"})
+        if "values" in stream_mode:
+            yield "values", {"messages": [REPLY]}
+        else:
+            yield "debug", {"type": "task_result", "payload": {
+                "name": "agent", "result": [("messages", [REPLY])], "error": None
+            }}
+
+    async def aget_state(self, config):
+        return SimpleNamespace(
+            next=("human_approval",), values={"messages": [REPLY], "total_tokens": 0},
+            config={"configurable": {"checkpoint_id": "cp-1"}}, tasks=()
+        )
+
+
+class FakeApprovalIndex:
+    async def add(self, thread_id, checkpoint_id, tool_calls):
+        pass
+
+    async def remove(self, thread_ids):
+        return 0
+
+
+@pytest.mark.parametrize("stream_mode", ["delta", "values"])
+def test_every_event_matches_the_schema(tmp_path, monkeypatch, stream_mode):
+    async def run():
+        leases = ThreadLeaseManager(str(tmp_path / "checkpoints.db"))
+        await leases.open()
+        monkeypatch.setattr(graph, "thread_leases", leases)
+        try:
+            return [event async for event in AgentService({}).stream_chat("save it", "t-1", stream_mode)]
+        finally:
+            await leases.close()
+
+    monkeypatch.setattr(graph, "app_graph", FakeGraph())
+    monkeypatch.setattr(graph, "approval_index", FakeApprovalIndex())
+    events = [StreamResponse.model_validate_json(event) for event in asyncio.run(run())]
+
+    assert events[-1].status == "waiting_approval" and events[-1].next_step == ["human_approval"]
+    if stream_mode == "values":
+        # The list content of the last message is sent as its JSON text
+        assert [event.status for event in events] == ["token", "in_progress", "waiting_approval"]
+        assert events[0].content == "Saving"
+        assert json.loads(events[1].content) == REPLY.content
+    else:
+        # The text went out as tokens and is not repeated as a message
+        assert [event.event for event in events[:-1]] == ["node_start", "token", "tool_call", "node_end"]
+
+
+class StalledGraph(FakeGraph):
+    """A thread cancelled after the agent's message was saved but before its routing write."""
+
+    def __init__(self, leases):
+        self.leases = leases
+        self.holders = []
+
+    async def aupdate_state(self, config, values, as_node):
+        self.holders.append(await self.leases.holder(config["configurable"]["thread_id"]))
+
+
+def test_stalled_threads_are_rerouted_under_the_lease(tmp_path, monkeypatch):
+    async def run():
+        leases = ThreadLeaseManager(str(tmp_path / "checkpoints.db"))
+        await leases.open()
+        monkeypatch.setattr(graph, "thread_leases", leases)
+        monkeypatch.setattr(graph, "app_graph", StalledGraph(leases))
+        try:
+            [event async for event in AgentService({}).stream_chat(None, "t-1")]
+            return graph.app_graph.holders
+        finally:
+            await leases.close()
+
+    monkeypatch.setattr(graph, "approval_index", FakeApprovalIndex())
+    holders = asyncio.run(run())
+    assert len(holders) == 1 and holders[0].startswith(WORKER_ID)
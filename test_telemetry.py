@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+
+from app.core.startup import StartupTracker
+from app.core.telemetry import Histogram, Telemetry, TraceStore
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, tool="fetch")
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{tool="fetch",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{tool="fetch",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{tool="fetch",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{tool="fetch"} 4' in lines
+
+
+def test_spans_are_attributed_to_the_running_thread():
+    telemetry = Telemetry()
+    with telemetry.run("stream", "thread-1"):
+        with telemetry.span("mcp", "fetch/fetch"):
+            pass
+        with pytest.raises(ValueError):
+            with telemetry.span("tool", "write_query"):
+                raise ValueError("boom")
+    with telemetry.span("mcp", "fetch/fetch"):
+        pass
+
+    spans = telemetry.traces.get("thread-1")
+    assert [(s["kind"], s["status"]) for s in spans] == [("run", "ok"), ("mcp", "ok"), ("tool", "error")]
+    assert 'agent_span_duration_seconds_count{kind="mcp",name="fetch/fetch",status="ok"} 2' in telemetry.registry.render()
+
+
+def test_trace_store_keeps_most_recent_threads():
+    store = TraceStore(max_threads=2, max_spans=2)
+    for thread_id in ("a", "b", "a", "c"):
+        for i in range(3):
+            store.add(thread_id, {"start": i})
+
+    assert store.get("b") is None
+    assert [s["start"] for s in store.get("a")] == [1, 2]
+    assert store.get("c") is not None
+
+
+def test_startup_tracker_reports_phases_and_mcp_state():
+    startup = StartupTracker()
+    with startup.phase("storage"):
+        pass
+    with pytest.raises(RuntimeError):
+        with startup.phase("mcp_connect"):
+            raise RuntimeError("uvx not found")
+    startup.graph_ready()
+    assert startup.report()["mcp"] == "pending"
+
+    startup.mcp_done(RuntimeError("uvx not found"))
+    report = startup.report()
+    assert list(report["phases_ms"]) == ["storage", "mcp_connect"]
+    assert report["mcp"] == "failed" and report["mcp_error"] == "uvx not found"
+    assert report["mcp_ready_ms"] >= report["graph_ready_ms"]
+
+
+def test_eager_startup_raises_mcp_failures(monkeypatch):
+    from app.core import graph
+
+    async def connect():
+        raise RuntimeError("uvx not found")
+
+    monkeypatch.setattr(graph, "startup", StartupTracker())
+    monkeypatch.setattr(graph.mcp_hub, "connect", connect)
+    with pytest.raises(RuntimeError):
+        asyncio.run(graph.attach_mcp_tools(strict=True))
+    assert graph.startup.report()["mcp"] == "failed"
+
+    # Background mode keeps serving the local tools
+    asyncio.run(graph.attach_mcp_tools())
+    assert graph.startup.report()["mcp_error"] == "uvx not found"
+
+
+def test_failed_eager_startup_closes_the_stores(tmp_path, monkeypatch):
+    from app.core import graph
+    from app.core.approvals import ApprovalIndex
+    from app.core.batch_store import BatchStore
+    from app.core.checkpointer import open_checkpointer
+    from app.core.thread_lock import ThreadLeaseManager
+
+    async def connect():
+        raise RuntimeError("uvx not found")
+
+    db = str(tmp_path / "checkpoints.db")
+    monkeypatch.setattr(graph, "STARTUP_MODE", "eager")
+    monkeypatch.setattr(graph, "startup", StartupTracker())
+    monkeypatch.setattr(graph.mcp_hub, "connect", connect)
+    monkeypatch.setattr(graph, "saver_context", open_checkpointer(db))
+    monkeypatch.setattr(graph, "checkpointer", None)
+    for name, store in (("thread_leases", ThreadLeaseManager(db)), ("batch_store", BatchStore(db)),
+                        ("approval_index", ApprovalIndex(db))):
+        monkeypatch.setattr(graph, name, store)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(graph.initialize_graph())
+    assert graph.thread_leases.conn is None and graph.batch_store.conn is None and graph.approval_index.conn is None
+    with pytest.raises(ValueError, match="no active connection"):
+        asyncio.run(graph.checkpointer.conn.execute("SELECT 1"))
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+
+from fastapi import HTTPException
+from app.api import endpoints
+from app.core import graph
+from app.core.thread_lock import ThreadBusyError, ThreadLeaseManager
+from app.schemas.api.requests import ApprovalRequest
+
+
+async def open_leases(db: str, ttl: float = 60) -> ThreadLeaseManager:
+    leases = ThreadLeaseManager(db, ttl)
+    await leases.open()
+    return leases
+
+
+def test_a_held_thread_is_busy_for_every_worker(tmp_path):
+    db = str(tmp_path / "checkpoints.db")
+
+    async def run():
+        # Two managers on the same file, as two workers would have
+        first, second = await open_leases(db), await open_leases(db)
+        try:
+            token = await first.acquire("t-1")
+            for leases in (first, second):
+                with pytest.raises(ThreadBusyError) as busy:
+                    await leases.acquire("t-1")
+                assert busy.value.owner == token
+            assert await second.holder("t-1") == token
+            # Other threads are not affected
+            await second.acquire("t-2")
+
+            await first.release("t-1", token)
+            assert await second.holder("t-1") is None
+            await second.acquire("t-1")
+            return first.conflicts + second.conflicts
+        finally:
+            await first.close()
+            await second.close()
+
+    assert asyncio.run(run()) == 2
+
+
+def test_an_expired_lease_can_be_taken_over(tmp_path):
+    db = str(tmp_path / "checkpoints.db")
+
+    async def run():
+        dead, alive = await open_leases(db, ttl=0.05), await open_leases(db, ttl=0.05)
+        try:
+            # The worker holding it dies without releasing the lease
+            stale = await dead.acquire("t-1")
+            with pytest.raises(ThreadBusyError):
+                await alive.acquire("t-1")
+            await asyncio.sleep(0.1)
+            assert await alive.holder("t-1") is None
+
+            token = await alive.acquire("t-1")
+            assert token != stale and await alive.holder("t-1") == token
+            # The old holder can neither renew nor release the new lease
+            assert not await dead.renew("t-1", stale)
+            await dead.release("t-1", stale)
+            assert await alive.renew("t-1", token)
+        finally:
+            await dead.close()
+            await alive.close()
+
+    asyncio.run(run())
+
+
+def test_a_cancelled_run_releases_its_lease(tmp_path):
+    db = str(tmp_path / "checkpoints.db")
+
+    async def run():
+        leases = await open_leases(db, ttl=0.03)
+        started = asyncio.Event()
+
+        async def hold_forever():
+            async with leases.hold("t-1"):
+                started.set()
+                await asyncio.sleep(30)
+
+        try:
+            task = asyncio.create_task(hold_forever())
+            await started.wait()
+            # Kept alive past its ttl while the run is going
+            await asyncio.sleep(0.08)
+            with pytest.raises(ThreadBusyError):
+                await leases.acquire("t-1")
+
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert await leases.holder("t-1") is None
+            await leases.acquire("t-1")
+        finally:
+            await leases.close()
+
+    asyncio.run(run())
+
+
+def test_approving_a_busy_thread_is_a_conflict(tmp_path, monkeypatch):
+    async def run():
+        leases = await open_leases(str(tmp_path / "checkpoints.db"))
+        monkeypatch.setattr(graph, "thread_leases", leases)
+        try:
+            await leases.acquire("t-1")
+            with pytest.raises(HTTPException) as error:
+                await endpoints.approve_endpoint(ApprovalRequest(thread_id="t-1", approve=True))
+            return error.value
+        finally:
+            await leases.close()
+
+    error = asyncio.run(run())
+    assert error.status_code == 409 and "t-1" in error.detail
@@ -0,0 +1,101 @@
+import asyncio
+
+from types import SimpleNamespace
+from app.core.mcp_manager import MCPHubManager
+from app.core.tool_cache import ToolResultCache, cache_key
+
+KB = 1 / 1024
+
+
+def test_equivalent_arguments_share_a_key():
+    assert cache_key("fetch", {"url": "HTTPS://Shop.example/gpu#specs"}) == cache_key("fetch", {"url": "https://shop.example/gpu"})
+    assert cache_key("read_query", {"query": "SELECT *\n  FROM products;"}) == cache_key("read_query", {"query": "SELECT * FROM products"})
+    assert cache_key("read_query", {"query": "SELECT 1"}) != cache_key("list_tables", {"query": "SELECT 1"})
+
+
+def test_lru_is_bounded_by_bytes():
+    async def run():
+        cache = ToolResultCache(ttls={"fetch": 60}, max_memory_mb=KB)
+        for page in ("a", "b", "c"):
+            await cache.put("fetch", {"url": f"https://{page}.example"}, page * 400)
+        # "a" was the least recently used when "c" did not fit
+        assert await cache.get("fetch", {"url": "https://a.example"}) is None
+
+        # Reading "b" makes "c" the next one out
+        assert await cache.get("fetch", {"url": "https://b.example"}) == "b" * 400
+        await cache.put("fetch", {"url": "https://d.example"}, "d" * 400)
+        assert await cache.get("fetch", {"url": "https://c.example"}) is None
+        assert await cache.get("fetch", {"url": "https://b.example"}) is not None
+
+        # Larger than the whole cache: not kept
+        await cache.put("fetch", {"url": "https://e.example"}, "e" * 2000)
+        assert await cache.get("fetch", {"url": "https://e.example"}) is None
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["evictions"] == 2 and stats["entries"] == 2 and stats["memory_bytes"] == 800
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+
+
+def test_entries_expire_and_tools_without_ttl_are_not_cached():
+    async def run():
+        cache = ToolResultCache(ttls={"read_query": 0.05})
+        await cache.put("read_query", {"query": "SELECT 1"}, "1")
+        await cache.put("write_query", {"query": "DELETE FROM products"}, "done")
+        assert await cache.get("read_query", {"query": "SELECT 1"}) == "1"
+        assert await cache.get("write_query", {"query": "DELETE FROM products"}) is None
+        await asyncio.sleep(0.06)
+        assert await cache.get("read_query", {"query": "SELECT 1"}) is None
+        return cache.stats()
+
+    assert asyncio.run(run())["entries"] == 0
+
+
+def test_entries_survive_a_restart_in_the_sqlite_file(tmp_path):
+    path = str(tmp_path / "tool_cache.db")
+
+    async def run():
+        await ToolResultCache(ttls={"read_query": 60, "fetch": 60}, persist_path=path).put(
+            "read_query", {"query": "SELECT 1"}, "1"
+        )
+        restarted = ToolResultCache(ttls={"read_query": 60, "fetch": 60}, persist_path=path)
+        assert await restarted.get("read_query", {"query": "SELECT 1"}) == "1"
+        assert restarted.stats()["disk_hits"] == 1
+
+        # Invalidation reaches the file too
+        await restarted.invalidate(["read_query"])
+        assert await ToolResultCache(ttls={"read_query": 60}, persist_path=path).get(
+            "read_query", {"query": "SELECT 1"}
+        ) is None
+
+    asyncio.run(run())
+
+
+class StubSqlitePool:
+    name = "sqlite"
+    call_timeout = 5
+
+    def __init__(self):
+        self.calls = []
+
+    async def call_tool(self, name, arguments):
+        self.calls.append(name)
+        text = f"{name} result {len(self.calls)}"
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], isError=False)
+
+
+def test_writes_invalidate_the_servers_cached_reads():
+    hub = MCPHubManager()
+    hub.cache = ToolResultCache(ttls={"read_query": 60})
+    hub.server_tools["sqlite"] = ["read_query", "write_query"]
+    pool = StubSqlitePool()
+
+    async def run():
+        read = {"query": "SELECT * FROM products"}
+        first = await hub._mcp_tool_executor(pool, "read_query", **read)
+        assert await hub._mcp_tool_executor(pool, "read_query", **read) == first
+        await hub._mcp_tool_executor(pool, "write_query", query="UPDATE products SET stock = 0")
+        assert await hub._mcp_tool_executor(pool, "read_query", **read) != first
+
+    asyncio.run(run())
+    assert pool.calls == ["read_query", "write_query", "read_query"]
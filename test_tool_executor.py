@@ -0,0 +1,96 @@
+import json
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+from app.core.tool_executor import ParallelToolNode, ToolLimits
+
+
+def fake_tool(name: str, seconds: float = 0.0, fail: bool = False, counters: tuple = ()) -> StructuredTool:
+    """Sleeps, then answers or raises. Each counter dict tracks the calls running at once and the peak."""
+
+    async def run(n: int = 0) -> str:
+        for running in counters:
+            running["now"] = running.get("now", 0) + 1
+            running["peak"] = max(running.get("peak", 0), running["now"])
+        try:
+            await asyncio.sleep(seconds)
+            if fail:
+                raise RuntimeError("boom")
+            return f"{name} {n}"
+        finally:
+            for running in counters:
+                running["now"] -= 1
+
+    return StructuredTool.from_function(coroutine=run, name=name, description=f"Fake {name}")
+
+
+def step(*names: str) -> dict:
+    calls = [{"name": name, "args": {"n": i}, "id": f"call-{i}"} for i, name in enumerate(names)]
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+
+def run_node(node: ParallelToolNode, state: dict) -> list:
+    config = {"configurable": {"thread_id": "tool-executor-test"}}
+    return asyncio.run(node.ainvoke(state, config))["messages"]
+
+
+def test_per_tool_and_per_server_limits():
+    tool_a, server = {}, {}
+    # a and b are tools of the same server
+    tools = [fake_tool("a", 0.02, counters=(tool_a, server)), fake_tool("b", 0.02, counters=(server,))]
+    node = ParallelToolNode(
+        tools, tool_servers={"a": "db", "b": "db"}, server_limits={"db": 3},
+        settings={"max_concurrency": {"a": 1}}
+    )
+    messages = run_node(node, step("a", "a", "a", "b", "b", "b"))
+
+    assert [m.content for m in messages] == ["a 0", "a 1", "a 2", "b 3", "b 4", "b 5"]
+    assert tool_a["peak"] == 1 and server["peak"] == 3
+
+
+def test_deadline_and_errors_only_affect_their_call():
+    node = ParallelToolNode(
+        [fake_tool("slow", 1.0), fake_tool("broken", fail=True), fake_tool("fast")],
+        settings={"call_timeout": 5, "timeouts": {"slow": 0.05}}
+    )
+    slow, broken, fast = run_node(node, step("slow", "broken", "fast"))
+
+    assert slow.status == "error" and json.loads(slow.content)["error_type"] == "Timeout"
+    assert broken.status == "error" and "boom" in broken.content
+    assert fast.content == "fast 2" and fast.response_metadata["latency_ms"] >= 0
+
+    stats = node.stats()
+    assert stats["slow"]["timeouts"] == 1 and stats["slow"]["errors"] == 1
+    assert stats["broken"]["errors"] == 1 and stats["broken"]["timeouts"] == 0
+    assert stats["fast"] == {**stats["fast"], "calls": 1, "errors": 0}
+    assert stats["slow"]["max_ms"] >= 50 and stats["slow"]["avg_ms"] == round(stats["slow"]["total_ms"], 2)
+
+
+def test_deadline_starts_after_the_semaphore():
+    # Three calls of 0.04s one at a time: the last waits 0.08s, longer than its 0.06s deadline
+    node = ParallelToolNode(
+        [fake_tool("one", 0.04)], settings={"max_concurrency": {"one": 1}, "timeouts": {"one": 0.06}}
+    )
+    messages = run_node(node, step("one", "one", "one"))
+
+    assert [m.status for m in messages] == ["success"] * 3
+    assert node.stats()["one"]["max_ms"] >= 80
+
+
+def test_recompiled_nodes_share_limits_and_stats():
+    running = {}
+    tools = [fake_tool("a", 0.02, counters=(running,))]
+    limits = ToolLimits({"a": 1})
+    # The graph recompiled while a run was still on the old node
+    old = ParallelToolNode(tools, tool_servers={"a": "db"}, server_limits={"db": 1}, limits=limits)
+    new = ParallelToolNode(tools, tool_servers={"a": "db"}, server_limits={"db": 4}, limits=limits)
+    config = {"configurable": {"thread_id": "tool-executor-test"}}
+
+    async def run():
+        await asyncio.gather(old.ainvoke(step("a", "a"), config), new.ainvoke(step("a", "a"), config))
+
+    asyncio.run(run())
+    assert running["peak"] == 1
+    assert limits.server_semaphores["db"]._value == 1
+    assert new.stats()["a"]["calls"] == 4 == old.stats()["a"]["calls"]
@@ -0,0 +1,94 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+from pydantic import Field, create_model
+from benchmarks.fakes import ScriptedChatModel
+from app.core.agent import AgentManager
+from app.core.tool_selection import ToolSelector, tokenize, unbound_tool_error
+
+FOLLOW_UPS = {"web_search_tool": ["fetch"], "fetch": ["bulk_upsert_products", "write_query"]}
+
+
+def mcp_tool(name: str, description: str, *args: str) -> StructuredTool:
+    async def run(**kwargs):
+        return ""
+
+    fields = {arg: (str, Field(..., description="Target table: 'products'. Columns: [name, price_in_cents]")) for arg in args}
+    return StructuredTool.from_function(
+        name=name, description=description, coroutine=run, args_schema=create_model(f"{name}Args", **fields)
+    )
+
+
+MCP_TOOLS = [
+    mcp_tool("read_query", "Execute a SELECT query on the SQLite database", "query"),
+    mcp_tool("write_query", "Execute an INSERT, UPDATE, or DELETE query on the SQLite database", "query"),
+    mcp_tool("create_table", "Create a new table in the SQLite database", "query"),
+    mcp_tool("list_tables", "List all tables in the SQLite database"),
+    mcp_tool("describe_table", "Get the schema information for a specific table", "table_name"),
+    mcp_tool("fetch", "Fetches a URL from the internet and extracts its contents as markdown.", "url"),
+]
+
+
+def step(*names):
+    calls = [{"name": name, "args": {}, "id": f"call-{i}"} for i, name in enumerate(names)]
+    return [AIMessage(content="", tool_calls=calls)] + [
+        ToolMessage(content="ok", name=name, tool_call_id=f"call-{i}") for i, name in enumerate(names)
+    ]
+
+
+def selector(**settings) -> ToolSelector:
+    manager = AgentManager()
+    selector = ToolSelector({"max_tools": 6, "follow_ups": FOLLOW_UPS, **settings})
+    selector.index_tools(manager.static_tools + MCP_TOOLS)
+    return selector
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("save_report_to_disk listTables prices") == ["save", "report", "disk", "list", "table", "price"]
+
+
+def test_subset_follows_the_request_and_the_graph_position():
+    tools = selector()
+    question = [HumanMessage(content="Find the price of the RTX 5090 and save a report")]
+
+    first = tools.select(question)
+    assert {"web_search_tool", "save_report_to_disk", "get_price_summary"} <= set(first)
+    assert "fetch" not in first and "describe_table" not in first
+
+    # After a search: fetch is offered, and what was already called stays bound
+    after_search = tools.select(question + step("web_search_tool"))
+    assert {"fetch", "web_search_tool"} <= set(after_search)
+    assert len(tools.select(question + step("web_search_tool") + step("fetch"))) == 6
+
+    # Nothing to go on: the whole catalogue
+    assert tools.select([HumanMessage(content="hello")]) is None
+    assert selector(enabled=False).select(question) is None
+    assert tools.stats()["all"] == 1
+
+
+def test_bound_variants_are_cached_per_tier_and_subset():
+    manager = AgentManager()
+    manager.set_models({"small": ScriptedChatModel(model_name="scripted-small", first_token_ms=0, token_ms=0)})
+    manager.tool_selector.max_tools = 6
+    manager.update_tools(MCP_TOOLS)
+    question = [HumanMessage(content="Find the price of gpu")]
+    config = {"configurable": {"thread_id": "selection-test"}}
+
+    async def run():
+        for messages in (question, question + step("web_search_tool"), question):
+            await manager.acall_model({"messages": messages, "total_tokens": 0}, config)
+
+    asyncio.run(run())
+    assert len(manager.bound_variants) == 2 and not manager.bound_models
+    assert manager.usage_stats()["tool_selection"]["subset"] == 3
+
+    manager.update_tools(MCP_TOOLS[:-1])
+    assert not manager.bound_variants and "fetch" not in manager.tool_selector.tools
+
+
+def test_unbound_tool_errors_are_recognized():
+    assert unbound_tool_error(ValueError(
+        "Error code: 400 - tool call validation failed: attempted to call tool 'fetch' which was not in request.tools"
+    ))
+    assert not unbound_tool_error(ValueError("Error code: 400 - context length exceeded"))